@@ -0,0 +1,173 @@
+# This file is part of EbookLib.
+# Copyright (c) 2013 Aleksandar Erkalovic <aerkalov@gmail.com>
+#
+# EbookLib is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# EbookLib is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with EbookLib.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Asynchronous versions of read_epub and write_epub. Blocking work is done in the executor,
+in chunks, so the event loop is never blocked for the whole book.
+
+This module needs Python 3.6 or newer. Rest of the package still works with Python 2, but this
+module can not be imported there.
+"""
+
+import asyncio
+import inspect
+import tempfile
+
+from ebooklib.epub import EpubReader, EpubWriter
+
+
+# get_running_loop is available from Python 3.7, before that get_event_loop returns the running loop
+_get_running_loop = getattr(asyncio, 'get_running_loop', asyncio.get_event_loop)
+
+# Size of the pieces we send to the asynchronous output stream
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Output is kept in memory until it gets bigger than this
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+
+def _chunks(items, chunk_size):
+    items = list(items)
+
+    for n in range(0, len(items), chunk_size):
+        yield items[n:n + chunk_size]
+
+
+def _process_items(processor, items):
+    for item in items:
+        processor._process_item(item)
+
+
+def _is_async_stream(out):
+    write = getattr(out, 'write', None)
+
+    if write is None:
+        return False
+
+    return inspect.iscoroutinefunction(write) or hasattr(out, 'drain')
+
+
+async def aread_epub(name, options=None, executor=None, chunk_size=16):
+    """
+    Asynchronous version of read_epub.
+
+    >>> book = await aio.aread_epub('book.epub')
+
+    :Args:
+      - name: full path to the input file
+      - options: extra options as dictionary (optional)
+      - executor: executor used for the blocking work (optional). Default executor of the loop is used if not defined.
+      - chunk_size: number of items processed by the plugins in one call to the executor (optional)
+
+    :Returns:
+      Instance of EpubBook.
+    """
+    loop = _get_running_loop()
+
+    reader = EpubReader(name, options)
+
+    book = await loop.run_in_executor(executor, reader.load)
+
+    await loop.run_in_executor(executor, reader._process_book)
+
+    if reader.options.get('plugins'):
+        for items in _chunks(book.get_items(), chunk_size):
+            await loop.run_in_executor(executor, _process_items, reader, items)
+
+    return book
+
+
+async def awrite_epub(name, book, options=None, executor=None, chunk_size=16):
+    """
+    Asynchronous version of write_epub. Output can be file name, file object or asynchronous
+    stream. Asynchronous stream is an object with coroutine write method or an object
+    like asyncio.StreamWriter with write and drain methods.
+
+    >>> await aio.awrite_epub('book.epub', book)
+    >>> await aio.awrite_epub(response_writer, book)
+
+    :Args:
+      - name: file name, file object or asynchronous stream for the output
+      - book: instance of EpubBook
+      - options: extra options as dictionary (optional)
+      - executor: executor used for the blocking work (optional). Default executor of the loop is used if not defined.
+      - chunk_size: number of items processed by the plugins in one call to the executor (optional)
+    """
+    loop = _get_running_loop()
+
+    if _is_async_stream(name):
+        out = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    else:
+        out = name
+
+    writer = EpubWriter(out, book, options)
+
+    await loop.run_in_executor(executor, writer._process_book)
+
+    if writer.options.get('plugins'):
+        for items in _chunks(book.get_items(), chunk_size):
+            await loop.run_in_executor(executor, _process_items, writer, items)
+
+    try:
+        await loop.run_in_executor(executor, writer.write)
+    except IOError:
+        # same as write_epub
+        if out is not name:
+            out.close()
+
+        return
+
+    if out is name:
+        return
+
+    try:
+        out.seek(0)
+
+        while True:
+            data = await loop.run_in_executor(executor, out.read, STREAM_CHUNK_SIZE)
+
+            if not data:
+                break
+
+            result = name.write(data)
+
+            if inspect.isawaitable(result):
+                await result
+            elif hasattr(name, 'drain'):
+                await name.drain()
+    finally:
+        out.close()
+
+
+async def aiter_items(book, item_type=None, chunk_size=64):
+    """
+    Asynchronous iterator over the items of the book. Control is returned to the event loop after
+    every chunk of items.
+
+    >>> async for item in aio.aiter_items(book, ebooklib.ITEM_DOCUMENT):
+    ...     print(item)
+
+    :Args:
+      - book: instance of EpubBook
+      - item_type: return only items of this type (optional)
+      - chunk_size: number of items between returns to the event loop (optional)
+    """
+    for n, item in enumerate(list(book.get_items())):
+        if n and n % chunk_size == 0:
+            await asyncio.sleep(0)
+
+        if item_type is None or item.get_type() == item_type:
+            yield item
@@ -0,0 +1,184 @@
+# This file is part of EbookLib.
+# Copyright (c) 2013 Aleksandar Erkalovic <aerkalov@gmail.com>
+#
+# EbookLib is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# EbookLib is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with EbookLib.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import sys
+import hashlib
+import logging
+import marshal
+import tempfile
+
+import six
+
+
+# Increase when the structure returned by EpubReader._get_structure changes
+CACHE_FORMAT = 1
+
+CACHE_MAGIC = six.b('EBLC')
+
+
+def get_fingerprint(file_name, method='stat'):
+    """
+    Returns fingerprint of the file which changes when the file is changed.
+
+    :Args:
+      - file_name: Path to the EPUB file
+      - method: With "stat" fingerprint is made from full path, size and modification time of the file. With
+        "content" it is SHA1 hash of the file content, which also matches copies of the same file under
+        different names (optional). Default value is "stat".
+
+    :Returns:
+      Returns fingerprint as string. Returns None if it can not be calculated, for instance for file objects.
+    """
+    if not isinstance(file_name, six.string_types):
+        return None
+
+    try:
+        if method == 'content':
+            h = hashlib.sha1()
+
+            with open(file_name, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), six.b('')):
+                    h.update(chunk)
+        else:
+            st = os.stat(file_name)
+
+            h = hashlib.sha1()
+            h.update(os.path.abspath(file_name).encode('utf-8'))
+            h.update(('|%d|%r' % (st.st_size, st.st_mtime)).encode('utf-8'))
+    except (IOError, OSError):
+        return None
+
+    return h.hexdigest()
+
+
+class BookCache(object):
+    """
+    On disk cache for the parsed structure of the EPUB files (metadata, manifest, spine, guide and
+    table of contents). When used by the reader, already seen files are loaded without parsing
+    container, OPF, NCX and NAV files. Content of the items is still read from the archive.
+
+    >>> cache = BookCache('/var/cache/ebooklib')
+    >>> book = epub.read_epub('book.epub', {'cache': cache})
+
+    Values are stored with marshal so the cache never executes code when it is loaded. Entries are
+    not shared between different versions of Python.
+    """
+
+    def __init__(self, directory, fingerprint='stat'):
+        """
+        :Args:
+          - directory: Directory where cached entries are stored. It is created if it does not exist.
+          - fingerprint: How to identify the file. With "stat" it is full path, size and modification time
+            of the file. With "content" it is SHA1 hash of the file content, which also matches copies of
+            the same file under different names. Default value is "stat".
+        """
+        if fingerprint not in ('stat', 'content'):
+            raise ValueError('Unknown fingerprint "%s"' % fingerprint)
+
+        self.directory = directory
+        self.fingerprint = fingerprint
+
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def get_key(self, file_name):
+        """
+        Returns cache key for the file. Returns None if key can not be calculated, for instance when
+        we are reading from the file object.
+
+        :Args:
+          - file_name: Path to the EPUB file
+
+        :Returns:
+          Returns key as string.
+        """
+        return get_fingerprint(file_name, self.fingerprint)
+
+    def _get_path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def _get_header(self):
+        return CACHE_MAGIC + six.b('%d.%d.%d' % (CACHE_FORMAT, sys.version_info[0], sys.version_info[1])) + six.b('\n')
+
+    def load(self, key):
+        """
+        Returns cached structure for the key.
+
+        :Args:
+          - key: Key returned by get_key
+
+        :Returns:
+          Returns structure as dictionary. Returns None if nothing was found.
+        """
+        try:
+            with open(self._get_path(key), 'rb') as f:
+                data = f.read()
+        except (IOError, OSError):
+            return None
+
+        header = self._get_header()
+
+        if not data.startswith(header):
+            return None
+
+        try:
+            return marshal.loads(data[len(header):])
+        except (ValueError, EOFError, TypeError):
+            logging.warning('Broken cache entry %s.', key)
+            return None
+
+    def save(self, key, value):
+        """
+        Stores structure in the cache. Errors while writing are ignored because cache is not essential.
+
+        :Args:
+          - key: Key returned by get_key
+          - value: Structure as dictionary
+        """
+        try:
+            data = marshal.dumps(value)
+        except ValueError:
+            logging.warning('Could not serialize structure for cache.')
+            return
+
+        path = self._get_path(key)
+
+        try:
+            dir_name = os.path.dirname(path)
+            if not os.path.isdir(dir_name):
+                os.makedirs(dir_name)
+
+            # write to temporary file first so readers never see partial entry
+            fd, tmp_name = tempfile.mkstemp(dir=dir_name)
+
+            with os.fdopen(fd, 'wb') as f:
+                f.write(self._get_header())
+                f.write(data)
+
+            # os.replace also overwrites existing entry on Windows
+            getattr(os, 'replace', os.rename)(tmp_name, path)
+        except (IOError, OSError):
+            logging.warning('Could not write cache entry %s.', key)
+
+    def clear(self):
+        "Removes all cached entries."
+        for dir_name, _, file_names in os.walk(self.directory):
+            for name in file_names:
+                try:
+                    os.remove(os.path.join(dir_name, name))
+                except OSError:
+                    pass
@@ -0,0 +1,416 @@
+# This file is part of EbookLib.
+# Copyright (c) 2013 Aleksandar Erkalovic <aerkalov@gmail.com>
+#
+# EbookLib is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# EbookLib is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with EbookLib.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import json
+import posixpath as zip_path
+
+import six
+from six.moves.urllib.parse import unquote
+
+from ebooklib import epub
+from ebooklib.epub import NAMESPACES, IMAGE_MEDIA_TYPES
+from ebooklib.database import BookDatabase
+
+
+# Version of the database schema, database with other version is created again
+SCHEMA_VERSION = 1
+
+# Number of books written to the database in one transaction
+BATCH_SIZE = 500
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS books (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    error TEXT,
+    version TEXT,
+    uid TEXT,
+    title TEXT,
+    language TEXT,
+    items INTEGER,
+    documents INTEGER,
+    images INTEGER,
+    styles INTEGER,
+    fonts INTEGER,
+    missing_items INTEGER,
+    content_size INTEGER,
+    compressed_size INTEGER,
+    cover TEXT,
+    cover_media_type TEXT
+);
+CREATE TABLE IF NOT EXISTS metadata (
+    book_id INTEGER NOT NULL,
+    namespace TEXT,
+    name TEXT,
+    value TEXT,
+    attributes TEXT
+);
+CREATE INDEX IF NOT EXISTS metadata_book ON metadata (book_id);
+CREATE INDEX IF NOT EXISTS metadata_value ON metadata (name, value COLLATE NOCASE);
+'''
+
+# Columns of the books table returned by the queries
+_COLUMNS = ('path', 'size', 'mtime', 'error', 'version', 'uid', 'title', 'language', 'items', 'documents',
+            'images', 'styles', 'fonts', 'missing_items', 'content_size', 'compressed_size', 'cover',
+            'cover_media_type')
+
+_FONT_MEDIA_TYPES = frozenset(['application/vnd.ms-opentype', 'application/x-font-ttf', 'application/x-font-otf',
+                               'application/font-woff', 'application/font-sfnt'])
+
+
+def _get_first(metadata, namespace, name):
+    values = metadata.get(NAMESPACES[namespace], {}).get(name)
+
+    return values[0][0] if values else None
+
+
+def _get_cover_entry(epub_file):
+    "Returns manifest entry of the cover image, from EPUB3 properties or EPUB2 meta element."
+    manifest = epub_file.reader.manifest
+
+    for entry in manifest:
+        if 'cover-image' in entry[3]:
+            return entry
+
+    for value, others in epub_file.book.metadata.get(NAMESPACES['OPF'], {}).get('cover', []):
+        cover_id = (others or {}).get('content')
+
+        for entry in manifest:
+            if entry[0] == cover_id:
+                return entry
+
+    return None
+
+
+def read_entry(path):
+    """
+    Returns catalog entry for the EPUB file. Only container and OPF file are parsed, content of the
+    items is never read.
+
+    :Args:
+      - path: Path to the EPUB file
+
+    :Returns:
+      Returns tuple with dictionary of values for the books table and list of (namespace, name, value, attributes)
+      metadata tuples.
+    """
+    with epub.open_epub(path) as epub_file:
+        book = epub_file.book
+        opf_dir = epub_file.reader.opf_dir
+
+        values = {'version': book.version,
+                  'uid': book.uid,
+                  'title': _get_first(book.metadata, 'DC', 'title'),
+                  'language': _get_first(book.metadata, 'DC', 'language'),
+                  'items': 0,
+                  'documents': 0,
+                  'images': 0,
+                  'styles': 0,
+                  'fonts': 0,
+                  'missing_items': 0,
+                  'content_size': 0,
+                  'compressed_size': 0,
+                  'cover': None,
+                  'cover_media_type': None}
+
+        def _get_info(href):
+            return epub_file.get_file_info(zip_path.join(opf_dir, unquote(href or '')))
+
+        for uid, href, media_type, properties in epub_file.reader.manifest:
+            values['items'] += 1
+
+            if media_type == 'application/xhtml+xml':
+                values['documents'] += 1
+            elif media_type in IMAGE_MEDIA_TYPES:
+                values['images'] += 1
+            elif media_type == 'text/css':
+                values['styles'] += 1
+            elif media_type and (media_type.startswith('font/') or media_type in _FONT_MEDIA_TYPES):
+                values['fonts'] += 1
+
+            info = _get_info(href)
+
+            if info is None:
+                values['missing_items'] += 1
+            else:
+                values['content_size'] += info.file_size
+                values['compressed_size'] += info.compress_size
+
+        cover = _get_cover_entry(epub_file)
+
+        # cover which is not in the archive is the same as missing cover
+        if cover is not None and _get_info(cover[1]) is not None:
+            values['cover'] = unquote(cover[1])
+            values['cover_media_type'] = cover[2]
+
+        metadata = []
+
+        for namespace, names in six.iteritems(book.metadata):
+            for name, entries in six.iteritems(names):
+                for value, others in entries:
+                    metadata.append((namespace, name, value, json.dumps(others or {}, sort_keys=True)))
+
+    return values, metadata
+
+
+class Catalog(BookDatabase):
+    """
+    Catalog of the metadata for large collections of EPUB files stored in the SQLite database.
+
+    >>> with Catalog('catalog.db') as catalog:
+    ...     catalog.refresh(glob.glob('books/*.epub'))
+    ...     for book in catalog.find_by_author('Lewis Carroll'):
+    ...         print(book['path'], book['title'])
+
+    Only container and OPF file of each book are parsed. Books are read again only when their size or
+    modification time are changed, books which could not be read are remembered with the error so
+    they are not read again until they are changed.
+    """
+
+    SCHEMA = _SCHEMA
+    SCHEMA_VERSION = SCHEMA_VERSION
+    TABLES = ('metadata', 'books')
+    KNOWN_COLUMNS = ('size', 'mtime')
+
+    def __init__(self, path, batch_size=BATCH_SIZE):
+        """
+        :Args:
+          - path: Path to the database file
+          - batch_size: Number of books written in one transaction (optional). Default value is 500.
+        """
+        self.batch_size = batch_size
+
+        super(Catalog, self).__init__(path)
+
+    def _delete_book(self, book_id):
+        self._db.execute('DELETE FROM metadata WHERE book_id = ?', (book_id, ))
+        self._db.execute('DELETE FROM books WHERE id = ?', (book_id, ))
+
+    def _store(self, path, st, values, metadata, known):
+        if path in known:
+            self._delete_book(known[path][0])
+
+        values = dict(values, path=path, size=st.st_size, mtime=st.st_mtime)
+        columns = [column for column in _COLUMNS if column in values]
+
+        cursor = self._db.execute('INSERT INTO books (%s) VALUES (%s)' % (', '.join(columns), ', '.join('?' * len(columns))),
+                                  [values[column] for column in columns])
+        book_id = cursor.lastrowid
+
+        self._db.executemany('INSERT INTO metadata (book_id, namespace, name, value, attributes) VALUES (?, ?, ?, ?, ?)',
+                             ((book_id, ) + entry for entry in metadata))
+
+    def refresh(self, paths, remove_missing=False):
+        """
+        Adds new and changed books to the catalog.
+
+        :Args:
+          - paths: List of paths to the EPUB files
+          - remove_missing: Remove books which are in the catalog but not in the paths (optional). Default value is False.
+
+        :Returns:
+          Returns dictionary with number of added, updated, unchanged, failed and removed books.
+          Errors are returned as list of (path, error) tuples.
+        """
+        stats = {'added': 0, 'updated': 0, 'unchanged': 0, 'failed': 0, 'removed': 0, 'errors': []}
+
+        known = self._get_known()
+        seen = set()
+        pending = 0
+
+        try:
+            for path in paths:
+                path = os.path.abspath(path)
+
+                # every book is stored only once, even if it is in the paths more than once
+                if path in seen:
+                    continue
+
+                seen.add(path)
+
+                try:
+                    st = os.stat(path)
+                except (IOError, OSError) as e:
+                    stats['failed'] += 1
+                    stats['errors'].append((path, str(e)))
+                    continue
+
+                if path in known and known[path][1:] == (st.st_size, st.st_mtime):
+                    stats['unchanged'] += 1
+                    continue
+
+                try:
+                    values, metadata = read_entry(path)
+                except Exception as e:
+                    error = '%s: %s' % (e.__class__.__name__, e)
+
+                    values, metadata = {'error': error}, []
+
+                    stats['failed'] += 1
+                    stats['errors'].append((path, error))
+                else:
+                    stats['updated' if path in known else 'added'] += 1
+
+                self._store(path, st, values, metadata, known)
+
+                pending += 1
+
+                if pending >= self.batch_size:
+                    self._db.commit()
+                    pending = 0
+
+            if remove_missing:
+                for path, value in six.iteritems(known):
+                    if path not in seen:
+                        self._delete_book(value[0])
+                        stats['removed'] += 1
+
+            self._db.commit()
+        except:
+            self._db.rollback()
+            raise
+
+        return stats
+
+    def _query(self, where='', args=()):
+        cursor = self._db.execute('SELECT %s FROM books %s ORDER BY path' % (', '.join(_COLUMNS), where), args)
+
+        return [dict(zip(_COLUMNS, row)) for row in cursor]
+
+    def get_book(self, path):
+        """
+        Returns catalog entry for the book with all its metadata.
+
+        :Args:
+          - path: Path to the EPUB file
+
+        :Returns:
+          Returns dictionary with the values from the catalog. Metadata is dictionary in the same
+          format as EpubBook.metadata. Returns None if book is not in the catalog.
+        """
+        books = self._query('WHERE path = ?', (os.path.abspath(path), ))
+
+        if not books:
+            return None
+
+        book = books[0]
+        book['metadata'] = {}
+
+        cursor = self._db.execute('''SELECT namespace, name, value, attributes FROM metadata
+                                     WHERE book_id = (SELECT id FROM books WHERE path = ?)
+                                     ORDER BY rowid''', (book['path'], ))
+
+        for namespace, name, value, attributes in cursor:
+            book['metadata'].setdefault(namespace, {}).setdefault(name, []).append((value, json.loads(attributes)))
+
+        return book
+
+    def find(self, namespace, name, value):
+        """
+        Returns books which have the metadata with given value. Values are compared without case.
+
+        >>> catalog.find('DC', 'publisher', 'Macmillan')
+
+        :Args:
+          - namespace: Namespace of the metadata, like "DC" or full namespace
+          - name: Name of the metadata
+          - value: Value of the metadata
+
+        :Returns:
+          Returns list of dictionaries with the values from the catalog.
+        """
+        namespace = NAMESPACES.get(namespace, namespace)
+
+        return self._query('''WHERE id IN (SELECT book_id FROM metadata
+                                           WHERE name = ? AND value = ? COLLATE NOCASE AND namespace = ?)''',
+                           (name, value, namespace))
+
+    def find_by_author(self, author):
+        """
+        Returns books with this author (dc:creator).
+
+        :Args:
+          - author: Name of the author
+
+        :Returns:
+          Returns list of dictionaries with the values from the catalog.
+        """
+        return self.find('DC', 'creator', author)
+
+    def get_duplicates(self, namespace='DC', name='identifier'):
+        """
+        Returns books which share the same metadata value, by default the same dc:identifier.
+
+        :Args:
+          - namespace: Namespace of the metadata (optional). Default value is "DC".
+          - name: Name of the metadata (optional). Default value is "identifier".
+
+        :Returns:
+          Returns dictionary where key is the value and value is list of paths.
+        """
+        namespace = NAMESPACES.get(namespace, namespace)
+
+        cursor = self._db.execute('''SELECT metadata.value, books.path FROM metadata JOIN books ON books.id = metadata.book_id
+                                     WHERE metadata.name = ? AND metadata.namespace = ? AND metadata.value IN
+                                         (SELECT value FROM metadata WHERE name = ? AND namespace = ?
+                                          GROUP BY value HAVING COUNT(DISTINCT book_id) > 1)
+                                     ORDER BY metadata.value, books.path''', (name, namespace, name, namespace))
+
+        duplicates = {}
+
+        for value, path in cursor:
+            paths = duplicates.setdefault(value, [])
+
+            if not paths or paths[-1] != path:
+                paths.append(path)
+
+        return duplicates
+
+    def get_missing_covers(self):
+        """
+        Returns books without the cover image. Books which could not be read are not included.
+
+        :Returns:
+          Returns list of dictionaries with the values from the catalog.
+        """
+        return self._query('WHERE cover IS NULL AND error IS NULL')
+
+    def get_errors(self):
+        """
+        Returns books which could not be read.
+
+        :Returns:
+          Returns list of (path, error) tuples.
+        """
+        return list(self._db.execute('SELECT path, error FROM books WHERE error IS NOT NULL ORDER BY path'))
+
+    def get_stats(self):
+        """
+        Returns statistics for the catalog.
+
+        :Returns:
+          Returns dictionary with number of books, books with errors, books without cover and size of all books.
+        """
+        books, errors, covers, size = self._db.execute('''SELECT COUNT(*), COUNT(error), COUNT(cover), TOTAL(size)
+                                                          FROM books''').fetchone()
+
+        return {'books': books,
+                'errors': errors,
+                'missing_covers': books - errors - covers,
+                'size': int(size)}
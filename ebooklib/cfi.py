@@ -0,0 +1,729 @@
+# This file is part of EbookLib.
+# Copyright (c) 2013 Aleksandar Erkalovic <aerkalov@gmail.com>
+#
+# EbookLib is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# EbookLib is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with EbookLib.  If not, see <http://www.gnu.org/licenses/>.
+
+# EPUB Canonical Fragment Identifiers
+# - http://idpf.org/epub/linking/cfi/epub-cfi.html
+
+import re
+
+import six
+from lxml import etree
+
+from ebooklib.utils import parse_html_string
+
+
+# Step of the package document which points to the spine element
+SPINE_STEP = 6
+
+# Characters which must be escaped with ^ inside of the assertions
+_SPECIAL = '^[](),;='
+
+_NUMBER_RE = re.compile(r'\d+(\.\d+)?')
+
+
+class CFIError(ValueError):
+    "Raised when CFI can not be parsed or resolved."
+
+
+def _escape(value):
+    return ''.join('^' + c if c in _SPECIAL else c for c in value)
+
+
+class Step(object):
+    """
+    One step of the path. Even index points to the child element, 2 is the first one. Odd index points
+    to the text between child elements, 1 is the text before the first child element.
+    """
+
+    __slots__ = ('index', 'assertion')
+
+    def __init__(self, index, assertion=None):
+        """
+        :Args:
+          - index: Index of the step
+          - assertion: Id of the element which should be found (optional)
+        """
+        self.index = index
+        self.assertion = assertion
+
+    def __str__(self):
+        if self.assertion:
+            return '/%d[%s]' % (self.index, _escape(self.assertion))
+
+        return '/%d' % self.index
+
+    def __eq__(self, other):
+        return isinstance(other, Step) and self.index == other.index and self.assertion == other.assertion
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return '<Step:%s>' % self
+
+
+class LocalPath(object):
+    """
+    Steps inside of one document and the optional offset at the end.
+
+    :Attributes:
+      - steps: List of Step instances
+      - offset: Character offset in the text, or None
+      - temporal: Time offset in seconds for audio and video, or None
+      - spatial: (x, y) tuple for images, or None
+      - assertion: Text location assertion after the offset, or None
+    """
+
+    __slots__ = ('steps', 'offset', 'temporal', 'spatial', 'assertion')
+
+    def __init__(self, steps=None, offset=None, temporal=None, spatial=None, assertion=None):
+        self.steps = steps or []
+        self.offset = offset
+        self.temporal = temporal
+        self.spatial = spatial
+        self.assertion = assertion
+
+    def __str__(self):
+        s = ''.join(str(step) for step in self.steps)
+
+        if self.offset is not None:
+            s += ':%d' % self.offset
+        if self.temporal is not None:
+            s += '~%s' % _format_number(self.temporal)
+        if self.spatial is not None:
+            s += '@%s:%s' % tuple(_format_number(v) for v in self.spatial)
+        if self.assertion is not None:
+            s += '[%s]' % self.assertion
+
+        return s
+
+
+def _format_number(value):
+    if isinstance(value, float) and value.is_integer():
+        return '%d' % value
+
+    return '%s' % value
+
+
+class CFI(object):
+    """
+    Parsed EPUB CFI. Path is a list of local paths, every next one is inside of the document referenced by
+    the previous one (separated with ! in the CFI). Range has the common parent path and two local paths
+    relative to it.
+
+    >>> cfi = CFI.parse('epubcfi(/6/4[chap01ref]!/4[body01]/10[para05]/3:10)')
+    >>> cfi.get_spine_index()
+    1
+    >>> str(cfi)
+    'epubcfi(/6/4[chap01ref]!/4[body01]/10[para05]/3:10)'
+    """
+
+    __slots__ = ('path', 'start', 'end')
+
+    def __init__(self, path, start=None, end=None):
+        """
+        :Args:
+          - path: List of LocalPath instances
+          - start: Start of the range, relative to the path (optional)
+          - end: End of the range, relative to the path (optional)
+        """
+        self.path = path
+        self.start = start
+        self.end = end
+
+    @classmethod
+    def parse(cls, value):
+        """
+        Parses CFI. Value can be with or without "epubcfi(...)".
+
+        :Args:
+          - value: CFI as string
+
+        :Returns:
+          Returns instance of CFI. Raises CFIError if value is not valid CFI.
+        """
+        s = value.strip()
+
+        if s.startswith('epubcfi(') and s.endswith(')'):
+            s = s[8:-1]
+
+        parser = _Parser(s)
+        path = parser.parse_path()
+        start = end = None
+
+        if parser.peek() == ',':
+            parser.pos += 1
+            start = parser.parse_local_path()
+            parser.expect(',')
+            end = parser.parse_local_path()
+
+        if parser.pos != len(s):
+            parser.error('Unexpected character')
+
+        if not path or not path[0].steps:
+            parser.error('Empty path')
+
+        return cls(path, start, end)
+
+    def is_range(self):
+        "Returns True if this CFI is a range."
+        return self.start is not None
+
+    def _join(self, local):
+        path = [LocalPath(list(p.steps), p.offset, p.temporal, p.spatial, p.assertion) for p in self.path]
+        last = path[-1]
+
+        last.steps.extend(local.steps)
+        last.offset, last.temporal, last.spatial, last.assertion = local.offset, local.temporal, local.spatial, local.assertion
+
+        return CFI(path)
+
+    def get_start(self):
+        "Returns CFI for the start of the range, or this CFI if it is not a range."
+        return self._join(self.start) if self.start is not None else self
+
+    def get_end(self):
+        "Returns CFI for the end of the range, or this CFI if it is not a range."
+        return self._join(self.end) if self.end is not None else self
+
+    def get_spine_index(self):
+        """
+        Returns index in the spine referenced by this CFI.
+
+        :Returns:
+          Returns index as number. Raises CFIError if CFI does not point to the spine item.
+        """
+        steps = self.path[0].steps
+
+        if len(steps) < 2 or steps[1].index % 2 or steps[1].index < 2:
+            raise CFIError('CFI does not point to the spine item')
+
+        return steps[1].index // 2 - 1
+
+    def __str__(self):
+        s = '!'.join(str(p) for p in self.path)
+
+        if self.start is not None:
+            s += ',%s,%s' % (self.start, self.end)
+
+        return 'epubcfi(%s)' % s
+
+    def __repr__(self):
+        return '<CFI:%s>' % self
+
+
+class _Parser(object):
+    def __init__(self, s):
+        self.s = s
+        self.pos = 0
+
+    def error(self, message):
+        raise CFIError('%s at position %d in "%s"' % (message, self.pos, self.s))
+
+    def peek(self):
+        return self.s[self.pos] if self.pos < len(self.s) else None
+
+    def expect(self, c):
+        if self.peek() != c:
+            self.error('Expected "%s"' % c)
+
+        self.pos += 1
+
+    def parse_number(self):
+        m = _NUMBER_RE.match(self.s, self.pos)
+
+        if not m:
+            self.error('Expected number')
+
+        self.pos = m.end()
+
+        return float(m.group(0)) if m.group(1) else int(m.group(0))
+
+    def parse_integer(self):
+        value = self.parse_number()
+
+        if not isinstance(value, six.integer_types):
+            self.error('Expected integer')
+
+        return value
+
+    def parse_assertion(self):
+        "Returns unescaped content of the assertion in square brackets."
+        self.expect('[')
+        parts = []
+
+        while True:
+            c = self.peek()
+
+            if c is None:
+                self.error('Unterminated assertion')
+            elif c == '^':
+                if self.pos + 1 >= len(self.s):
+                    self.error('Unterminated escape')
+
+                parts.append(self.s[self.pos + 1])
+                self.pos += 2
+            elif c == ']':
+                self.pos += 1
+                break
+            else:
+                parts.append(c)
+                self.pos += 1
+
+        return ''.join(parts)
+
+    def parse_local_path(self):
+        local = LocalPath()
+
+        while self.peek() == '/':
+            self.pos += 1
+            step = Step(self.parse_integer())
+
+            if self.peek() == '[':
+                step.assertion = self.parse_assertion()
+
+            local.steps.append(step)
+
+        if self.peek() == ':':
+            self.pos += 1
+            local.offset = self.parse_integer()
+        if self.peek() == '~':
+            self.pos += 1
+            local.temporal = self.parse_number()
+        if self.peek() == '@':
+            self.pos += 1
+            x = self.parse_number()
+            self.expect(':')
+            local.spatial = (x, self.parse_number())
+        if self.peek() == '[' and (local.offset is not None or local.temporal is not None or local.spatial is not None):
+            start = self.pos
+            self.parse_assertion()
+            # text location assertion is kept escaped
+            local.assertion = self.s[start + 1:self.pos - 1]
+
+        return local
+
+    def parse_path(self):
+        path = [self.parse_local_path()]
+
+        while self.peek() == '!':
+            self.pos += 1
+            path.append(self.parse_local_path())
+
+        return path
+
+
+def _parse_document(content):
+    "Parses the document as XML, documents which are not well formed are parsed as HTML."
+    if isinstance(content, six.text_type):
+        content = content.encode('utf-8')
+
+    try:
+        return etree.fromstring(content, etree.XMLParser(resolve_entities=False, huge_tree=True))
+    except etree.XMLSyntaxError:
+        return parse_html_string(content)
+
+
+def _get_children(element):
+    return [child for child in element if isinstance(child.tag, six.string_types)]
+
+
+class DocumentIndex(object):
+    """
+    Element paths of one document. Document is parsed once and every element gets its path, so CFIs for
+    the same document are resolved with dictionary lookups.
+    """
+
+    def __init__(self, root):
+        """
+        :Args:
+          - root: Root element of the document
+        """
+        self.root = root
+
+        # path tuple -> element, element -> path tuple, id -> path tuple
+        self.elements = {(): root}
+        self.paths = {root: ()}
+        self.ids = {}
+        self._children = {}
+
+        uid = root.get('id')
+
+        if uid:
+            self.ids[uid] = ()
+
+        stack = [((), root)]
+
+        while stack:
+            path, element = stack.pop()
+            children = _get_children(element)
+
+            self._children[element] = children
+
+            for n, child in enumerate(children):
+                child_path = path + ((n + 1) * 2, )
+
+                self.elements[child_path] = child
+                self.paths[child] = child_path
+
+                uid = child.get('id')
+
+                if uid and uid not in self.ids:
+                    self.ids[uid] = child_path
+
+                stack.append((child_path, child))
+
+    @classmethod
+    def from_item(cls, item):
+        """
+        Returns index for the HTML document. Index is kept on the item until its content is changed.
+
+        :Args:
+          - item: Instance of EpubHtml
+        """
+        return item._get_cached('cfi', _create_index)
+
+    def get_children(self, element):
+        "Returns child elements of the element."
+        return self._children[element]
+
+    def get_chunks(self, element):
+        """
+        Returns text chunks of the element. Chunk n is the text before the child element n, last chunk
+        is the text after the last child element. Text of comments and processing instructions is
+        not included, but text after them is.
+        """
+        chunks = [element.text or '']
+
+        for child in element:
+            if isinstance(child.tag, six.string_types):
+                chunks.append(child.tail or '')
+            else:
+                chunks[-1] += child.tail or ''
+
+        return chunks
+
+    def get_element(self, steps):
+        """
+        Returns element for the steps. Id assertions are checked and if element with the asserted id
+        is somewhere else in the document, that element is returned.
+
+        :Args:
+          - steps: List of Step instances with even indexes
+
+        :Returns:
+          Returns tuple with the element and True if the path was corrected with the assertion. Raises CFIError
+          if element can not be found.
+        """
+        path = tuple(step.index for step in steps)
+        element = self.elements.get(path)
+
+        assertion = steps[-1].assertion if steps else None
+
+        if assertion and (element is None or element.get('id') != assertion):
+            corrected = self.ids.get(assertion)
+
+            if corrected is not None:
+                return self.elements[corrected], True
+
+        if element is None:
+            raise CFIError('There is no element at %s' % ''.join(str(step) for step in steps))
+
+        return element, False
+
+    def get_steps(self, element):
+        "Returns list of steps for the element, with assertions for elements with id."
+        path = self.paths[element]
+        steps = []
+        current = self.root
+
+        for index in path:
+            current = self._children[current][index // 2 - 1]
+            steps.append(Step(index, current.get('id')))
+
+        return steps
+
+    def get_local_path(self, element, offset=None):
+        """
+        Returns path to the element or to the character in its text.
+
+        :Args:
+          - element: Element from this document
+          - offset: Character offset in the text content of the element (optional)
+
+        :Returns:
+          Returns instance of LocalPath.
+        """
+        steps = self.get_steps(element)
+
+        if offset is None:
+            return LocalPath(steps)
+
+        # go down to the text chunk with the character
+        while True:
+            chunks = self.get_chunks(element)
+            children = self._children[element]
+            found = None
+
+            for n, chunk in enumerate(chunks):
+                if offset <= len(chunk) or n == len(chunks) - 1 and not children:
+                    return LocalPath(steps + [Step(n * 2 + 1)], min(offset, len(chunk)))
+
+                offset -= len(chunk)
+
+                if n < len(children):
+                    size = len(''.join(children[n].itertext()))
+
+                    if offset < size:
+                        found = children[n]
+                        break
+
+                    offset -= size
+
+            if found is None:
+                # offset is after the end of the text
+                return LocalPath(steps + [Step(len(chunks) * 2 - 1)], len(chunks[-1]))
+
+            element = found
+            steps.append(Step(self.paths[element][-1], element.get('id')))
+
+
+def _create_index(item):
+    # paths must be the same before and after the book is written, so the document is indexed as it
+    # is written in the archive, with the head before the body
+    content = item.get_content() or item.content
+
+    return DocumentIndex(_parse_document(content))
+
+
+class Location(object):
+    """
+    Place in the book where CFI points.
+
+    :Attributes:
+      - spine_index: Index in the spine
+      - item: Document from the spine
+      - element: Element in the document
+      - chunk: Index of the text chunk in the element (see DocumentIndex.get_chunks), or None
+      - offset: Character offset in the text chunk, or None
+      - corrected: True if element was found with the id assertion instead of the path
+    """
+
+    __slots__ = ('spine_index', 'item', 'element', 'chunk', 'offset', 'corrected')
+
+    def __init__(self, spine_index, item, element, chunk=None, offset=None, corrected=False):
+        self.spine_index = spine_index
+        self.item = item
+        self.element = element
+        self.chunk = chunk
+        self.offset = offset
+        self.corrected = corrected
+
+    def get_anchor(self):
+        "Returns id of the element, or of its closest ancestor with id."
+        element = self.element
+
+        while element is not None:
+            uid = element.get('id')
+
+            if uid:
+                return uid
+
+            element = element.getparent()
+
+        return None
+
+    def __repr__(self):
+        return '<Location:%d:%s:%s:%s>' % (self.spine_index, self.item.get_name(), self.chunk, self.offset)
+
+
+class CFIResolver(object):
+    """
+    Resolves and generates CFIs for the documents in the spine. Every document is parsed only once,
+    its index is kept on the item until content of the item is changed.
+
+    >>> resolver = CFIResolver(book)
+    >>> location = resolver.resolve('epubcfi(/6/4!/4/10/3:10)')
+    >>> print(location.item.get_name(), location.get_anchor(), location.offset)
+    >>> resolver.get_cfi(location.item, 'para05', 10)
+    'epubcfi(/6/4!/4[body01]/10[para05]/3:10)'
+    """
+
+    def __init__(self, book):
+        """
+        :Args:
+          - book: Instance of EpubBook
+        """
+        self.book = book
+
+        ids = dict((item.get_id(), item) for item in book.get_items())
+
+        self.items = []
+
+        for entry in book.spine:
+            if isinstance(entry, tuple):
+                entry = entry[0]
+
+            self.items.append(ids.get(entry, entry) if isinstance(entry, six.string_types) else entry)
+
+        self._spine_indexes = dict((id(item), n) for n, item in enumerate(self.items))
+
+    def get_index(self, spine_index):
+        """
+        Returns element index for the spine document.
+
+        :Args:
+          - spine_index: Index in the spine
+
+        :Returns:
+          Returns instance of DocumentIndex.
+        """
+        from ebooklib.epub import EpubHtml
+
+        if spine_index < 0 or spine_index >= len(self.items):
+            raise CFIError('There is no spine item %d' % spine_index)
+
+        item = self.items[spine_index]
+
+        if not isinstance(item, EpubHtml):
+            raise CFIError('Spine item %d is not HTML document' % spine_index)
+
+        return DocumentIndex.from_item(item)
+
+    def resolve(self, cfi):
+        """
+        Returns location for the CFI. Range is resolved to its start.
+
+        :Args:
+          - cfi: CFI as string or instance of CFI
+
+        :Returns:
+          Returns instance of Location. Raises CFIError if CFI can not be parsed or resolved.
+        """
+        if not isinstance(cfi, CFI):
+            cfi = CFI.parse(cfi)
+
+        cfi = cfi.get_start()
+
+        spine_index = cfi.get_spine_index()
+
+        if len(cfi.path) < 2:
+            if spine_index >= len(self.items):
+                raise CFIError('There is no spine item %d' % spine_index)
+
+            return Location(spine_index, self.items[spine_index], None)
+
+        index = self.get_index(spine_index)
+        local = cfi.path[1]
+
+        steps = local.steps
+        chunk = None
+
+        if steps and steps[-1].index % 2:
+            chunk = steps[-1].index // 2
+            steps = steps[:-1]
+
+        if any(step.index % 2 for step in steps):
+            raise CFIError('Text step in the middle of the path')
+
+        element, corrected = index.get_element(steps)
+
+        if chunk is not None and chunk > len(index.get_children(element)):
+            raise CFIError('There is no text chunk %d' % (chunk * 2 + 1))
+
+        return Location(spine_index, self.items[spine_index], element, chunk, local.offset, corrected)
+
+    def resolve_many(self, cfis):
+        """
+        Resolves many CFIs. Every document is parsed only once.
+
+        :Args:
+          - cfis: List of CFIs as strings or instances of CFI
+
+        :Returns:
+          Returns list of Location instances, None for the CFIs which could not be resolved.
+        """
+        locations = []
+
+        for cfi in cfis:
+            try:
+                locations.append(self.resolve(cfi))
+            except CFIError:
+                locations.append(None)
+
+        return locations
+
+    def get_spine_index(self, item):
+        """
+        Returns index of the item in the spine.
+
+        :Args:
+          - item: Item from the book
+
+        :Returns:
+          Returns index as number. Raises CFIError if item is not in the spine.
+        """
+        spine_index = self._spine_indexes.get(id(item))
+
+        if spine_index is None:
+            raise CFIError('Item %s is not in the spine' % item.get_name())
+
+        return spine_index
+
+    def get_cfi(self, item, target=None, offset=None):
+        """
+        Returns CFI for the document, element or character in the text. Without target and offset CFI
+        points to the spine item.
+
+        :Args:
+          - item: Document from the spine
+          - target: Id of the element or element from the DocumentIndex (optional)
+          - offset: Character offset in the text content of the element, or of the body if target is not given (optional)
+
+        :Returns:
+          Returns instance of CFI. Raises CFIError if element can not be found.
+        """
+        spine_index = self.get_spine_index(item)
+        spine_path = LocalPath([Step(SPINE_STEP), Step((spine_index + 1) * 2)])
+
+        if target is None and offset is None:
+            return CFI([spine_path])
+
+        index = self.get_index(spine_index)
+
+        if target is None:
+            element = self._get_body(index)
+        elif isinstance(target, six.string_types):
+            path = index.ids.get(target)
+
+            if path is None:
+                raise CFIError('There is no element with id %s in %s' % (target, item.get_name()))
+
+            element = index.elements[path]
+        else:
+            element = target
+
+            if element not in index.paths:
+                raise CFIError('Element is not from the index of %s' % item.get_name())
+
+        return CFI([spine_path, index.get_local_path(element, offset)])
+
+    def _get_body(self, index):
+        for child in index.get_children(index.root):
+            if etree.QName(child).localname == 'body':
+                return child
+
+        return index.root
@@ -0,0 +1,478 @@
+# This file is part of EbookLib.
+# Copyright (c) 2013 Aleksandar Erkalovic <aerkalov@gmail.com>
+#
+# EbookLib is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# EbookLib is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with EbookLib.  If not, see <http://www.gnu.org/licenses/>.
+
+# Conversion of the HTML documents to Markdown and plain text, without external programs.
+
+import os
+import re
+import multiprocessing
+import posixpath as zip_path
+
+import six
+from lxml import etree
+
+from ebooklib.utils import parse_html_string
+from ebooklib.text import iter_blocks, SKIP_TAGS
+from ebooklib.references import is_external
+
+
+FORMATS = {'markdown': '.md', 'text': '.txt'}
+
+# Extensions of the documents, links to them are changed to links to the converted files
+DOCUMENT_EXTENSIONS = frozenset(['.xhtml', '.html', '.htm'])
+
+_BLOCK_TAGS = frozenset(['address', 'article', 'aside', 'blockquote', 'body', 'dd', 'div', 'dl', 'dt', 'figcaption',
+                         'figure', 'footer', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'header', 'hr', 'li', 'main',
+                         'nav', 'ol', 'p', 'pre', 'section', 'table', 'ul'])
+
+_EMPHASIS_TAGS = frozenset(['em', 'i', 'cite', 'dfn', 'var'])
+_STRONG_TAGS = frozenset(['strong', 'b'])
+_CODE_TAGS = frozenset(['code', 'kbd', 'samp', 'tt'])
+
+# line break inside of the paragraph, it can not be in the text of the parsed document
+_BREAK = '\x00'
+
+# characters of the text which would be read as Markdown syntax or as raw HTML and entities
+_ESCAPE_RE = re.compile(r'([\\`*_\[\]<&])')
+# text at the start of the line which would be read as Markdown syntax, lines with only - or =
+# would be thematic break or underline of the heading, runs of * are already escaped
+_LINE_START_RE = re.compile(r'^(?:#|>|[-+]\s|-+$|=+$|\d+(?=\.\s))')
+
+
+def _escape_line_start(match):
+    value = match.group(0)
+
+    # number of the ordered list is escaped after the number
+    return value + '\\' if value.isdigit() else '\\' + value
+
+
+def _escape(text):
+    return _ESCAPE_RE.sub(r'\\\1', text)
+
+
+def _collapse(text):
+    return ' '.join(text.split())
+
+
+def _collapse_line(text):
+    return _collapse(text.replace(_BREAK, ' '))
+
+
+def _get_tag(element):
+    tag = element.tag
+
+    if not isinstance(tag, six.string_types):
+        return None
+
+    return tag[tag.rfind('}') + 1:].lower()
+
+
+def _indent(text, first, rest):
+    lines = text.split('\n')
+
+    return '\n'.join([first + lines[0]] + [(rest + line if line else line) for line in lines[1:]])
+
+
+def rewrite_link(href, extension='.md'):
+    """
+    Returns link to the converted document for links to the HTML documents, other links are not changed.
+
+    >>> rewrite_link('chapter_01.xhtml#note_2')
+    'chapter_01.md#note_2'
+
+    :Args:
+      - href: Link from the document
+      - extension: Extension of the converted documents (optional). Default value is ".md".
+    """
+    if not href or is_external(href):
+        return href
+
+    path, sep, fragment = href.partition('#')
+    base, ext = zip_path.splitext(path)
+
+    if ext.lower() in DOCUMENT_EXTENSIONS:
+        path = base + extension
+
+    return path + sep + fragment
+
+
+class MarkdownConverter(object):
+    """
+    Converts parsed HTML document to Markdown. Headings, paragraphs, lists, block quotes, preformatted
+    text, tables, emphasis, code, links and images are converted, for other elements only their
+    text is used.
+
+    >>> MarkdownConverter().convert(chapter.content)
+    """
+
+    def __init__(self, link_func=None):
+        """
+        :Args:
+          - link_func: Function which gets href or src of the link or image and returns new value (optional)
+        """
+        self.link_func = link_func
+
+    def _link(self, href):
+        if self.link_func is not None:
+            href = self.link_func(href)
+
+        return href.replace(' ', '%20').replace(')', '%29')
+
+    def _inline(self, element):
+        "Returns Markdown for the content of the inline element, without its tail."
+        parts = [_escape(element.text or '')]
+
+        for child in element:
+            parts.append(self._inline_element(child))
+            parts.append(_escape(child.tail or ''))
+
+        return ''.join(parts)
+
+    def _inline_element(self, element):
+        tag = _get_tag(element)
+
+        if tag is None or tag in SKIP_TAGS:
+            return ''
+
+        if tag == 'br':
+            return _BREAK
+
+        if tag == 'img':
+            src = element.get('src')
+
+            if not src:
+                return ''
+
+            return '![%s](%s)' % (_escape(_collapse(element.get('alt', ''))), self._link(src))
+
+        if tag in _CODE_TAGS:
+            text = _collapse(''.join(element.itertext()))
+            fence = '``' if '`' in text else '`'
+
+            return '%s%s%s' % (fence, text, fence) if text else ''
+
+        content = self._inline(element)
+
+        if tag in _EMPHASIS_TAGS or tag in _STRONG_TAGS:
+            text = _collapse(content)
+
+            if not text:
+                return content
+
+            marker = '*' if tag in _EMPHASIS_TAGS else '**'
+            # markers must touch the text, white space goes outside of them
+            before = ' ' if content[:1].isspace() else ''
+            after = ' ' if content[-1:].isspace() else ''
+
+            return '%s%s%s%s%s' % (before, marker, text, marker, after)
+
+        if tag == 'a' and element.get('href'):
+            text = _collapse_line(content)
+
+            if not text:
+                return ''
+
+            return '[%s](%s)' % (text, self._link(element.get('href')))
+
+        return content
+
+    def _paragraph(self, parts):
+        lines = []
+
+        for line in ''.join(parts).split(_BREAK):
+            line = _collapse(line)
+
+            # empty lines would end the paragraph
+            if line:
+                lines.append(_LINE_START_RE.sub(_escape_line_start, line, 1))
+
+        return '  \n'.join(lines)
+
+    def _blocks(self, element):
+        "Returns list of Markdown blocks for the content of the element."
+        blocks = []
+        parts = [_escape(element.text or '')]
+
+        def _flush():
+            text = self._paragraph(parts)
+
+            if text:
+                blocks.append(text)
+
+            del parts[:]
+
+        for child in element:
+            tag = _get_tag(child)
+
+            if tag in _BLOCK_TAGS:
+                _flush()
+                block = self._block(child, tag)
+
+                if block:
+                    blocks.append(block)
+            else:
+                parts.append(self._inline_element(child))
+
+            parts.append(_escape(child.tail or ''))
+
+        _flush()
+
+        return blocks
+
+    def _list(self, element, ordered):
+        items = []
+        number = int(element.get('start', '1')) if (element.get('start') or '').isdigit() else 1
+
+        for child in element:
+            if _get_tag(child) != 'li':
+                continue
+
+            marker = '%d. ' % number if ordered else '- '
+            number += 1
+
+            text = '\n\n'.join(self._blocks(child))
+            items.append(_indent(text, marker, ' ' * len(marker)))
+
+        return '\n'.join(items)
+
+    def _table(self, element):
+        rows = []
+
+        for row in element.iter(etree.Element):
+            if _get_tag(row) != 'tr':
+                continue
+
+            cells = [_collapse_line(self._inline(cell)).replace('|', '\\|') for cell in row
+                     if _get_tag(cell) in ('td', 'th')]
+
+            if cells:
+                rows.append(cells)
+
+        if not rows:
+            return ''
+
+        width = max(len(row) for row in rows)
+        lines = []
+
+        for n, row in enumerate(rows):
+            lines.append('| %s |' % ' | '.join(row + [''] * (width - len(row))))
+
+            if n == 0:
+                lines.append('|%s' % ('---|' * width))
+
+        return '\n'.join(lines)
+
+    def _block(self, element, tag):
+        if tag in ('h1', 'h2', 'h3', 'h4', 'h5', 'h6'):
+            text = _collapse_line(self._inline(element))
+
+            return '%s %s' % ('#' * int(tag[1]), text) if text else ''
+
+        if tag == 'hr':
+            return '---'
+
+        if tag == 'pre':
+            text = ''.join(element.itertext()).strip('\n')
+            fence = '````' if '```' in text else '```'
+
+            return '%s\n%s\n%s' % (fence, text, fence)
+
+        if tag == 'blockquote':
+            text = '\n\n'.join(self._blocks(element))
+
+            return '\n'.join('> ' + line if line else '>' for line in text.split('\n')) if text else ''
+
+        if tag in ('ul', 'ol'):
+            return self._list(element, tag == 'ol')
+
+        if tag == 'table':
+            return self._table(element)
+
+        return '\n\n'.join(self._blocks(element))
+
+    def convert(self, content):
+        """
+        Returns Markdown for the HTML document.
+
+        :Args:
+          - content: HTML document as string or bytes
+
+        :Returns:
+          Returns Markdown as string.
+        """
+        if not content:
+            return ''
+
+        try:
+            tree = parse_html_string(content)
+        except (etree.LxmlError, ValueError):
+            # documents with only white space or comments, same as in html_to_text
+            return ''
+
+        body = tree.find('body')
+
+        if body is None:
+            return ''
+
+        text = '\n\n'.join(self._blocks(body))
+
+        return text + '\n' if text else ''
+
+
+def html_to_markdown(content, link_func=None):
+    """
+    Returns Markdown for the HTML document.
+
+    :Args:
+      - content: HTML document as string or bytes
+      - link_func: Function which gets href or src of the link or image and returns new value (optional)
+
+    :Returns:
+      Returns Markdown as string.
+    """
+    return MarkdownConverter(link_func).convert(content)
+
+
+def html_to_text(content):
+    """
+    Returns plain text of the HTML document, blocks of text are separated with empty lines.
+
+    :Args:
+      - content: HTML document as string or bytes
+
+    :Returns:
+      Returns text as string.
+    """
+    text = '\n\n'.join(text for _, text in iter_blocks(content))
+
+    return text + '\n' if text else ''
+
+
+def get_output_name(name, output_format='markdown'):
+    """
+    Returns name of the converted document.
+
+    :Args:
+      - name: Name of the HTML document
+      - output_format: "markdown" or "text" (optional). Default value is "markdown".
+    """
+    return zip_path.splitext(name)[0] + FORMATS[output_format]
+
+
+def _convert(task):
+    "Converts one document. Runs in the worker process, so it must be a module level function."
+    name, content, output_format = task
+
+    if output_format == 'text':
+        text = html_to_text(content)
+    else:
+        extension = FORMATS[output_format]
+        text = html_to_markdown(content, lambda href: rewrite_link(href, extension))
+
+    return get_output_name(name, output_format), text
+
+
+def _get_path(directory, name):
+    "Returns path of the output file, names are relative to the OPF file and can not go outside of the directory."
+    name = zip_path.normpath(name).lstrip('/')
+
+    while name.startswith('../'):
+        name = name[3:]
+
+    return os.path.join(directory, *name.split('/'))
+
+
+def _write_file(path, content):
+    dir_name = os.path.dirname(path)
+
+    if dir_name and not os.path.isdir(dir_name):
+        os.makedirs(dir_name)
+
+    with open(path, 'wb') as f:
+        f.write(content)
+
+
+def convert_book(book, directory, options=None):
+    """
+    Converts HTML documents of the book to Markdown or plain text files in the directory. Links between
+    the documents are changed to links between the converted files and other files are written
+    with the same names, so links to images still work.
+
+    >>> convert_book(epub.read_epub('book.epub'), 'book_md', {'processes': 4})
+
+    Options:
+      - format: "markdown" or "text". Default value is "markdown".
+      - resources: Write images, style sheets and other files. Default value is True.
+      - processes: Number of worker processes. By default number of CPUs is used, with 1 documents are
+        converted in this process.
+
+    :Args:
+      - book: Instance of EpubBook
+      - directory: Output directory
+      - options: Options as dictionary (optional)
+
+    :Returns:
+      Returns dictionary with number of converted documents, written resources and bytes.
+    """
+    from ebooklib.epub import EpubHtml, EpubNcx
+
+    options = dict({'format': 'markdown', 'resources': True, 'processes': None}, **(options or {}))
+    output_format = options['format']
+
+    if output_format not in FORMATS:
+        raise ValueError('Unknown format "%s"' % output_format)
+
+    stats = {'documents': 0, 'resources': 0, 'bytes': 0}
+
+    def _write(name, content):
+        if isinstance(content, six.text_type):
+            content = content.encode('utf-8')
+
+        _write_file(_get_path(directory, name), content)
+        stats['bytes'] += len(content)
+
+    tasks = []
+
+    for item in book.get_items():
+        if isinstance(item, EpubHtml):
+            tasks.append((item.get_name(), item.content, output_format))
+        elif options['resources'] and not isinstance(item, EpubNcx) and item.content:
+            _write(item.get_name(), item.get_content())
+            stats['resources'] += 1
+
+    processes = options['processes']
+
+    if processes is None:
+        processes = min(multiprocessing.cpu_count(), len(tasks))
+
+    pool = None
+
+    if processes > 1:
+        pool = multiprocessing.Pool(processes)
+        results = pool.imap_unordered(_convert, tasks, chunksize=4)
+    else:
+        results = six.moves.map(_convert, tasks)
+
+    try:
+        for name, text in results:
+            _write(name, text)
+            stats['documents'] += 1
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    return stats
@@ -0,0 +1,101 @@
+# This file is part of EbookLib.
+# Copyright (c) 2013 Aleksandar Erkalovic <aerkalov@gmail.com>
+#
+# EbookLib is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# EbookLib is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with EbookLib.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import sqlite3
+
+
+class BookDatabase(object):
+    """
+    Base class for the SQLite databases with one row for every EPUB file in the books table.
+
+    Subclasses define SCHEMA, SCHEMA_VERSION, TABLES and KNOWN_COLUMNS and implement _delete_book.
+    Database with other schema version is created again.
+    """
+
+    # SQL script which creates the tables
+    SCHEMA = ''
+    SCHEMA_VERSION = 1
+    # tables which are dropped when schema version is changed, in this order
+    TABLES = ('books', )
+    # columns of the books table which tell if the book was changed
+    KNOWN_COLUMNS = ()
+
+    def __init__(self, path):
+        """
+        :Args:
+          - path: Path to the database file
+        """
+        self.path = path
+
+        self._db = sqlite3.connect(path)
+        self._create()
+
+    def _create(self):
+        version = self._db.execute('PRAGMA user_version').fetchone()[0]
+
+        if version not in (0, self.SCHEMA_VERSION):
+            self._db.executescript(''.join('DROP TABLE IF EXISTS %s;' % table for table in self.TABLES))
+
+        self._db.executescript(self.SCHEMA)
+        self._db.execute('PRAGMA user_version = %d' % self.SCHEMA_VERSION)
+        self._db.commit()
+
+    def _get_known(self):
+        "Returns dictionary where key is the path and value is tuple with id of the book and KNOWN_COLUMNS."
+        columns = ''.join(', ' + column for column in self.KNOWN_COLUMNS)
+
+        return dict((row[1], (row[0], ) + tuple(row[2:]))
+                    for row in self._db.execute('SELECT id, path%s FROM books' % columns))
+
+    def _delete_book(self, book_id):
+        "Removes the book and all its rows from other tables. Called inside of the transaction."
+        raise NotImplementedError
+
+    def remove(self, paths):
+        """
+        Removes books from the database.
+
+        :Args:
+          - paths: List of paths to the EPUB files
+
+        :Returns:
+          Returns number of removed books.
+        """
+        known = self._get_known()
+        removed = 0
+
+        with self._db:
+            for path in paths:
+                value = known.get(os.path.abspath(path))
+
+                if value is not None:
+                    self._delete_book(value[0])
+                    removed += 1
+
+        return removed
+
+    def close(self):
+        "Closes the database."
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -14,10 +14,17 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with EbookLib.  If not, see <http://www.gnu.org/licenses/>.
 
+import re
 import zipfile
+import zlib
+import hashlib
+import struct
 import six
 import logging
 import uuid
+import threading
+import gc
+import sys
 import posixpath as zip_path
 import os.path
 from collections import OrderedDict
@@ -31,7 +38,9 @@ from lxml import etree
 
 import ebooklib
 
-from ebooklib.utils import parse_string, parse_html_string, guess_type
+from ebooklib.utils import parse_string, parse_html_string, iterparse_string, guess_type, get_size
+from ebooklib.metrics import clock, timer, get_plugin_name
+from ebooklib.storage import CompressedContent, ContentCache
 
 
 # Version of EPUB library
@@ -82,15 +91,32 @@ COVER_XML = six.b('''<?xml version="1.0" encoding="UTF-8"?>
 IMAGE_MEDIA_TYPES = ['image/jpeg', 'image/jpg', 'image/png', 'image/svg+xml']
 
 
+# used to cut the content of BODY element from the document
+_BODY_START_RE = re.compile(six.b(r'<body(?:\s[^>]*)?>'), re.IGNORECASE)
+_BODY_END_RE = re.compile(six.b(r'</body\s*>'), re.IGNORECASE)
+
+# local file header of the zip archive, names of the files and extra fields are after it
+_ZIP_HEADER = struct.Struct('<4s2B4HL2L2H')
+_ZIP_HEADER_SIGNATURE = six.b('PK\003\004')
+
+
 # TOC elements
 
+# marks the end of iteration while walking the TOC
+_END = object()
+
+
 class Section(object):
+    __slots__ = ('title', 'href')
+
     def __init__(self, title, href=''):
         self.title = title
         self.href = href
 
 
 class Link(object):
+    __slots__ = ('href', 'title', 'uid')
+
     def __init__(self, href, title, uid=None):
         self.href = href
         self.title = title
@@ -114,6 +140,12 @@ class EpubItem(object):
     Base class for the items in a book.
     """
 
+    # Books can hold a lot of items so we keep them compact. Because of '__dict__' it is still possible
+    # to set custom attributes on the item, dictionary is only allocated when that happens. Because of
+    # '__weakref__' items can still be weakly referenced.
+    __slots__ = ('id', 'file_name', 'media_type', '_content', '_cache', 'is_linear', 'manifest', 'book',
+                 '__dict__', '__weakref__')
+
     def __init__(self, uid=None, file_name='', media_type='', content=six.b(''), manifest=True):
         """
         :Args:
@@ -132,6 +164,54 @@ class EpubItem(object):
 
         self.book = None
 
+    @property
+    def content(self):
+        "Content of the item. Content kept as CompressedContent is decompressed every time it is accessed."
+        content = self._content
+
+        if isinstance(content, CompressedContent):
+            return content.get()
+
+        return content
+
+    @content.setter
+    def content(self, value):
+        old = getattr(self, '_content', None)
+
+        # decompressed copy of the old content is not needed anymore
+        if isinstance(old, CompressedContent) and old.cache is not None and old is not value:
+            old.cache.discard(old)
+
+        self._content = value
+        # values calculated from the old content, like statistics
+        self._cache = None
+
+    def is_compressed(self):
+        """
+        Returns if content of this item is kept compressed in memory.
+
+        :Returns:
+          Returns True or False.
+        """
+        return isinstance(self._content, CompressedContent)
+
+    def _get_cached(self, key, func):
+        """
+        Returns value calculated from the content of this item. Value is calculated with func(item) only
+        once and calculated again after the content is changed.
+        """
+        cache = self._cache
+
+        if cache is None:
+            cache = self._cache = {}
+
+        value = cache.get(key)
+
+        if value is None:
+            value = cache[key] = func(self)
+
+        return value
+
     def get_id(self):
         """
         Returns unique identifier for this item.
@@ -201,6 +281,36 @@ class EpubItem(object):
         """
         self.content = content
 
+    def _get_memory_usage(self, seen):
+        """
+        Returns approximate memory usage of this item as dictionary with keys:
+          - object: item itself with all the attributes except content
+          - raw: uncompressed content
+          - compressed: compressed content
+          - cache: values calculated from the content and cached on the item
+
+        :Args:
+          - seen: Set with ids of already counted objects, shared content is counted only once.
+        """
+        content = self._content
+        cache = self._cache
+
+        referents = [r for r in gc.get_referents(self) if r is not content and r is not cache and r is not self.book]
+        usage = {'object': sys.getsizeof(self) + get_size(referents, skip=(EpubItem, EpubBook), seen=seen),
+                 'raw': 0,
+                 'compressed': 0,
+                 'cache': get_size([cache], skip=(EpubItem, EpubBook), seen=seen) if cache else 0}
+
+        if isinstance(content, CompressedContent):
+            usage['compressed'] = get_size([content], skip=(ContentCache, ), seen=seen)
+
+            if content.cache is not None:
+                usage['cache'] += get_size([content.cache.peek(content)], seen=seen)
+        else:
+            usage['raw'] = get_size([content], seen=seen)
+
+        return usage
+
     def __str__(self):
         return '<EpubItem:%s>' % self.id
 
@@ -208,6 +318,8 @@ class EpubItem(object):
 class EpubNcx(EpubItem):
     "Represents Navigation Control File (NCX) in the EPUB."
 
+    __slots__ = ()
+
     def __init__(self, uid='ncx', file_name='toc.ncx'):
         super(EpubNcx, self).__init__(uid=uid, file_name=file_name, media_type="application/x-dtbncx+xml")
 
@@ -220,6 +332,8 @@ class EpubCover(EpubItem):
     Represents Cover image in the EPUB file.
     """
 
+    __slots__ = ()
+
     def __init__(self, uid='cover-img', file_name=''):
         super(EpubCover, self).__init__(uid=uid, file_name=file_name)
 
@@ -233,6 +347,8 @@ class EpubHtml(EpubItem):
     """
     _template_name = 'chapter'
 
+    __slots__ = ('title', 'lang', 'direction', '_links', '_properties')
+
     def __init__(self, uid=None, file_name='', media_type='', content=None, title='', lang=None, direction=None):
         super(EpubHtml, self).__init__(uid, file_name, media_type, content)
 
@@ -240,8 +356,33 @@ class EpubHtml(EpubItem):
         self.lang = lang
         self.direction = direction
 
-        self.links = []
-        self.properties = []
+        # lists are created only when somebody asks for them
+        self._links = None
+        self._properties = None
+
+    @property
+    def links(self):
+        "List of additional links for this document."
+        if self._links is None:
+            self._links = []
+
+        return self._links
+
+    @links.setter
+    def links(self, value):
+        self._links = value
+
+    @property
+    def properties(self):
+        "List of manifest properties for this document."
+        if self._properties is None:
+            self._properties = []
+
+        return self._properties
+
+    @properties.setter
+    def properties(self, value):
+        self._properties = value
 
     def is_chapter(self):
         """
@@ -294,7 +435,7 @@ class EpubHtml(EpubItem):
         :Returns:
           As tuple return list of links.
         """
-        return (link for link in self.links)
+        return (link for link in self._links or ())
 
     def get_links_of_type(self, link_type):
         """
@@ -303,7 +444,7 @@ class EpubHtml(EpubItem):
         :Returns:
           As tuple returns list of links.
         """
-        return (link for link in self.links if link.get('type', '') == link_type)
+        return (link for link in self._links or () if link.get('type', '') == link_type)
 
     def add_item(self, item):
         """
@@ -322,12 +463,32 @@ class EpubHtml(EpubItem):
         """
         Returns content of BODY element for this HTML document. Content will be of type 'str' (Python 2) or 'bytes' (Python 3).
 
+        Content is cut from the document as it is, without parsing. Only documents which do not have
+        BODY element are parsed.
+
         :Returns:
           Returns content of this document.
         """
+        content = self.content
+
+        if not content:
+            return ''
+
+        if isinstance(content, six.text_type):
+            content = content.encode('utf-8')
+
+        start = _BODY_START_RE.search(content)
+
+        if start is not None:
+            end = None
+
+            for end in _BODY_END_RE.finditer(content, start.end()):
+                pass
+
+            return content[start.end():end.start() if end is not None else len(content)]
 
         try:
-            html_tree = parse_html_string(self.content)
+            html_tree = parse_html_string(content)
         except:
             return ''
 
@@ -383,7 +544,7 @@ class EpubHtml(EpubItem):
             _title = etree.SubElement(_head, 'title')
             _title.text = self.title
 
-        for lnk in self.links:
+        for lnk in self.get_links():
             if lnk.get("type") == "text/javascript":
                 _lnk = etree.SubElement(_head, 'script', lnk)
                 # force <script></script>
@@ -423,6 +584,8 @@ class EpubCoverHtml(EpubHtml):
     Represents Cover page in the EPUB file.
     """
 
+    __slots__ = ('image_name', )
+
     def __init__(self, uid='cover', file_name='cover.xhtml', image_name='', title='Cover'):
         super(EpubCoverHtml, self).__init__(uid=uid, file_name=file_name, title=title)
 
@@ -470,6 +633,8 @@ class EpubNav(EpubHtml):
     Represents Navigation Document in the EPUB file.
     """
 
+    __slots__ = ()
+
     def __init__(self, uid='nav', file_name='nav.xhtml', media_type="application/xhtml+xml"):
         super(EpubNav, self).__init__(uid=uid, file_name=file_name, media_type=media_type)
 
@@ -492,6 +657,8 @@ class EpubImage(EpubItem):
     Represents Image in the EPUB file.
     """
 
+    __slots__ = ()
+
     def __init__(self):
         super(EpubImage, self).__init__()
 
@@ -533,6 +700,8 @@ class EpubBook(object):
         self.language = 'en'
         self.direction = None
 
+        self._search_index = None
+
         self.templates = {
             'ncx': NCX_XML,
             'nav': NAV_XML,
@@ -743,6 +912,84 @@ class EpubBook(object):
         """
         return (item for item in self.items)
 
+    def iter_text(self, spine_order=True, blocks=False):
+        """
+        Returns text of the HTML documents, one document at a time. Documents are parsed without
+        building the tree.
+
+        >>> for item, text in book.iter_text():
+        ...     print(item.get_name(), len(text))
+
+        >>> for item, blocks in book.iter_text(blocks=True):
+        ...     for anchor, text in blocks:
+        ...         print(anchor, text)
+
+        :Args:
+          - spine_order: Return documents from the spine in reading order (optional). Otherwise all HTML documents
+            from the manifest are returned. Default value is True.
+          - blocks: Return list of (anchor, text) tuples for every block of text instead of plain text (optional).
+            Anchor is the id of the last element with id before the text.
+
+        :Returns:
+          Returns iterator over (item, text) tuples.
+        """
+        from ebooklib.text import iter_text
+
+        return iter_text(self, spine_order, blocks)
+
+    def search_index(self, rebuild=False):
+        """
+        Returns full text search index for the documents in the spine. Index is created on the first
+        call and documents are indexed only when search needs them.
+
+        >>> for result in book.search_index().search('rabbit*'):
+        ...     print(result.item.get_name(), result.anchor, result.snippet)
+
+        :Args:
+          - rebuild: Create new index, needed after content of the documents was changed (optional)
+
+        :Returns:
+          Returns instance of ebooklib.search.SearchIndex.
+        """
+        if self._search_index is None or rebuild:
+            from ebooklib.search import SearchIndex
+
+            self._search_index = SearchIndex(self)
+
+        return self._search_index
+
+    def position_index(self):
+        """
+        Returns index for conversion between percent of the book, location in the spine document and
+        anchors. Text offsets of every document are kept on the item until its content is changed,
+        so index for the unchanged book is created without parsing the documents again.
+
+        >>> index = book.position_index()
+        >>> spine_index, offset = index.get_location(42.5)
+
+        :Returns:
+          Returns instance of ebooklib.position.PositionIndex.
+        """
+        from ebooklib.position import PositionIndex
+
+        return PositionIndex.from_book(self)
+
+    def get_stats(self):
+        """
+        Returns word and character counts, reading time and page estimates for the documents in the
+        spine. Statistics for every document are kept on the item until its content is changed, so
+        calling this again is cheap.
+
+        >>> stats = book.get_stats()
+        >>> print(stats.words, stats.get_reading_time(words_per_minute=200), stats.get_page_count())
+
+        :Returns:
+          Returns instance of ebooklib.stats.BookStats.
+        """
+        from ebooklib.stats import BookStats
+
+        return BookStats(self)
+
     def get_items_of_type(self, item_type):
         """
         Returns all items of specified type.
@@ -769,6 +1016,168 @@ class EpubBook(object):
         """
         return (item for item in self.items if item.media_type == media_type)
 
+    def deduplicate(self):
+        """
+        Removes items with the same content as some other item in the book and changes all references
+        to the removed items so they point to the item which was kept. Only resources like images, fonts
+        and style sheets are removed, HTML documents and NCX are never touched.
+
+        >>> report = book.deduplicate()
+        >>> report['bytes_saved']
+        1048576
+
+        :Returns:
+          Returns dictionary with removed items as list of (removed item, kept item) tuples and number of
+          bytes saved.
+        """
+        from ebooklib.references import rewrite_references
+
+        groups = OrderedDict()
+
+        for item in self.items:
+            if isinstance(item, (EpubHtml, EpubNcx)) or not item.manifest or not item.content:
+                continue
+
+            content = item.content
+
+            if isinstance(content, six.text_type):
+                content = content.encode('utf-8')
+
+            key = (item.media_type, len(content), hashlib.sha1(content).digest())
+            groups.setdefault(key, []).append(item)
+
+        removed = []
+        names = {}
+        ids = {}
+
+        for group in groups.values():
+            if len(group) < 2:
+                continue
+
+            # cover image is referenced from the metadata so we keep it
+            kept = next((item for item in group if isinstance(item, EpubCover)), group[0])
+
+            for item in group:
+                if item is not kept:
+                    removed.append((item, kept))
+                    names[item.get_name()] = kept.get_name()
+                    ids[item.get_id()] = kept.get_id()
+
+        if not removed:
+            return {'removed': [], 'bytes_saved': 0}
+
+        kept_items = dict((id(item), kept) for item, kept in removed)
+        self.items = [item for item in self.items if id(item) not in kept_items]
+
+        def _get_kept(entry):
+            if isinstance(entry, EpubItem):
+                return kept_items.get(id(entry), entry)
+
+            return ids.get(entry, entry)
+
+        self.spine = [(_get_kept(entry[0]), ) + entry[1:] if isinstance(entry, tuple) else _get_kept(entry)
+                      for entry in self.spine]
+
+        # <meta name="cover" content="..."/>, reader and set_cover keep it under different names
+        for values in self.metadata.values():
+            for entries in values.values():
+                for value, others in entries:
+                    if others and others.get('name') == 'cover' and others.get('content') in ids:
+                        others['content'] = ids[others['content']]
+
+        rewrite_references(self, names)
+
+        return {'removed': removed,
+                'bytes_saved': sum(len(item.content) for item, _ in removed)}
+
+    def relocate(self, mapping):
+        """
+        Changes file names of the items and all references to them. Each document and style sheet is
+        parsed only once. Relative references inside of the moved files are changed to work from the
+        new location.
+
+        >>> book.relocate({'image_01.jpg': 'images/image_01.jpg',
+        ...                'text/chapter_01.xhtml': 'chapter_01.xhtml'})
+
+        :Args:
+          - mapping: Dictionary with current file names as keys and new file names as values
+
+        :Returns:
+          Returns number of changed references.
+        """
+        from ebooklib.references import rewrite_references
+
+        items = dict((item.get_name(), item) for item in self.items)
+        mapping = dict((old, zip_path.normpath(new)) for old, new in six.iteritems(mapping) if old != new)
+
+        for old, new in six.iteritems(mapping):
+            if old not in items:
+                raise EpubException(-1, 'Can not find item "%s"' % old)
+
+            if new in items and new not in mapping:
+                raise EpubException(-1, 'Item "%s" already exists' % new)
+
+        if len(set(mapping.values())) != len(mapping):
+            raise EpubException(-1, 'Many items can not have the same name')
+
+        changed = rewrite_references(self, mapping)
+
+        for old, new in six.iteritems(mapping):
+            items[old].file_name = new
+
+        return changed
+
+    def memory_report(self, largest=10):
+        """
+        Returns approximate number of bytes retained by this book. Content which is shared between
+        items is counted only once.
+
+        >>> report = book.memory_report()
+        >>> report['types'][ebooklib.ITEM_IMAGE]['raw']
+
+        Report is a dictionary with keys:
+          - total: all bytes retained by the book
+          - types: for every item type (ebooklib.ITEM_*) number of items and bytes used by the
+            item objects (object), uncompressed content (raw), compressed content (compressed) and
+            cached values (cache)
+          - metadata, toc, spine, guide: bytes used by these structures
+          - largest: list of (item, bytes) tuples for the largest items
+
+        :Args:
+          - largest: Number of largest items to include in the report (optional). Default value is 10.
+
+        :Returns:
+          Returns report as dictionary.
+        """
+        seen = set()
+        types = {}
+        sizes = []
+
+        for item in self.items:
+            usage = item._get_memory_usage(seen)
+            item_total = sum(usage.values())
+
+            values = types.setdefault(item.get_type(), {'count': 0, 'object': 0, 'raw': 0, 'compressed': 0, 'cache': 0, 'total': 0})
+            values['count'] += 1
+            values['total'] += item_total
+
+            for key, value in six.iteritems(usage):
+                values[key] += value
+
+            sizes.append((item, item_total))
+
+        report = {'types': types,
+                  'metadata': get_size([self.metadata], seen=seen),
+                  'toc': get_size([self.toc], skip=(EpubItem, ), seen=seen),
+                  'spine': get_size([self.spine], skip=(EpubItem, ), seen=seen),
+                  'guide': get_size([self.guide], skip=(EpubItem, ), seen=seen),
+                  'largest': sorted(sizes, key=lambda s: s[1], reverse=True)[:largest]}
+
+        report['total'] = sum(values['total'] for values in types.values()) + \
+            report['metadata'] + report['toc'] + report['spine'] + report['guide']
+
+        return report
+
     def set_template(self, name, value):
         """
         Defines templates which are used to generate certain types of pages. When defining new value for the template
@@ -830,17 +1239,63 @@ class EpubWriter(object):
         if options:
             self.options.update(options)
 
+        self.metrics = self.options.get('metrics')
+
+        # ids of the items which are not written
+        self._pruned = set()
+        self._pages = None
+
     def process(self):
         # should cache this html parsing so we don't do it for every plugin
-        for plg in self.options.get('plugins', []):
-            if hasattr(plg, 'before_write'):
-                plg.before_write(self.book)
+        with timer(self.metrics, 'plugins'):
+            self._process_book()
+
+            for item in self.book.get_items():
+                self._process_item(item)
+
+    def _get_items(self):
+        return (item for item in self.book.get_items() if id(item) not in self._pruned)
+
+    def _prune_unreferenced(self):
+        from ebooklib.references import ReferenceGraph
+
+        graph = ReferenceGraph(self.book)
 
+        # documents are always kept, so everything they reference is kept too
         for item in self.book.get_items():
             if isinstance(item, EpubHtml):
-                for plg in self.options.get('plugins', []):
-                    if hasattr(plg, 'html_before_write'):
-                        plg.html_before_write(self.book, item)
+                graph.roots.add(item.get_name())
+
+        self._pruned = set(id(item) for item in graph.get_unreferenced())
+
+        if self.metrics is not None:
+            self.metrics.count('pruned', len(self._pruned))
+
+    def _get_pages(self):
+        "Returns list of (page number, href) tuples for the page list, empty if option chars_per_page is not set."
+        if self._pages is None:
+            chars_per_page = self.options.get('chars_per_page')
+            self._pages = []
+
+            if chars_per_page:
+                with timer(self.metrics, 'stats'):
+                    stats = self.book.get_stats()
+
+                for number, item, anchor in stats.get_pages(chars_per_page):
+                    self._pages.append((number, item.file_name + ('#' + anchor if anchor else '')))
+
+        return self._pages
+
+    def _process_book(self):
+        for plg in self.options.get('plugins', []):
+            if hasattr(plg, 'before_write'):
+                _run_plugin(self.metrics, plg, 'before_write', self.book)
+
+    def _process_item(self, item):
+        if isinstance(item, EpubHtml):
+            for plg in self.options.get('plugins', []):
+                if hasattr(plg, 'html_before_write'):
+                    _run_plugin(self.metrics, plg, 'html_before_write', self.book, item)
 
     def _write_container(self):
         container_xml = CONTAINER_XML % {'folder_name': self.book.FOLDER_NAME}
@@ -912,7 +1367,7 @@ class EpubWriter(object):
         # nav
         # cover-image
 
-        for item in self.book.get_items():
+        for item in self._get_items():
             if not item.manifest:
                 continue
 
@@ -937,8 +1392,14 @@ class EpubWriter(object):
                         'id': item.id,
                         'media-type': item.media_type}
 
-                if hasattr(item, 'properties') and len(item.properties) > 0:
-                    opts['properties'] = ' '.join(item.properties)
+                # do not create empty list of properties just to check it
+                if isinstance(item, EpubHtml):
+                    properties = item._properties
+                else:
+                    properties = getattr(item, 'properties', None)
+
+                if properties:
+                    opts['properties'] = ' '.join(properties)
 
                 etree.SubElement(manifest, 'item', opts)
 
@@ -1015,7 +1476,10 @@ class EpubWriter(object):
 
         tree_str = etree.tostring(root, pretty_print=True, encoding='utf-8', xml_declaration=True)
 
-        self.out.writestr('%s/content.opf' % self.book.FOLDER_NAME, tree_str)
+        if self.metrics is not None:
+            self.metrics.count('serialized')
+
+        self._write_file(None, '%s/content.opf' % self.book.FOLDER_NAME, tree_str)
 
     def _get_nav(self, item):
         # just a basic navigation for now
@@ -1032,7 +1496,7 @@ class EpubWriter(object):
         title.text = self.book.title
 
         # for now this just handles css files and ignores others
-        for _link in item.links:
+        for _link in item.get_links():
             _lnk = etree.SubElement(head, 'link', {"href": _link.get('href', ''), "rel": "stylesheet", "type": "text/css"})
 
         body = etree.SubElement(root, 'body')
@@ -1041,33 +1505,40 @@ class EpubWriter(object):
         content_title = etree.SubElement(nav, 'h2')
         content_title.text = self.book.title
 
-        def _create_section(itm, items):
-            ol = etree.SubElement(itm, 'ol')
-            for item in items:
-                if isinstance(item, tuple) or isinstance(item, list):
-                    li = etree.SubElement(ol, 'li')
-                    if isinstance(item[0], EpubHtml):
-                        a = etree.SubElement(li, 'a', {'href': os.path.relpath(item[0].file_name, nav_dir_name)})
-                    elif isinstance(item[0], Section) and item[0].href != '':
-                        a = etree.SubElement(li, 'a', {'href': os.path.relpath(item[0].href, nav_dir_name)})
-                    elif isinstance(item[0], Link):
-                        a = etree.SubElement(li, 'a', {'href': os.path.relpath(item[0].href, nav_dir_name)})
-                    else:
-                        a = etree.SubElement(li, 'span')
-                    a.text = item[0].title
+        _relpath = _get_relpath(nav_dir_name)
 
-                    _create_section(li, item[1])
+        # iterative so deep TOC can not hit the recursion limit
+        stack = [(etree.SubElement(nav, 'ol'), iter(self.book.toc))]
 
-                elif isinstance(item, Link):
-                    li = etree.SubElement(ol, 'li')
-                    a = etree.SubElement(li, 'a', {'href': os.path.relpath(item.href, nav_dir_name)})
-                    a.text = item.title
-                elif isinstance(item, EpubHtml):
-                    li = etree.SubElement(ol, 'li')
-                    a = etree.SubElement(li, 'a', {'href': os.path.relpath(item.file_name, nav_dir_name)})
-                    a.text = item.title
+        while stack:
+            ol, items = stack[-1]
+            toc_item = next(items, _END)
 
-        _create_section(nav, self.book.toc)
+            if toc_item is _END:
+                stack.pop()
+            elif isinstance(toc_item, tuple) or isinstance(toc_item, list):
+                section = toc_item[0]
+                li = etree.SubElement(ol, 'li')
+
+                if isinstance(section, EpubHtml):
+                    a = etree.SubElement(li, 'a', {'href': _relpath(section.file_name)})
+                elif isinstance(section, Section) and section.href != '':
+                    a = etree.SubElement(li, 'a', {'href': _relpath(section.href)})
+                elif isinstance(section, Link):
+                    a = etree.SubElement(li, 'a', {'href': _relpath(section.href)})
+                else:
+                    a = etree.SubElement(li, 'span')
+                a.text = section.title
+
+                stack.append((etree.SubElement(li, 'ol'), iter(toc_item[1])))
+            elif isinstance(toc_item, Link):
+                li = etree.SubElement(ol, 'li')
+                a = etree.SubElement(li, 'a', {'href': _relpath(toc_item.href)})
+                a.text = toc_item.title
+            elif isinstance(toc_item, EpubHtml):
+                li = etree.SubElement(ol, 'li')
+                a = etree.SubElement(li, 'a', {'href': _relpath(toc_item.file_name)})
+                a.text = toc_item.title
 
         # LANDMARKS / GUIDE
         # - http://www.idpf.org/epub/30/spec/epub30-contentdocs.html#sec-xhtml-nav-def-types-landmarks
@@ -1100,9 +1571,21 @@ class EpubWriter(object):
                     _title = elem.get('title', '')
 
                 guide_type = elem.get('type', '')
-                a_item = etree.SubElement(li_item, 'a', {'{%s}type' % NAMESPACES['EPUB']: guide_to_landscape_map.get(guide_type, guide_type), 'href': os.path.relpath(_href, nav_dir_name)})
+                a_item = etree.SubElement(li_item, 'a', {'{%s}type' % NAMESPACES['EPUB']: guide_to_landscape_map.get(guide_type, guide_type), 'href': _relpath(_href)})
                 a_item.text = _title
 
+        # PAGE LIST
+        pages = self._get_pages()
+
+        if pages:
+            pages_nav = etree.SubElement(body, 'nav', {'{%s}type' % NAMESPACES['EPUB']: 'page-list', 'hidden': 'hidden'})
+            pages_ol = etree.SubElement(pages_nav, 'ol')
+
+            for number, href in pages:
+                li_item = etree.SubElement(pages_ol, 'li')
+                a_item = etree.SubElement(li_item, 'a', {'href': _relpath(href)})
+                a_item.text = str(number)
+
         tree_str = etree.tostring(nav_xml, pretty_print=True, encoding='utf-8', xml_declaration=True)
 
         return tree_str
@@ -1117,9 +1600,11 @@ class EpubWriter(object):
 
         # get this id
         uid = etree.SubElement(head, 'meta', {'content': self.book.uid, 'name': 'dtb:uid'})
-        uid = etree.SubElement(head, 'meta', {'content': '0', 'name': 'dtb:depth'})
-        uid = etree.SubElement(head, 'meta', {'content': '0', 'name': 'dtb:totalPageCount'})
-        uid = etree.SubElement(head, 'meta', {'content': '0', 'name': 'dtb:maxPageNumber'})
+        depth = etree.SubElement(head, 'meta', {'content': '0', 'name': 'dtb:depth'})
+        pages = self._get_pages()
+
+        uid = etree.SubElement(head, 'meta', {'content': str(len(pages)), 'name': 'dtb:totalPageCount'})
+        uid = etree.SubElement(head, 'meta', {'content': str(len(pages)), 'name': 'dtb:maxPageNumber'})
 
         doc_title = etree.SubElement(root, 'docTitle')
         title = etree.SubElement(doc_title, 'text')
@@ -1132,86 +1617,134 @@ class EpubWriter(object):
         # For now just make a very simple navMap
         nav_map = etree.SubElement(root, 'navMap')
 
-        def _create_section(itm, items, uid):
-            for item in items:
-                if isinstance(item, tuple) or isinstance(item, list):
-                    section, subsection = item[0], item[1]
+        # Iterative so deep TOC can not hit the recursion limit. For every level we keep the content
+        # element of the parent navPoint because section without link gets link of its first child.
+        stack = [(nav_map, iter(self.book.toc), None, 1)]
+        max_depth = 0
+        uid = 0
+
+        while stack:
+            parent, items, parent_content, level = stack[-1]
+            item = next(items, _END)
+
+            if item is _END:
+                stack.pop()
+                continue
 
-                    np = etree.SubElement(itm, 'navPoint', {'id': section.get_id() if isinstance(section, EpubHtml) else 'sep_%d' % uid})
-                    nl = etree.SubElement(np, 'navLabel')
-                    nt = etree.SubElement(nl, 'text')
-                    nt.text = section.title
+            if isinstance(item, tuple) or isinstance(item, list):
+                section, subsection = item[0], item[1]
 
-                    # CAN NOT HAVE EMPTY SRC HERE
-                    href = ''
-                    if isinstance(section, EpubHtml):
-                        href = section.file_name
-                    elif isinstance(section, Section) and section.href != '':
-                        href = section.href
-                    elif isinstance(section, Link):
-                        href = section.href
+                np = etree.SubElement(parent, 'navPoint', {'id': section.get_id() if isinstance(section, EpubHtml) else 'sep_%d' % uid})
+                nl = etree.SubElement(np, 'navLabel')
+                nt = etree.SubElement(nl, 'text')
+                nt.text = section.title
 
-                    nc = etree.SubElement(np, 'content', {'src': href})
+                # CAN NOT HAVE EMPTY SRC HERE
+                href = ''
+                if isinstance(section, EpubHtml):
+                    href = section.file_name
+                elif isinstance(section, Section) and section.href != '':
+                    href = section.href
+                elif isinstance(section, Link):
+                    href = section.href
 
-                    uid = _create_section(np, subsection, uid + 1)
-                elif isinstance(item, Link):
-                    _parent = itm
-                    _content = _parent.find('content')
+                nc = etree.SubElement(np, 'content', {'src': href})
+
+                uid += 1
+                max_depth = max(max_depth, level)
+
+                stack.append((np, iter(subsection), nc, level + 1))
+            elif isinstance(item, Link) or isinstance(item, EpubHtml):
+                if isinstance(item, Link):
+                    nid, href = item.uid, item.href
+                else:
+                    nid, href = item.get_id(), item.file_name
 
-                    if _content is not None:
-                        if _content.get('src') == '':
-                            _content.set('src', item.href)
+                if parent_content is not None and parent_content.get('src') == '':
+                    parent_content.set('src', href)
 
-                    np = etree.SubElement(itm, 'navPoint', {'id': item.uid})
-                    nl = etree.SubElement(np, 'navLabel')
-                    nt = etree.SubElement(nl, 'text')
-                    nt.text = item.title
+                np = etree.SubElement(parent, 'navPoint', {'id': nid})
+                nl = etree.SubElement(np, 'navLabel')
+                nt = etree.SubElement(nl, 'text')
+                nt.text = item.title
 
-                    nc = etree.SubElement(np, 'content', {'src': item.href})
-                elif isinstance(item, EpubHtml):
-                    _parent = itm
-                    _content = _parent.find('content')
+                nc = etree.SubElement(np, 'content', {'src': href})
 
-                    if _content is not None:
-                        if _content.get('src') == '':
-                            _content.set('src', item.file_name)
+                max_depth = max(max_depth, level)
 
-                    np = etree.SubElement(itm, 'navPoint', {'id': item.get_id()})
-                    nl = etree.SubElement(np, 'navLabel')
-                    nt = etree.SubElement(nl, 'text')
-                    nt.text = item.title
+        depth.set('content', str(max_depth))
 
-                    nc = etree.SubElement(np, 'content', {'src': item.file_name})
+        if pages:
+            page_list = etree.SubElement(root, 'pageList')
 
-            return uid
+            for number, href in pages:
+                pt = etree.SubElement(page_list, 'pageTarget', {'id': 'page_%d' % number, 'type': 'normal', 'value': str(number)})
+                nl = etree.SubElement(pt, 'navLabel')
+                nt = etree.SubElement(nl, 'text')
+                nt.text = str(number)
 
-        _create_section(nav_map, self.book.toc, 0)
+                etree.SubElement(pt, 'content', {'src': href})
 
         tree_str = etree.tostring(root, pretty_print=True, encoding='utf-8', xml_declaration=True)
 
         return tree_str
 
+    def _write_file(self, item, name, content):
+        with timer(self.metrics, 'compress'):
+            self.out.writestr(name, content)
+
+        if self.metrics is not None:
+            info = self.out.getinfo(name)
+            bytes_in = len(item.content or '') if item is not None else info.file_size
+
+            self.metrics.item(item, name, bytes_in, info.file_size, info.compress_size)
+
     def _write_items(self):
-        for item in self.book.get_items():
+        for item in self._get_items():
             if isinstance(item, EpubNcx):
-                self.out.writestr('%s/%s' % (self.book.FOLDER_NAME, item.file_name), self._get_ncx())
+                with timer(self.metrics, 'ncx'):
+                    content = self._get_ncx()
+
+                name = '%s/%s' % (self.book.FOLDER_NAME, item.file_name)
             elif isinstance(item, EpubNav):
-                self.out.writestr('%s/%s' % (self.book.FOLDER_NAME, item.file_name), self._get_nav(item))
-            elif item.manifest:
-                self.out.writestr('%s/%s' % (self.book.FOLDER_NAME, item.file_name), item.get_content())
+                with timer(self.metrics, 'nav'):
+                    content = self._get_nav(item)
+
+                name = '%s/%s' % (self.book.FOLDER_NAME, item.file_name)
             else:
-                self.out.writestr('%s' % item.file_name, item.get_content())
+                with timer(self.metrics, 'content'):
+                    content = item.get_content()
+
+                if item.manifest:
+                    name = '%s/%s' % (self.book.FOLDER_NAME, item.file_name)
+                else:
+                    name = '%s' % item.file_name
+
+            if self.metrics is not None and isinstance(item, (EpubHtml, EpubNcx)):
+                self.metrics.count('serialized')
+
+            self._write_file(item, name, content)
 
     def write(self):
-        # check for the option allowZip64
-        self.out = zipfile.ZipFile(self.file_name, 'w', zipfile.ZIP_DEFLATED)
-        self.out.writestr('mimetype', 'application/epub+zip', compress_type=zipfile.ZIP_STORED)
+        with timer(self.metrics, 'write'):
+            # check for the option allowZip64
+            self.out = zipfile.ZipFile(self.file_name, 'w', zipfile.ZIP_DEFLATED)
+            self.out.writestr('mimetype', 'application/epub+zip', compress_type=zipfile.ZIP_STORED)
+
+            with timer(self.metrics, 'container'):
+                self._write_container()
+
+            if self.options.get('prune_unreferenced'):
+                with timer(self.metrics, 'prune'):
+                    self._prune_unreferenced()
+
+            with timer(self.metrics, 'opf'):
+                self._write_opf_file()
 
-        self._write_container()
-        self._write_opf_file()
-        self._write_items()
+            with timer(self.metrics, 'items'):
+                self._write_items()
 
-        self.out.close()
+            self.out.close()
 
 
 class EpubReader(object):
@@ -1224,25 +1757,36 @@ class EpubReader(object):
 
         self.opf_file = ''
         self.opf_dir = ''
+        self.manifest = []
 
         self.options = dict(self.DEFAULT_OPTIONS)
         if options:
             self.options.update(options)
 
+        self.metrics = self.options.get('metrics')
+
     def process(self):
         # should cache this html parsing so we don't do it for every plugin
+        with timer(self.metrics, 'plugins'):
+            self._process_book()
+
+            for item in self.book.get_items():
+                self._process_item(item)
+
+    def _process_book(self):
         for plg in self.options.get('plugins', []):
             if hasattr(plg, 'after_read'):
-                plg.after_read(self.book)
+                _run_plugin(self.metrics, plg, 'after_read', self.book)
 
-        for item in self.book.get_items():
-            if isinstance(item, EpubHtml):
-                for plg in self.options.get('plugins', []):
-                    if hasattr(plg, 'html_after_read'):
-                        plg.html_after_read(self.book, item)
+    def _process_item(self, item):
+        if isinstance(item, EpubHtml):
+            for plg in self.options.get('plugins', []):
+                if hasattr(plg, 'html_after_read'):
+                    _run_plugin(self.metrics, plg, 'html_after_read', self.book, item)
 
     def load(self):
-        self._load()
+        with timer(self.metrics, 'load'):
+            self._load()
 
         return self.book
 
@@ -1254,6 +1798,9 @@ class EpubReader(object):
         meta_inf = self.read_file('META-INF/container.xml')
         tree = parse_string(meta_inf)
 
+        if self.metrics is not None:
+            self.metrics.count('parsed')
+
         for root_file in tree.findall('//xmlns:rootfile[@media-type]', namespaces={'xmlns': NAMESPACES['CONTAINERNS']}):
             if root_file.get('media-type') == "application/oebps-package+xml":
                 self.opf_file = root_file.get('full-path')
@@ -1321,7 +1868,9 @@ class EpubReader(object):
             if others.get("id") == self.book.IDENTIFIER_ID:
                 self.book.uid = value
 
-    def _load_manifest(self):
+    def _get_manifest_entries(self):
+        entries = []
+
         for r in self.container.find('{%s}%s' % (NAMESPACES['OPF'], 'manifest')):
             if r is not None and r.tag != '{%s}item' % NAMESPACES['OPF']:
                 continue
@@ -1338,136 +1887,243 @@ class EpubReader(object):
             if media_type == 'image/jpg':
                 media_type = 'image/jpeg'
 
-            if media_type == 'application/x-dtbncx+xml':
-                ei = EpubNcx(uid=r.get('id'), file_name=unquote(r.get('href')))
+            entries.append((r.get('id'), r.get('href'), media_type, properties))
 
-                ei.content = self.read_file(zip_path.join(self.opf_dir, ei.file_name))
-            elif media_type == 'application/xhtml+xml':
-                if 'nav' in properties:
-                    ei = EpubNav(uid=r.get('id'), file_name=unquote(r.get('href')))
+        return entries
 
-                    ei.content = self.read_file(zip_path.join(self.opf_dir, r.get('href')))
-                elif 'cover' in properties:
-                    ei = EpubCoverHtml()
+    def _create_item(self, uid, href, media_type, properties):
+        """
+        Creates item for the manifest entry without reading its content.
 
-                    ei.content = self.read_file(zip_path.join(self.opf_dir, unquote(r.get('href'))))
-                else:
-                    ei = EpubHtml()
+        :Returns:
+          Returns tuple with the item and name of the file inside of the archive.
+        """
+        if media_type == 'application/x-dtbncx+xml':
+            ei = EpubNcx(uid=uid, file_name=unquote(href))
 
-                    ei.id = r.get('id')
-                    ei.file_name = unquote(r.get('href'))
-                    ei.media_type = media_type
-                    ei.content = self.read_file(zip_path.join(self.opf_dir, ei.get_name()))
-                    ei.properties = properties
-            elif media_type in IMAGE_MEDIA_TYPES:
-                if 'cover-image' in properties:
-                    ei = EpubCover(uid=r.get('id'), file_name=unquote(r.get('href')))
+            return ei, zip_path.join(self.opf_dir, ei.file_name)
+        elif media_type == 'application/xhtml+xml':
+            if 'nav' in properties:
+                ei = EpubNav(uid=uid, file_name=unquote(href))
 
-                    ei.media_type = media_type
-                    ei.content = self.read_file(zip_path.join(self.opf_dir, ei.get_name()))
-                else:
-                    ei = EpubImage()
+                return ei, zip_path.join(self.opf_dir, href)
+            elif 'cover' in properties:
+                ei = EpubCoverHtml()
 
-                    ei.id = r.get('id')
-                    ei.file_name = unquote(r.get('href'))
-                    ei.media_type = media_type
-                    ei.content = self.read_file(zip_path.join(self.opf_dir, ei.get_name()))
+                return ei, zip_path.join(self.opf_dir, unquote(href))
             else:
-                # different types
-                ei = EpubItem()
+                ei = EpubHtml()
 
-                ei.id = r.get('id')
-                ei.file_name = unquote(r.get('href'))
+                ei.id = uid
+                ei.file_name = unquote(href)
                 ei.media_type = media_type
 
-                ei.content = self.read_file(zip_path.join(self.opf_dir, ei.get_name()))
-              # r.get('properties')
+                if properties:
+                    ei.properties = properties
+        elif media_type in IMAGE_MEDIA_TYPES:
+            if 'cover-image' in properties:
+                ei = EpubCover(uid=uid, file_name=unquote(href))
+
+                ei.media_type = media_type
+            else:
+                ei = EpubImage()
 
-            self.book.add_item(ei)
+                ei.id = uid
+                ei.file_name = unquote(href)
+                ei.media_type = media_type
+        else:
+            # different types
+            ei = EpubItem()
+
+            ei.id = uid
+            ei.file_name = unquote(href)
+            ei.media_type = media_type
+
+        return ei, zip_path.join(self.opf_dir, ei.get_name())
+
+    def _load_manifest(self):
+        self.manifest = self._get_manifest_entries()
+        self._load_items()
+
+    def _read_compressed_file(self, raw_file, name, cache):
+        info = self.zf.getinfo(name)
+
+        if info.compress_type != zipfile.ZIP_DEFLATED or info.flag_bits & 0x1:
+            return self.read_file(name)
+
+        def _read_at(size, offset):
+            raw_file.seek(offset)
+            return raw_file.read(size)
+
+        return CompressedContent(_read_raw_data(_read_at, info), info.file_size, info.CRC, cache)
+
+    def _load_items(self):
+        interner = self.options.get('interner')
+        cache = self.options.get('compressed_content')
+
+        if cache is True:
+            cache = ContentCache()
+
+        # compressed data is read from the archive directly, file opened by zipfile is not used for that
+        raw_file = None
+
+        if cache:
+            raw_file = open(self.file_name, 'rb') if isinstance(self.file_name, six.string_types) else self.file_name
+
+        try:
+            for entry in self.manifest:
+                ei, name = self._create_item(*entry)
+
+                if cache:
+                    ei.content = self._read_compressed_file(raw_file, name, cache)
+                else:
+                    ei.content = self.read_file(name)
+
+                if interner is not None:
+                    if ei.is_compressed():
+                        ei._content.data = interner.intern(ei._content.data, self.book)
+                    else:
+                        ei.content = interner.intern(ei.content, self.book)
+
+                if self.metrics is not None:
+                    compressed = self.zf.getinfo(name).compress_size
+                    self.metrics.item(ei, name, compressed, len(ei._content), compressed)
+
+                self.book.add_item(ei)
+        finally:
+            if raw_file is not None and raw_file is not self.file_name:
+                raw_file.close()
 
     def _parse_ncx(self, data):
-        tree = parse_string(data)
-        tree_root = tree.getroot()
+        nav_point = '{%s}navPoint' % NAMESPACES['DAISY']
+        nav_label = '{%s}navLabel' % NAMESPACES['DAISY']
+        content = '{%s}content' % NAMESPACES['DAISY']
 
-        nav_map = tree_root.find('{%s}navMap' % NAMESPACES['DAISY'])
+        toc = []
+        # children of the opened navPoints
+        stack = []
 
-        def _get_children(elems, n, nid):
-            label, content = '', ''
-            children = []
+        for event, elem in iterparse_string(data, tag=nav_point):
+            if event == 'start':
+                stack.append([])
+                continue
+
+            label, src = '', ''
 
-            for a in elems.getchildren():
-                if a.tag == '{%s}navLabel' % NAMESPACES['DAISY']:
-                    label = a.getchildren()[0].text
-                if a.tag == '{%s}content' % NAMESPACES['DAISY']:
-                    content = a.get('src', '')
-                if a.tag == '{%s}navPoint' % NAMESPACES['DAISY']:
-                    children.append(_get_children(a, n + 1, a.get('id', '')))
+            for child in elem:
+                if child.tag == nav_label:
+                    label = child[0].text if len(child) else ''
+                elif child.tag == content:
+                    src = child.get('src', '')
 
-            if len(children) > 0:
-                if n == 0:
-                    return children
+            children = stack.pop()
 
-                return (Section(label, href=content),
-                        children)
+            if children:
+                entry = (Section(label, href=src), children)
             else:
-                return (Link(content, label, nid))
+                entry = Link(src, label, elem.get('id', ''))
 
-        self.book.toc = _get_children(nav_map, 0, '')
+            (stack[-1] if stack else toc).append(entry)
 
-    def _parse_nav(self, data, base_path):
-        html_node = parse_html_string(data)
-        nav_node = html_node.xpath("//nav[@*='toc']")[0]
+            # we are done with this navPoint and the one before it, label and content of the
+            # parent navPoint are still needed
+            elem.clear()
+            previous = elem.getprevious()
 
-        def parse_list(list_node):
-            items = []
+            if previous is not None and previous.tag == nav_point:
+                elem.getparent().remove(previous)
 
-            for item_node in list_node.findall("li"):
+        if self.metrics is not None:
+            self.metrics.count('parsed')
 
-                sublist_node = item_node.find("ol")
-                link_node = item_node.find("a")
+        self.book.toc = toc
 
-                if sublist_node is not None:
-                    title = item_node[0].text
-                    children = parse_list(sublist_node)
+    def _parse_nav(self, data, base_path):
+        toc = None
+        nav = None
+        # opened lists are ['ol', element, items] and list items ['li', element, items of the sublist]
+        stack = []
+
+        for event, elem in iterparse_string(data, tag=('nav', 'ol', 'li'), html=True):
+            if event == 'start':
+                if nav is None:
+                    # same as xpath("//nav[@*='toc']")
+                    if elem.tag == 'nav' and 'toc' in elem.attrib.values():
+                        nav = elem
+                elif elem.tag != 'nav':
+                    parent = elem.getparent()
+
+                    if elem.tag == 'ol' and (parent is nav if not stack else stack[-1][0] == 'li' and parent is stack[-1][1]):
+                        stack.append(['ol', elem, []])
+                    elif elem.tag == 'li' and stack and stack[-1][0] == 'ol' and parent is stack[-1][1]:
+                        stack.append(['li', elem, None])
+            elif stack and elem is stack[-1][1]:
+                _, _, items = stack.pop()
+
+                if elem.tag == 'ol':
+                    if not stack:
+                        toc = items
+                        break
+
+                    # only first list is used
+                    if stack[-1][2] is None:
+                        stack[-1][2] = items
+                else:
+                    link_node = elem.find('a')
 
                     if link_node is not None:
-                        href = zip_path.normpath(zip_path.join(base_path, link_node.get("href")))
-                        items.append((Section(title, href=href), children))
-                    else:
-                        items.append((Section(title), children))
-                elif link_node is not None:
-                    title = link_node.text
-                    href = zip_path.normpath(zip_path.join(base_path, link_node.get("href")))
+                        href = zip_path.normpath(zip_path.join(base_path, link_node.get('href')))
 
-                    items.append(Link(href, title))
+                    if items is not None:
+                        title = elem[0].text
 
-            return items
+                        if link_node is not None:
+                            stack[-1][2].append((Section(title, href=href), items))
+                        else:
+                            stack[-1][2].append((Section(title), items))
+                    elif link_node is not None:
+                        stack[-1][2].append(Link(href, link_node.text))
 
-        self.book.toc = parse_list(nav_node.find("ol"))
+                    elem.clear()
+
+                    while elem.getprevious() is not None:
+                        del elem.getparent()[0]
+
+        if self.metrics is not None:
+            self.metrics.count('parsed')
+
+        if toc is None:
+            raise EpubException(-1, 'Can not find table of contents in the nav file.')
+
+        self.book.toc = toc
+
+    def _get_spine_entries(self, spine):
+        return [(t.get('idref'), t.get('linear', 'yes')) for t in spine]
 
     def _load_spine(self):
         spine = self.container.find('{%s}%s' % (NAMESPACES['OPF'], 'spine'))
 
-        self.book.spine = [(t.get('idref'), t.get('linear', 'yes')) for t in spine]
+        self.book.spine = self._get_spine_entries(spine)
 
         toc = spine.get('toc', '')
         self.book.set_direction(spine.get('page-progression-direction', None))
 
         # should read ncx or nav file
-        if toc:
+        if toc and not self.options.get('ignore_toc'):
             try:
                 ncxFile = self.read_file(zip_path.join(self.opf_dir, self.book.get_item_with_id(toc).get_name()))
             except KeyError:
                 raise EpubException(-1, 'Can not find ncx file.')
 
-            self._parse_ncx(ncxFile)
+            with timer(self.metrics, 'ncx'):
+                self._parse_ncx(ncxFile)
 
     def _load_guide(self):
         guide = self.container.find('{%s}%s' % (NAMESPACES['OPF'], 'guide'))
         if guide is not None:
             self.book.guide = [{'href': t.get('href'), 'title': t.get('title'), 'type': t.get('type')} for t in guide]
 
-    def _load_opf_file(self):
+    def _read_opf_file(self):
         try:
             s = self.read_file(self.opf_file)
         except KeyError:
@@ -1475,19 +2131,34 @@ class EpubReader(object):
 
         self.container = parse_string(s)
 
-        self._load_metadata()
-        self._load_manifest()
-        self._load_spine()
-        self._load_guide()
+        if self.metrics is not None:
+            self.metrics.count('parsed')
+
+    def _load_opf_file(self):
+        with timer(self.metrics, 'opf'):
+            self._read_opf_file()
+
+        with timer(self.metrics, 'metadata'):
+            self._load_metadata()
+
+        with timer(self.metrics, 'manifest'):
+            self._load_manifest()
+
+        with timer(self.metrics, 'spine'):
+            self._load_spine()
+
+        with timer(self.metrics, 'guide'):
+            self._load_guide()
 
         # read nav file if found
         #
-        if not self.book.toc:
+        if not self.book.toc and not self.options.get('ignore_toc'):
             nav_item = next((item for item in self.book.items if isinstance(item, EpubNav)), None)
             if nav_item:
-                self._parse_nav(nav_item.content, zip_path.dirname(nav_item.file_name))
+                with timer(self.metrics, 'nav'):
+                    self._parse_nav(nav_item.content, zip_path.dirname(nav_item.file_name))
 
-    def _load(self):
+    def _open(self):
         try:
             self.zf = zipfile.ZipFile(self.file_name, 'r', compression=zipfile.ZIP_DEFLATED, allowZip64=True)
         except zipfile.BadZipfile as bz:
@@ -1495,12 +2166,422 @@ class EpubReader(object):
         except zipfile.LargeZipFile as bz:
             raise EpubException(1, 'Large Zip file')
 
-        # 1st check metadata
-        self._load_container()
-        self._load_opf_file()
+    def _get_cached_structure(self):
+        """
+        Returns cache key and cached structure of the book. Both values are None if cache is not used
+        or nothing was found.
+        """
+        cache = self.options.get('cache')
+
+        if cache is None:
+            return None, None
+
+        cache_key = cache.get_key(self.file_name)
+
+        if cache_key is None:
+            return None, None
+
+        data = cache.load(cache_key)
+
+        # structure was cached without the table of contents
+        if data is not None and data['toc'] is None and not self.options.get('ignore_toc'):
+            return cache_key, None
+
+        return cache_key, data
+
+    def _load(self):
+        with timer(self.metrics, 'open'):
+            self._open()
+
+        with timer(self.metrics, 'cache'):
+            cache_key, data = self._get_cached_structure()
+
+        if data is not None:
+            if self.metrics is not None:
+                self.metrics.count('cache_hit')
+
+            self._load_structure(data)
+        else:
+            # 1st check metadata
+            with timer(self.metrics, 'container'):
+                self._load_container()
+
+            self._load_opf_file()
+
+            if cache_key is not None:
+                self.options['cache'].save(cache_key, self._get_structure())
 
         self.zf.close()
 
+    def _get_structure(self):
+        """
+        Returns parsed structure of the book (everything except content of the items) as simple
+        Python values which can be stored in the cache.
+        """
+        return {'opf_file': self.opf_file,
+                'version': self.book.version,
+                'identifier_id': self.book.IDENTIFIER_ID,
+                'uid': self.book.uid,
+                'title': self.book.title,
+                'direction': self.book.direction,
+                'metadata': self.book.metadata,
+                'manifest': self.manifest,
+                'spine': self.book.spine,
+                'guide': self.book.guide,
+                'toc': None if self.options.get('ignore_toc') else _toc_to_data(self.book.toc)}
+
+    def _load_structure(self, data):
+        "Recreates the book from the structure returned by _get_structure, only content of the items is read."
+        self.opf_file = data['opf_file']
+        self.opf_dir = zip_path.dirname(self.opf_file)
+
+        self.book.version = data['version']
+        self.book.IDENTIFIER_ID = data['identifier_id']
+        self.book.uid = data['uid']
+        self.book.title = data['title']
+        self.book.metadata = data['metadata']
+
+        self.manifest = data['manifest']
+
+        with timer(self.metrics, 'manifest'):
+            self._load_items()
+
+        self.book.spine = data['spine']
+        self.book.set_direction(data['direction'])
+        self.book.guide = data['guide']
+
+        if data['toc'] is not None and not self.options.get('ignore_toc'):
+            self.book.toc = _toc_from_data(data['toc'])
+
+
+class EpubFile(object):
+    """
+    Opened EPUB file which reads only the items we ask for. Container and OPF file are parsed only
+    once, when the file is opened, and the same instance can be used for any number of calls.
+
+    >>> epub_file = epub.open_epub('book.epub')
+    >>> chapter = epub_file.spine_item(2)
+    >>> image = epub_file.get('images/cover.jpg')
+    >>> epub_file.close()
+
+    Returned items are not part of the book. Attribute book is an instance of EpubBook with the
+    metadata and spine, but without any items, so methods like EpubHtml.get_content() still work.
+    """
+
+    def __init__(self, epub_file_name, options=None):
+        """
+        :Args:
+          - epub_file_name: full path to the input file or file object
+          - options: same options as for the EpubReader, like "cache" (optional)
+        """
+        self.reader = EpubReader(epub_file_name, options)
+        self.book = self.reader.book
+
+        self._lock = threading.Lock()
+
+        self.reader._open()
+
+        self._zip_infos = dict((info.filename, info) for info in self.reader.zf.infolist())
+        self._fd = None
+        self._own_fd = False
+
+        # pread does not move file position so one file descriptor can be shared by all threads
+        if hasattr(os, 'pread'):
+            try:
+                if isinstance(epub_file_name, six.string_types):
+                    self._fd = os.open(epub_file_name, os.O_RDONLY)
+                    self._own_fd = True
+                else:
+                    self._fd = epub_file_name.fileno()
+            except (AttributeError, IOError, OSError, ValueError):
+                self._fd = None
+
+        try:
+            self._load()
+        except:
+            self.close()
+            raise
+
+    def _load(self):
+        reader = self.reader
+
+        _, data = reader._get_cached_structure()
+
+        if data is not None:
+            reader.opf_file = data['opf_file']
+            reader.opf_dir = zip_path.dirname(reader.opf_file)
+            reader.manifest = data['manifest']
+
+            self.book.version = data['version']
+            self.book.IDENTIFIER_ID = data['identifier_id']
+            self.book.uid = data['uid']
+            self.book.title = data['title']
+            self.book.metadata = data['metadata']
+            self.book.spine = data['spine']
+            self.book.set_direction(data['direction'])
+            self.book.guide = data['guide']
+        else:
+            reader._load_container()
+            reader._read_opf_file()
+            reader._load_metadata()
+
+            reader.manifest = reader._get_manifest_entries()
+
+            spine = reader.container.find('{%s}%s' % (NAMESPACES['OPF'], 'spine'))
+            self.book.spine = reader._get_spine_entries(spine)
+            self.book.set_direction(spine.get('page-progression-direction', None))
+
+            reader._load_guide()
+
+            # we don't need the tree anymore
+            reader.container = None
+
+        self.spine = self.book.spine
+
+        self._by_id = {}
+        self._by_href = {}
+
+        for entry in reader.manifest:
+            self._by_id[entry[0]] = entry
+
+            if entry[1] is not None:
+                self._by_href[unquote(entry[1])] = entry
+
+    def read_file(self, name):
+        """
+        Returns content of the file from the archive. Raises KeyError if file does not exist.
+
+        Where operating system supports positional reads, file is read without locking so many
+        threads can read from the same EpubFile at the same time.
+
+        :Args:
+          - name: Full name of the file inside of the archive
+
+        :Returns:
+          Returns content of the file.
+        """
+        info = self._zip_infos.get(name)
+
+        if info is None:
+            raise KeyError('There is no item named %r in the archive' % name)
+
+        # encrypted files and unusual compression methods are left to zipfile
+        if self._fd is None or info.flag_bits & 0x1 or info.compress_type not in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+            with self._lock:
+                return self.reader.read_file(name)
+
+        data = _read_raw_data(lambda size, offset: os.pread(self._fd, size, offset), info)
+
+        if info.compress_type == zipfile.ZIP_DEFLATED:
+            data = zlib.decompress(data, -15)
+
+        if zlib.crc32(data) & 0xffffffff != info.CRC:
+            raise zipfile.BadZipfile('Bad CRC-32 for file %r' % name)
+
+        return data
+
+    def get_file_info(self, name):
+        """
+        Returns information about the file in the archive, like its size and compressed size.
+        Content of the file is not read.
+
+        :Args:
+          - name: Full name of the file inside of the archive
+
+        :Returns:
+          Returns instance of zipfile.ZipInfo. Returns None if file does not exist.
+        """
+        return self._zip_infos.get(name)
+
+    def _read_item(self, entry):
+        ei, name = self.reader._create_item(*entry)
+
+        ei.content = self.read_file(name)
+        ei.book = self.book
+
+        interner = self.reader.options.get('interner')
+
+        if interner is not None:
+            ei.content = interner.intern(ei.content, self.book)
+
+        return ei
+
+    def get(self, href):
+        """
+        Returns item for defined HREF. HREF is relative to the OPF file, same as file name of the
+        item. Fragment identifier is ignored.
+
+        >>> epub_file.get('text/chapter_01.xhtml')
+
+        :Args:
+          - href: HREF for the item we are searching for
+
+        :Returns:
+          Returns item object. Returns None if nothing was found.
+        """
+        # names of the items are kept without percent encoding
+        entry = self._by_href.get(unquote(href.split('#', 1)[0]))
+
+        if entry is None:
+            return None
+
+        return self._read_item(entry)
+
+    def get_by_id(self, uid):
+        """
+        Returns item for defined UID.
+
+        :Args:
+          - uid: UID for the item
+
+        :Returns:
+          Returns item object. Returns None if nothing was found.
+        """
+        entry = self._by_id.get(uid)
+
+        if entry is None:
+            return None
+
+        return self._read_item(entry)
+
+    def spine_item(self, n):
+        """
+        Returns n-th item from the spine. Raises IndexError if spine does not have that many items.
+
+        :Args:
+          - n: Position in the spine, starting from 0
+
+        :Returns:
+          Returns item object. Returns None if spine references item which is not in the manifest.
+        """
+        uid, _ = self.spine[n]
+
+        return self.get_by_id(uid)
+
+    def get_hrefs(self):
+        """
+        Returns HREFs of all items in the manifest.
+
+        :Returns:
+          Returns HREFs as tuple.
+        """
+        return (unquote(entry[1]) for entry in self.reader.manifest if entry[1] is not None)
+
+    def close(self):
+        "Closes the file."
+        if self.reader.zf is not None:
+            if self._own_fd:
+                os.close(self._fd)
+
+            self._fd = None
+            self._own_fd = False
+
+            self.reader.zf.close()
+            self.reader.zf = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def _get_relpath(start):
+    """
+    Returns function which works like os.path.relpath(path, start) but remembers the results. Usual
+    case when start is the same directory as the OPF file is calculated without making absolute paths.
+    """
+    cache = {}
+
+    def relpath(path):
+        rel = cache.get(path)
+
+        if rel is None:
+            if start == '' and path and not os.path.isabs(path):
+                rel = os.path.normpath(path)
+
+                if rel == os.pardir or rel.startswith(os.pardir + os.sep):
+                    rel = os.path.relpath(path, start)
+            else:
+                rel = os.path.relpath(path, start)
+
+            cache[path] = rel
+
+        return rel
+
+    return relpath
+
+
+def _read_raw_data(read_at, info):
+    """
+    Returns data of the file from the zip archive as it is stored, without decompression.
+
+    :Args:
+      - read_at: Function which gets size and offset and returns bytes read from the archive
+      - info: Instance of zipfile.ZipInfo
+    """
+    header = read_at(_ZIP_HEADER.size, info.header_offset)
+
+    if len(header) != _ZIP_HEADER.size:
+        raise zipfile.BadZipfile('Truncated file header')
+
+    fields = _ZIP_HEADER.unpack(header)
+
+    if fields[0] != _ZIP_HEADER_SIGNATURE:
+        raise zipfile.BadZipfile('Bad magic number for file header')
+
+    # lengths of the file name and the extra field
+    offset = info.header_offset + _ZIP_HEADER.size + fields[10] + fields[11]
+
+    return read_at(info.compress_size, offset)
+
+
+def _run_plugin(metrics, plg, hook, *args):
+    if metrics is None:
+        return getattr(plg, hook)(*args)
+
+    start = clock()
+    result = getattr(plg, hook)(*args)
+    metrics.plugin(get_plugin_name(plg), hook, clock() - start)
+
+    return result
+
+
+def _toc_to_data(toc):
+    "Converts TOC to nested tuples and lists so it can be serialized."
+    if isinstance(toc, Link):
+        return ('link', toc.href, toc.title, toc.uid)
+
+    if isinstance(toc, Section):
+        return ('section', toc.title, toc.href)
+
+    if isinstance(toc, tuple):
+        return ('tuple', [_toc_to_data(t) for t in toc])
+
+    if isinstance(toc, list):
+        return ('list', [_toc_to_data(t) for t in toc])
+
+    return ('value', toc)
+
+
+def _toc_from_data(data):
+    "Recreates TOC from the value returned by _toc_to_data."
+    kind = data[0]
+
+    if kind == 'link':
+        return Link(data[1], data[2], data[3])
+
+    if kind == 'section':
+        return Section(data[1], href=data[2])
+
+    if kind == 'tuple':
+        return tuple(_toc_from_data(t) for t in data[1])
+
+    if kind == 'list':
+        return [_toc_from_data(t) for t in data[1]]
+
+    return data[1]
+
 
 # WRITE
 
@@ -1546,3 +2627,20 @@ def read_epub(name, options=None):
     reader.process()
 
     return book
+
+
+def open_epub(name, options=None):
+    """
+    Opens EPUB file for reading of single items. Only container and OPF file are parsed.
+
+    >>> with epub.open_epub('book.epub') as epub_file:
+    ...     chapter = epub_file.get('chapter_01.xhtml')
+
+    :Args:
+      - name: full path to the input file
+      - options: extra options as dictionary (optional)
+
+    :Returns:
+      Instance of EpubFile.
+    """
+    return EpubFile(name, options)
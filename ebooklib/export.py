@@ -0,0 +1,373 @@
+# This file is part of EbookLib.
+# Copyright (c) 2013 Aleksandar Erkalovic <aerkalov@gmail.com>
+#
+# EbookLib is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# EbookLib is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with EbookLib.  If not, see <http://www.gnu.org/licenses/>.
+
+# Export of the whole book as one HTML document. Documents are parsed and written one at a time,
+# so only one document is kept in memory.
+
+import os
+import base64
+import posixpath as zip_path
+
+import six
+from lxml import etree
+
+try:
+    from urllib.parse import quote
+except ImportError:
+    from urllib import quote
+
+from ebooklib.utils import parse_html_string
+from ebooklib.text import get_spine_items
+from ebooklib.position import get_item_offsets
+from ebooklib.references import CSS_MEDIA_TYPE, resolve_href, rewrite_css, rewrite_html
+
+
+class HtmlExporter(object):
+    """
+    Writes documents from the spine, in reading order, into one HTML document.
+
+    >>> HtmlExporter(book, {'resources': 'relocate'}).write('book.html')
+
+    Links between the documents are changed to links inside of the output. Ids which are used in more
+    than one document are renamed in all documents except the first one. Every document is written
+    as section element, links to the document without fragment point to this section.
+
+    Options:
+      - resources: "inline" writes images, fonts and other files as data URIs, "relocate" copies them to
+        resource_dir. Default value is "inline".
+      - resource_dir: Directory for the relocated files. Default value is output file name with "_files" suffix.
+      - resource_url: Path to resource_dir used in the links. Default value is resource_dir relative to the output.
+      - stylesheets: Include style sheets of the book in the head of the output. Default value is True.
+      - title: Title of the output. Default value is the title of the book.
+    """
+
+    DEFAULT_OPTIONS = {
+        'resources': 'inline',
+        'resource_dir': None,
+        'resource_url': None,
+        'stylesheets': True,
+        'title': None
+    }
+
+    def __init__(self, book, options=None):
+        """
+        :Args:
+          - book: Instance of EpubBook
+          - options: Options as dictionary (optional)
+        """
+        from ebooklib.epub import EpubNav
+
+        self.book = book
+
+        self.options = dict(self.DEFAULT_OPTIONS)
+        if options:
+            self.options.update(options)
+
+        if self.options['resources'] not in ('inline', 'relocate'):
+            raise ValueError('Unknown resources option "%s"' % self.options['resources'])
+
+        self.documents = [item for item in get_spine_items(book) if not isinstance(item, EpubNav)]
+        self.items = dict((item.get_name(), item) for item in book.get_items())
+
+        self.stats = {'documents': 0, 'links': 0, 'resources': 0, 'bytes': 0, 'skipped': []}
+
+        self._ids = None
+        self._sections = None
+        self._relocated = set()
+        # item name -> data URI
+        self._data_uris = {}
+        self._resource_dir = None
+        self._resource_url = None
+
+    def _create_ids(self):
+        """
+        Creates new ids for all documents before anything is written, so links to the documents which
+        are not written yet can be changed.
+        """
+        all_ids = set()
+        document_ids = []
+
+        for item in self.documents:
+            _, uids, _ = get_item_offsets(item)
+            document_ids.append(uids)
+            all_ids.update(uids)
+
+        used = set()
+
+        def _unique(uid):
+            new_uid, n = uid, 1
+
+            while new_uid in used or (new_uid != uid and new_uid in all_ids):
+                n += 1
+                new_uid = '%s-%d' % (uid, n)
+
+            used.add(new_uid)
+
+            return new_uid
+
+        # (document name, id) -> new id
+        self._ids = {}
+
+        for item, uids in zip(self.documents, document_ids):
+            name = item.get_name()
+
+            for uid in uids:
+                if (name, uid) not in self._ids:
+                    self._ids[(name, uid)] = _unique(uid)
+
+        # document name -> id of its section
+        self._sections = {}
+
+        for n, item in enumerate(self.documents):
+            self._sections[item.get_name()] = _unique('section-%d' % (n + 1))
+
+    def _get_data_uri(self, item):
+        name = item.get_name()
+        uri = self._data_uris.get(name)
+
+        if uri is None:
+            content = item.get_content()
+
+            if isinstance(content, six.text_type):
+                content = content.encode('utf-8')
+
+            uri = self._data_uris[name] = 'data:%s;base64,%s' % (item.media_type,
+                                                                   base64.b64encode(content).decode('ascii'))
+
+        return uri
+
+    def _relocate(self, item):
+        name = item.get_name()
+        # names are relative to the OPF file and can not go outside of resource_dir
+        safe_name = zip_path.normpath(name).lstrip('/')
+
+        while safe_name.startswith('../'):
+            safe_name = safe_name[3:]
+
+        if name not in self._relocated:
+            path = os.path.join(self._resource_dir, *safe_name.split('/'))
+
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+
+            with open(path, 'wb') as f:
+                f.write(item.get_content())
+
+            self._relocated.add(name)
+
+        return self._resource_url + quote(safe_name.encode('utf-8') if six.PY2 else safe_name)
+
+    def _get_resource_href(self, item):
+        self.stats['resources'] += 1
+
+        if self.options['resources'] == 'inline':
+            return self._get_data_uri(item)
+
+        return self._relocate(item)
+
+    def _get_rewriter(self, base_name):
+        def _rewrite(href):
+            target = resolve_href(base_name, href)
+
+            if target is None:
+                return None
+
+            name, fragment = target
+
+            if name in self._sections:
+                # link to the id which does not exist points to the start of the document
+                new_id = self._ids.get((name, fragment)) if fragment else None
+
+                if new_id is None:
+                    new_id = self._sections[name]
+
+                self.stats['links'] += 1
+
+                return '#' + new_id
+
+            item = self.items.get(name)
+
+            if item is None:
+                return None
+
+            if item.media_type == CSS_MEDIA_TYPE and self.options['stylesheets']:
+                # style sheets are already in the head
+                return None
+
+            return self._get_resource_href(item)
+
+        return _rewrite
+
+    def _write(self, out, data):
+        if isinstance(data, six.text_type):
+            data = data.encode('utf-8')
+
+        out.write(data)
+        self.stats['bytes'] += len(data)
+
+    def _write_head(self, out):
+        title = self.options['title'] or self.book.title or ''
+
+        html = etree.Element('html')
+
+        if self.book.language:
+            html.set('lang', self.book.language)
+
+        head = etree.SubElement(html, 'head')
+        etree.SubElement(head, 'meta', {'charset': 'utf-8'})
+        etree.SubElement(head, 'title').text = title
+
+        if self.options['stylesheets']:
+            for item in self.book.get_items():
+                if item.media_type != CSS_MEDIA_TYPE or not item.content:
+                    continue
+
+                content = item.content
+
+                if isinstance(content, six.binary_type):
+                    content = content.decode('utf-8', 'replace')
+
+                content, _ = rewrite_css(content, self._get_rewriter(item.get_name()))
+
+                style = etree.SubElement(head, 'style')
+                style.text = content
+
+        # html and body are closed by _write_end
+        self._write(out, '<!DOCTYPE html>\n')
+        self._write(out, etree.tostring(html, method='html', encoding='utf-8').rsplit(six.b('</html>'), 1)[0])
+        self._write(out, '\n<body>\n')
+
+    def _write_document(self, out, item):
+        name = item.get_name()
+
+        try:
+            body = parse_html_string(item.content).find('body')
+        except (etree.LxmlError, ValueError):
+            body = None
+
+        if body is None:
+            # links to this document were already changed to its section
+            section = etree.Element('section', {'id': self._sections[name], 'data-epub-name': name})
+
+            self._write(out, etree.tostring(section, method='html', encoding='utf-8'))
+            self._write(out, '\n')
+
+            self.stats['skipped'].append(name)
+            return
+
+        for elem in body.iter(etree.Element):
+            uid = elem.get('id')
+
+            if uid:
+                elem.set('id', self._ids.get((name, uid), uid))
+
+            if elem.tag == 'a' and elem.get('name'):
+                elem.set('name', self._ids.get((name, elem.get('name')), elem.get('name')))
+
+        rewrite_html(body, self._get_rewriter(name))
+
+        section = etree.Element('section', {'id': self._sections[name], 'data-epub-name': name})
+
+        if body.get('class'):
+            section.set('class', body.get('class'))
+
+        section.text = body.text
+        section.extend(body)
+
+        # links to the id of the body still work
+        if body.get('id'):
+            anchor = etree.Element('span', {'id': body.get('id')})
+            anchor.tail = section.text
+            section.text = None
+            section.insert(0, anchor)
+
+        self._write(out, etree.tostring(section, method='html', encoding='utf-8'))
+        self._write(out, '\n')
+
+        self.stats['documents'] += 1
+
+    def _write_end(self, out):
+        self._write(out, '</body>\n</html>\n')
+
+    def _prepare(self, out):
+        if self.options['resources'] != 'relocate':
+            return
+
+        resource_dir = self.options['resource_dir']
+
+        if resource_dir is None:
+            if not isinstance(out, six.string_types):
+                raise ValueError('Option resource_dir is needed when output is not a file name')
+
+            resource_dir = os.path.splitext(out)[0] + '_files'
+
+        self._resource_dir = resource_dir
+
+        resource_url = self.options['resource_url']
+
+        if resource_url is None:
+            base = os.path.dirname(os.path.abspath(out)) if isinstance(out, six.string_types) else os.getcwd()
+            resource_url = os.path.relpath(os.path.abspath(resource_dir), base).replace(os.sep, '/')
+
+        self._resource_url = resource_url.rstrip('/') + '/'
+
+    def write(self, out):
+        """
+        Writes the book.
+
+        :Args:
+          - out: File name or file object opened for writing bytes
+
+        :Returns:
+          Returns dictionary with number of written documents, changed links, links to the resources and bytes,
+          and names of the documents which could not be parsed and were written as empty sections.
+        """
+        self._prepare(out)
+        self._create_ids()
+
+        if isinstance(out, six.string_types):
+            with open(out, 'wb') as f:
+                return self._write_all(f)
+
+        return self._write_all(out)
+
+    def _write_all(self, out):
+        self._write_head(out)
+
+        for item in self.documents:
+            self._write_document(out, item)
+
+        self._write_end(out)
+
+        return self.stats
+
+
+def export_html(book, out, options=None):
+    """
+    Writes documents from the spine as one HTML document. See HtmlExporter for the options.
+
+    >>> export_html(book, 'book.html')
+
+    :Args:
+      - book: Instance of EpubBook
+      - out: File name or file object opened for writing bytes
+      - options: Extra options as dictionary (optional)
+
+    :Returns:
+      Returns dictionary with number of written documents, changed links, links to the resources and bytes,
+      and names of the documents which could not be parsed.
+    """
+    return HtmlExporter(book, options).write(out)
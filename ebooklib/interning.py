@@ -0,0 +1,154 @@
+# This file is part of EbookLib.
+# Copyright (c) 2013 Aleksandar Erkalovic <aerkalov@gmail.com>
+#
+# EbookLib is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# EbookLib is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with EbookLib.  If not, see <http://www.gnu.org/licenses/>.
+
+import hashlib
+import threading
+import weakref
+
+
+class _Entry(object):
+    __slots__ = ('content', 'users')
+
+    def __init__(self, content):
+        self.content = content
+        self.users = 0
+
+
+class ContentInterner(object):
+    """
+    Shares identical content of the items between all books loaded with the same interner. Fonts,
+    style sheets and logos which are part of many books are kept in memory only once.
+
+    >>> interner = ContentInterner()
+    >>> book1 = epub.read_epub('book1.epub', {'interner': interner})
+    >>> book2 = epub.read_epub('book2.epub', {'interner': interner})
+
+    Every book which uses the content is counted and content is removed from the interner when the
+    last of these books is garbage collected. Content is shared, so it must never be changed in place.
+    """
+
+    def __init__(self, min_size=1024):
+        """
+        :Args:
+          - min_size: Content smaller than this many bytes is not interned (optional). Default value is 1024.
+        """
+        self.min_size = min_size
+
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+
+        self._entries = {}
+        # id of the owner -> (weak reference to the owner, keys of the content it uses)
+        self._owners = {}
+        # owners which were garbage collected, callbacks can run in the middle of any other call
+        # so they are only remembered here
+        self._released = []
+        self._lock = threading.Lock()
+
+    def intern(self, content, owner):
+        """
+        Returns shared content equal to the given content.
+
+        :Args:
+          - content: Content as bytes
+          - owner: Object which uses the content, usually instance of EpubBook. It must support weak references.
+
+        :Returns:
+          Returns content which should be used instead of the given content.
+        """
+        if not isinstance(content, bytes) or len(content) < self.min_size:
+            return content
+
+        key = (len(content), hashlib.sha1(content).digest())
+
+        with self._lock:
+            self._collect()
+
+            keys = self._get_keys(owner)
+            entry = self._entries.get(key)
+
+            # owner which reads the same content again is counted only once
+            if key in keys:
+                return entry.content
+
+            if entry is None:
+                entry = self._entries[key] = _Entry(content)
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.bytes_saved += len(content)
+
+            entry.users += 1
+            keys.add(key)
+
+            return entry.content
+
+    def _get_keys(self, owner):
+        owner_id = id(owner)
+        value = self._owners.get(owner_id)
+
+        if value is None or value[0]() is not owner:
+            if value is not None:
+                # previous owner with the same id is gone but it was not collected yet
+                self._release_keys(value[1])
+
+            released = self._released
+
+            value = self._owners[owner_id] = (weakref.ref(owner, lambda ref: released.append((owner_id, ref))), set())
+
+        return value[1]
+
+    def _collect(self):
+        "Must be called with the lock held. Removes content which is not used by any owner."
+        while self._released:
+            owner_id, ref = self._released.pop()
+            value = self._owners.get(owner_id)
+
+            if value is None or value[0] is not ref:
+                continue
+
+            del self._owners[owner_id]
+            self._release_keys(value[1])
+
+    def _release_keys(self, keys):
+        for key in keys:
+            entry = self._entries[key]
+            entry.users -= 1
+
+            if entry.users == 0:
+                del self._entries[key]
+
+    def collect(self):
+        "Removes content of the books which were garbage collected."
+        with self._lock:
+            self._collect()
+
+    def get_stats(self):
+        """
+        Returns usage statistics for the interner.
+
+        :Returns:
+          Returns dictionary with number of entries, bytes kept by the interner, hits, misses and bytes saved.
+        """
+        with self._lock:
+            self._collect()
+
+            return {'entries': len(self._entries),
+                    'bytes': sum(len(entry.content) for entry in self._entries.values()),
+                    'hits': self.hits,
+                    'misses': self.misses,
+                    'bytes_saved': self.bytes_saved}
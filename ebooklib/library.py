@@ -0,0 +1,271 @@
+# This file is part of EbookLib.
+# Copyright (c) 2013 Aleksandar Erkalovic <aerkalov@gmail.com>
+#
+# EbookLib is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# EbookLib is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with EbookLib.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import multiprocessing
+
+import six
+
+from ebooklib.epub import NAMESPACES
+from ebooklib.cache import get_fingerprint
+from ebooklib.database import BookDatabase
+from ebooklib.text import iter_blocks, get_spine_items
+
+
+# Version of the database schema, database with other version is created again
+SCHEMA_VERSION = 1
+
+# Approximate number of characters in one indexed chunk of text
+CHUNK_CHARS = 2000
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS books (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    fingerprint TEXT NOT NULL,
+    title TEXT,
+    identifier TEXT,
+    first_chunk INTEGER,
+    last_chunk INTEGER
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS chunks USING fts5 (
+    text,
+    book_id UNINDEXED,
+    item UNINDEXED,
+    anchor UNINDEXED,
+    tokenize='unicode61 remove_diacritics 2'
+);
+'''
+
+
+def _get_first_metadata(book, name):
+    values = book.metadata.get(NAMESPACES['DC'], {}).get(name)
+
+    return values[0][0] if values else None
+
+
+def _extract(task):
+    """
+    Reads the book and returns its text split in chunks. Runs in the worker process, so it must be
+    a module level function and everything it returns must be picklable.
+    """
+    from ebooklib import epub
+
+    path, fingerprint, chunk_chars = task
+
+    try:
+        book = epub.read_epub(path, {'ignore_toc': True})
+
+        rows = []
+
+        for item in get_spine_items(book):
+            parts = []
+            size = 0
+            anchor = None
+
+            for block_anchor, text in iter_blocks(item.content):
+                if not parts:
+                    # chunk gets anchor of its first block
+                    anchor = block_anchor
+
+                parts.append(text)
+                size += len(text)
+
+                if size >= chunk_chars:
+                    rows.append((u'\n'.join(parts), item.get_name(), anchor))
+                    parts = []
+                    size = 0
+
+            if parts:
+                rows.append((u'\n'.join(parts), item.get_name(), anchor))
+
+        return (path, fingerprint, _get_first_metadata(book, 'title'), _get_first_metadata(book, 'identifier'),
+                rows, None)
+    except Exception as e:
+        return (path, fingerprint, None, None, None, '%s: %s' % (e.__class__.__name__, e))
+
+
+class LibraryIndex(BookDatabase):
+    """
+    Full text index of many EPUB files stored in the SQLite database. Text is stored in chunks which
+    remember the book, document and the anchor where they start.
+
+    >>> with LibraryIndex('library.db') as index:
+    ...     index.update(glob.glob('books/*.epub'), processes=4)
+    ...     for result in index.search('"white rabbit"'):
+    ...         print(result['title'], result['item'], result['anchor'], result['snippet'])
+
+    Books are indexed again only when their fingerprint is changed. Books are read in worker processes,
+    only the process which calls update writes to the database. Query uses the FTS5 syntax.
+    """
+
+    SCHEMA = _SCHEMA
+    SCHEMA_VERSION = SCHEMA_VERSION
+    TABLES = ('chunks', 'books')
+    KNOWN_COLUMNS = ('fingerprint', )
+
+    def __init__(self, path, fingerprint='stat', chunk_chars=CHUNK_CHARS):
+        """
+        :Args:
+          - path: Path to the database file
+          - fingerprint: How to find out the book was changed, "stat" or "content" (optional). Default value is "stat".
+          - chunk_chars: Approximate number of characters in one indexed chunk of text (optional). Default value is 2000.
+        """
+        self.fingerprint = fingerprint
+        self.chunk_chars = chunk_chars
+
+        super(LibraryIndex, self).__init__(path)
+
+    def _delete_book(self, book_id):
+        # chunks of the book are inserted in one transaction so their row ids are consecutive,
+        # this way the whole full text table is not scanned
+        first, last = self._db.execute('SELECT first_chunk, last_chunk FROM books WHERE id = ?', (book_id, )).fetchone()
+
+        if first is not None:
+            self._db.execute('DELETE FROM chunks WHERE rowid BETWEEN ? AND ?', (first, last))
+
+        self._db.execute('DELETE FROM books WHERE id = ?', (book_id, ))
+
+    def _store(self, result, known):
+        path, fingerprint, title, identifier, rows, _ = result
+
+        with self._db:
+            if path in known:
+                self._delete_book(known[path][0])
+
+            cursor = self._db.execute('INSERT INTO books (path, fingerprint, title, identifier) VALUES (?, ?, ?, ?)',
+                                      (path, fingerprint, title, identifier))
+            book_id = cursor.lastrowid
+
+            first = last = None
+
+            for text, item, anchor in rows:
+                last = self._db.execute('INSERT INTO chunks (text, book_id, item, anchor) VALUES (?, ?, ?, ?)',
+                                        (text, book_id, item, anchor)).lastrowid
+
+                if first is None:
+                    first = last
+
+            self._db.execute('UPDATE books SET first_chunk = ?, last_chunk = ? WHERE id = ?', (first, last, book_id))
+
+    def update(self, paths, processes=None):
+        """
+        Indexes new and changed books.
+
+        :Args:
+          - paths: List of paths to the EPUB files
+          - processes: Number of worker processes (optional). By default number of CPUs is used, with 1 books are read in this process.
+
+        :Returns:
+          Returns dictionary with number of added, updated, unchanged and failed books. Errors are
+          returned as list of (path, error) tuples.
+        """
+        stats = {'added': 0, 'updated': 0, 'unchanged': 0, 'failed': 0, 'errors': []}
+
+        known = self._get_known()
+        tasks = []
+        seen = set()
+
+        for path in paths:
+            path = os.path.abspath(path)
+
+            # every book is stored only once, even if it is in the paths more than once
+            if path in seen:
+                continue
+
+            seen.add(path)
+            fingerprint = get_fingerprint(path, self.fingerprint)
+
+            if fingerprint is None:
+                stats['failed'] += 1
+                stats['errors'].append((path, 'Can not read file'))
+            elif path in known and known[path][1] == fingerprint:
+                stats['unchanged'] += 1
+            else:
+                tasks.append((path, fingerprint, self.chunk_chars))
+
+        if not tasks:
+            return stats
+
+        if processes is None:
+            processes = min(multiprocessing.cpu_count(), len(tasks))
+
+        pool = None
+
+        if processes > 1:
+            pool = multiprocessing.Pool(processes)
+            results = pool.imap_unordered(_extract, tasks)
+        else:
+            results = six.moves.map(_extract, tasks)
+
+        try:
+            for result in results:
+                path, error = result[0], result[5]
+
+                if error is not None:
+                    stats['failed'] += 1
+                    stats['errors'].append((path, error))
+                    continue
+
+                stats['updated' if path in known else 'added'] += 1
+
+                self._store(result, known)
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+        return stats
+
+    def remove_missing(self):
+        """
+        Removes books which do not exist on the disk anymore.
+
+        :Returns:
+          Returns number of removed books.
+        """
+        return self.remove([path for path in self._get_known() if not os.path.exists(path)])
+
+    def search(self, query, limit=20):
+        """
+        Returns best matching chunks of text.
+
+        :Args:
+          - query: FTS5 query, for instance word, "phrase" or prefix*
+          - limit: Maximum number of results (optional). Default value is 20.
+
+        :Returns:
+          Returns list of dictionaries with path, title, item, anchor and snippet.
+        """
+        cursor = self._db.execute('''SELECT books.path, books.title, chunks.item, chunks.anchor,
+                                            snippet(chunks, 0, '[', ']', '...', 16)
+                                     FROM chunks JOIN books ON books.id = chunks.book_id
+                                     WHERE chunks MATCH ?
+                                     ORDER BY bm25(chunks)
+                                     LIMIT ?''', (query, limit))
+
+        return [{'path': path, 'title': title, 'item': item, 'anchor': anchor, 'snippet': snippet}
+                for path, title, item, anchor, snippet in cursor]
+
+    def get_stats(self):
+        """
+        Returns statistics for the index.
+
+        :Returns:
+          Returns dictionary with number of books and chunks.
+        """
+        return {'books': self._db.execute('SELECT COUNT(*) FROM books').fetchone()[0],
+                'chunks': self._db.execute('SELECT COUNT(*) FROM chunks').fetchone()[0]}
@@ -0,0 +1,165 @@
+# This file is part of EbookLib.
+# Copyright (c) 2013 Aleksandar Erkalovic <aerkalov@gmail.com>
+#
+# EbookLib is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# EbookLib is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with EbookLib.  If not, see <http://www.gnu.org/licenses/>.
+
+import time
+
+
+clock = getattr(time, 'perf_counter', time.time)
+
+
+class BaseMetrics(object):
+    """
+    Receives measurements from the EpubReader and EpubWriter. Pass instance with the "metrics" option
+    and override methods you need, for instance to send values to your own metrics system.
+
+    >>> epub.write_epub('book.epub', book, {'metrics': MyMetrics()})
+
+    Durations are in seconds.
+    """
+
+    def stage(self, name, duration):
+        "Called when stage of reading or writing is finished."
+        pass
+
+    def plugin(self, name, hook, duration):
+        "Called after plugin hook was executed."
+        pass
+
+    def item(self, item, name, bytes_in, bytes_out, compressed=None):
+        """
+        Called for every item which was read or written. When reading bytes_in is size of the item
+        in the archive, when writing bytes_in is size of the content before serialization. Value
+        bytes_out is size of the content and compressed is size after compression.
+        """
+        pass
+
+    def count(self, name, value=1):
+        "Called to increase a counter, like number of parsed or serialized documents."
+        pass
+
+
+class Metrics(BaseMetrics):
+    """
+    Collects all measurements in memory.
+
+    >>> metrics = Metrics()
+    >>> book = epub.read_epub('book.epub', {'metrics': metrics})
+    >>> metrics.get_report()['stages']['manifest']
+    {'count': 1, 'total': 0.0123}
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        "Removes all collected values."
+        self.stages = {}
+        self.plugins = {}
+        self.items = []
+        self.counters = {}
+
+    def _add_duration(self, values, name, duration):
+        value = values.get(name)
+
+        if value is None:
+            values[name] = {'count': 1, 'total': duration}
+        else:
+            value['count'] += 1
+            value['total'] += duration
+
+    def stage(self, name, duration):
+        self._add_duration(self.stages, name, duration)
+
+    def plugin(self, name, hook, duration):
+        self._add_duration(self.plugins, '%s.%s' % (name, hook), duration)
+
+    def item(self, item, name, bytes_in, bytes_out, compressed=None):
+        self.items.append({'id': item.get_id() if item is not None else None,
+                           'name': name,
+                           'bytes_in': bytes_in,
+                           'bytes_out': bytes_out,
+                           'compressed': compressed})
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def get_report(self):
+        """
+        Returns all collected values.
+
+        :Returns:
+          Returns dictionary with stages, plugins, items, counters and totals.
+        """
+        bytes_in = sum(i['bytes_in'] or 0 for i in self.items)
+        bytes_out = sum(i['bytes_out'] or 0 for i in self.items)
+
+        compressed_items = [i for i in self.items if i['compressed'] is not None]
+        compressed = sum(i['compressed'] for i in compressed_items)
+        uncompressed = sum(i['bytes_out'] or 0 for i in compressed_items)
+
+        return {'stages': self.stages,
+                'plugins': self.plugins,
+                'items': self.items,
+                'counters': self.counters,
+                'totals': {'bytes_in': bytes_in,
+                           'bytes_out': bytes_out,
+                           'compressed': compressed,
+                           'compression_ratio': float(compressed) / uncompressed if uncompressed else None}}
+
+
+class _NullTimer(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer(object):
+    __slots__ = ('metrics', 'name', 'start')
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = clock()
+        return self
+
+    def __exit__(self, *args):
+        self.metrics.stage(self.name, clock() - self.start)
+        return False
+
+
+def timer(metrics, name):
+    """
+    Returns context manager which reports duration of the stage. Does nothing if metrics is None.
+
+    :Args:
+      - metrics: Instance of BaseMetrics or None
+      - name: Name of the stage
+    """
+    if metrics is None:
+        return _NULL_TIMER
+
+    return _Timer(metrics, name)
+
+
+def get_plugin_name(plugin):
+    return getattr(plugin, 'NAME', plugin.__class__.__name__)
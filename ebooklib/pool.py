@@ -0,0 +1,274 @@
+# This file is part of EbookLib.
+# Copyright (c) 2013 Aleksandar Erkalovic <aerkalov@gmail.com>
+#
+# EbookLib is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# EbookLib is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with EbookLib.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import time
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from ebooklib import epub
+
+
+class _PoolEntry(object):
+    __slots__ = ('path', 'epub_file', 'users', 'last_used', 'stat', 'stale')
+
+    def __init__(self, path, epub_file, stat):
+        self.path = path
+        self.epub_file = epub_file
+        self.users = 0
+        self.last_used = time.time()
+        self.stat = stat
+        self.stale = False
+
+
+class EpubPool(object):
+    """
+    Thread safe pool of opened EPUB files (instances of EpubFile) with least recently used eviction.
+
+    >>> pool = EpubPool(max_open=256, idle_timeout=600)
+    >>> with pool.open('book.epub') as epub_file:
+    ...     chapter = epub_file.get('chapter_01.xhtml')
+
+    Files are never closed while some thread is using them. If all opened files are in use, pool can
+    temporarily have more than max_open files opened, extra files are closed as soon as they are released.
+    """
+
+    def __init__(self, max_open=128, idle_timeout=None, check_modified=True, options=None):
+        """
+        :Args:
+          - max_open: Maximum number of opened files (optional). Default value is 128.
+          - idle_timeout: Files not used for this many seconds are closed (optional).
+          - check_modified: Reopen the file if it was modified on disk (optional). Default value is True.
+          - options: Options passed to the EpubFile (optional).
+        """
+        self.max_open = max_open
+        self.idle_timeout = idle_timeout
+        self.check_modified = check_modified
+        self.options = options
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._entries = OrderedDict()
+        self._handles = {}
+        self._lock = threading.Lock()
+
+    def _get_stat(self, path):
+        if not self.check_modified:
+            return None
+
+        st = os.stat(path)
+
+        return (st.st_size, st.st_mtime)
+
+    def _close_entry(self, entry):
+        with self._lock:
+            self._handles.pop(id(entry.epub_file), None)
+            self.evictions += 1
+
+        entry.epub_file.close()
+
+    def _evict(self):
+        "Must be called with the lock held. Returns entries which should be closed."
+        to_close = []
+
+        if self.idle_timeout is not None:
+            oldest = time.time() - self.idle_timeout
+
+            for path, entry in list(self._entries.items()):
+                if entry.last_used > oldest:
+                    break
+
+                if entry.users == 0:
+                    del self._entries[path]
+                    to_close.append(entry)
+
+        if len(self._entries) > self.max_open:
+            for path, entry in list(self._entries.items()):
+                if len(self._entries) <= self.max_open:
+                    break
+
+                if entry.users == 0:
+                    del self._entries[path]
+                    to_close.append(entry)
+
+        return to_close
+
+    def acquire(self, path):
+        """
+        Returns opened file for the path. Every call must be followed with a call to release.
+
+        :Args:
+          - path: Path to the EPUB file
+
+        :Returns:
+          Returns instance of EpubFile.
+        """
+        stat = self._get_stat(path)
+        to_close = []
+
+        with self._lock:
+            entry = self._entries.get(path)
+
+            if entry is not None and stat is not None and entry.stat != stat:
+                # file was changed, close it once nobody is using it
+                del self._entries[path]
+                entry.stale = True
+
+                if entry.users == 0:
+                    to_close.append(entry)
+
+                entry = None
+
+            if entry is not None:
+                self.hits += 1
+
+                entry.users += 1
+                entry.last_used = time.time()
+
+                # mark as most recently used
+                del self._entries[path]
+                self._entries[path] = entry
+            else:
+                self.misses += 1
+
+        for old in to_close:
+            self._close_entry(old)
+
+        if entry is not None:
+            return entry.epub_file
+
+        # parsing can take some time so it is not done while holding the lock
+        epub_file = epub.open_epub(path, self.options)
+
+        with self._lock:
+            entry = self._entries.get(path)
+
+            if entry is not None and entry.stat == stat:
+                # some other thread opened it in the meantime
+                duplicate = epub_file
+                epub_file = entry.epub_file
+            else:
+                duplicate = None
+
+                if entry is not None:
+                    del self._entries[path]
+                    entry.stale = True
+
+                    if entry.users == 0:
+                        to_close.append(entry)
+
+                entry = _PoolEntry(path, epub_file, stat)
+                self._entries[path] = entry
+
+            entry.users += 1
+            entry.last_used = time.time()
+
+            self._handles[id(epub_file)] = entry
+
+            to_close.extend(self._evict())
+
+        if duplicate is not None:
+            duplicate.close()
+
+        for old in to_close:
+            self._close_entry(old)
+
+        return epub_file
+
+    def release(self, epub_file):
+        """
+        Releases file returned by acquire.
+
+        :Args:
+          - epub_file: Instance of EpubFile returned by acquire
+        """
+        with self._lock:
+            entry = self._handles.get(id(epub_file))
+
+            if entry is None:
+                return
+
+            entry.users -= 1
+            entry.last_used = time.time()
+
+            # entries are kept in the order of last use, idle entries are found at the start
+            if self._entries.get(entry.path) is entry:
+                del self._entries[entry.path]
+                self._entries[entry.path] = entry
+
+            to_close = self._evict()
+
+            if entry.stale and entry.users == 0:
+                to_close.append(entry)
+
+        for old in to_close:
+            self._close_entry(old)
+
+    @contextmanager
+    def open(self, path):
+        """
+        Context manager which acquires and releases opened file.
+
+        >>> with pool.open('book.epub') as epub_file:
+        ...     epub_file.spine_item(0)
+
+        :Args:
+          - path: Path to the EPUB file
+        """
+        epub_file = self.acquire(path)
+
+        try:
+            yield epub_file
+        finally:
+            self.release(epub_file)
+
+    def evict_idle(self):
+        "Closes files which were not used for longer than idle_timeout."
+        with self._lock:
+            to_close = self._evict()
+
+        for entry in to_close:
+            self._close_entry(entry)
+
+    def get_stats(self):
+        """
+        Returns usage statistics for the pool.
+
+        :Returns:
+          Returns dictionary with number of opened files, files in use, hits, misses and evictions.
+        """
+        with self._lock:
+            return {'open': len(self._entries),
+                    'in_use': sum(1 for entry in self._entries.values() if entry.users > 0),
+                    'hits': self.hits,
+                    'misses': self.misses,
+                    'evictions': self.evictions}
+
+    def close(self):
+        "Closes all files which are not in use."
+        with self._lock:
+            to_close = []
+
+            for path, entry in list(self._entries.items()):
+                if entry.users == 0:
+                    del self._entries[path]
+                    to_close.append(entry)
+
+        for entry in to_close:
+            self._close_entry(entry)
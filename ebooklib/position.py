@@ -0,0 +1,366 @@
+# This file is part of EbookLib.
+# Copyright (c) 2013 Aleksandar Erkalovic <aerkalov@gmail.com>
+#
+# EbookLib is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# EbookLib is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with EbookLib.  If not, see <http://www.gnu.org/licenses/>.
+
+import sys
+import bisect
+from array import array
+
+from six.moves.urllib.parse import unquote
+
+from ebooklib.text import get_offsets
+
+
+# Version of the serialized index, data with other version is not loaded
+DATA_VERSION = 1
+
+
+def _calculate(item):
+    characters, offsets = get_offsets(item.content)
+
+    return characters, [uid for uid, _ in offsets], array('i', [offset for _, offset in offsets])
+
+
+def get_item_offsets(item):
+    """
+    Returns where in the plain text of the HTML document are elements with id. Offsets are calculated
+    in one pass over the document and kept on the item until its content is changed.
+
+    :Args:
+      - item: Instance of EpubHtml
+
+    :Returns:
+      Returns tuple with number of characters, list of ids and array with their character offsets.
+    """
+    return item._get_cached('offsets', _calculate)
+
+
+def _to_bytes(values):
+    return values.tobytes() if hasattr(values, 'tobytes') else values.tostring()
+
+
+def _from_bytes(data, byteorder):
+    values = array('i')
+
+    if hasattr(values, 'frombytes'):
+        values.frombytes(data)
+    else:
+        values.fromstring(data)
+
+    if byteorder != sys.byteorder:
+        values.byteswap()
+
+    return values
+
+
+class PositionIndex(object):
+    """
+    Converts between position in the book as percent, location as spine index and character offset
+    in the plain text of the document, and anchors inside of the documents. All conversions use
+    binary search over compact arrays and never read the documents again.
+
+    >>> index = book.position_index()
+    >>> spine_index, offset = index.get_location(42.5)
+    >>> index.get_anchor(spine_index, offset)
+    'chapter_3_section_2'
+    >>> index.get_percent(*index.get_href_location('chapter_04.xhtml#note_12'))
+    51.2
+
+    Index can be stored together with the cached book and loaded without the book.
+
+    >>> cache.save(key + '.positions', index.to_data())
+    >>> index = PositionIndex.from_data(cache.load(key + '.positions'))
+
+    Spine index is the index in the EpubBook.spine. Entries which are not HTML documents and the
+    navigation document have no text.
+    Characters are counted in the same text as in the ebooklib.text and ebooklib.stats modules.
+    """
+
+    def __init__(self, names, starts, anchor_starts, anchors, anchor_offsets):
+        """
+        Use from_book or from_data to create the index.
+
+        :Args:
+          - names: Names of the spine documents, None for entries which were not found
+          - starts: Array with position of the first character of every spine entry, with total number of characters at the end
+          - anchor_starts: Array with index of the first anchor of every spine entry, with number of anchors at the end
+          - anchors: List of all anchors in the reading order
+          - anchor_offsets: Array with position of every anchor
+        """
+        self.names = names
+        self.starts = starts
+        self.anchor_starts = anchor_starts
+        self.anchors = anchors
+        self.anchor_offsets = anchor_offsets
+
+        self._by_name = None
+        self._by_anchor = None
+
+    @classmethod
+    def from_book(cls, book):
+        """
+        Creates index for the book. Every document is parsed only once, text offsets are kept on the
+        item until its content is changed.
+
+        :Args:
+          - book: Instance of EpubBook
+
+        :Returns:
+          Returns instance of PositionIndex.
+        """
+        from ebooklib.epub import EpubHtml, EpubItem, EpubNav
+
+        ids = dict((item.get_id(), item) for item in book.get_items())
+
+        names = []
+        starts = array('i', [0])
+        anchor_starts = array('i', [0])
+        anchors = []
+        anchor_offsets = array('i')
+
+        for entry in book.spine:
+            if isinstance(entry, tuple):
+                entry = entry[0]
+
+            item = entry if isinstance(entry, EpubItem) else ids.get(entry)
+
+            # navigation document is not counted, same as in the BookStats
+            if isinstance(item, EpubHtml) and not isinstance(item, EpubNav):
+                characters, uids, offsets = get_item_offsets(item)
+                start = starts[-1]
+
+                names.append(item.get_name())
+                anchors.extend(uids)
+                anchor_offsets.extend(start + offset for offset in offsets)
+            else:
+                characters = 0
+                names.append(item.get_name() if item is not None else None)
+
+            starts.append(starts[-1] + characters)
+            anchor_starts.append(len(anchors))
+
+        return cls(names, starts, anchor_starts, anchors, anchor_offsets)
+
+    @classmethod
+    def from_data(cls, data):
+        """
+        Creates index from the value returned by to_data.
+
+        :Args:
+          - data: Dictionary returned by to_data
+
+        :Returns:
+          Returns instance of PositionIndex. Returns None if data is missing or has different version.
+        """
+        if not data or data.get('version') != DATA_VERSION:
+            return None
+
+        byteorder = data['byteorder']
+
+        return cls(list(data['names']),
+                   _from_bytes(data['starts'], byteorder),
+                   _from_bytes(data['anchor_starts'], byteorder),
+                   list(data['anchors']),
+                   _from_bytes(data['anchor_offsets'], byteorder))
+
+    def to_data(self):
+        """
+        Returns index as dictionary with simple values, which can be stored with marshal, pickle or
+        in the BookCache. Arrays are stored as bytes.
+        """
+        return {'version': DATA_VERSION,
+                'byteorder': sys.byteorder,
+                'names': list(self.names),
+                'starts': _to_bytes(self.starts),
+                'anchor_starts': _to_bytes(self.anchor_starts),
+                'anchors': list(self.anchors),
+                'anchor_offsets': _to_bytes(self.anchor_offsets)}
+
+    @property
+    def total(self):
+        "Number of characters in the book."
+        return self.starts[-1]
+
+    def __len__(self):
+        return len(self.names)
+
+    def get_length(self, spine_index):
+        """
+        Returns number of characters in the document.
+
+        :Args:
+          - spine_index: Index in the spine
+        """
+        return self.starts[spine_index + 1] - self.starts[spine_index]
+
+    def get_spine_index(self, name):
+        """
+        Returns spine index of the document.
+
+        :Args:
+          - name: Name of the document, same as item.get_name()
+
+        :Returns:
+          Returns index in the spine or None if document is not in the spine.
+        """
+        if self._by_name is None:
+            self._by_name = {}
+
+            for n, item_name in enumerate(self.names):
+                self._by_name.setdefault(item_name, n)
+
+        return self._by_name.get(name)
+
+    def get_position(self, spine_index, offset):
+        """
+        Returns position in the book, number of characters before the location.
+
+        :Args:
+          - spine_index: Index in the spine
+          - offset: Character offset in the document
+        """
+        start = self.starts[spine_index]
+
+        return start + max(0, min(offset, self.starts[spine_index + 1] - start))
+
+    def get_percent(self, spine_index, offset):
+        """
+        Returns how far in the book the location is.
+
+        :Args:
+          - spine_index: Index in the spine
+          - offset: Character offset in the document
+
+        :Returns:
+          Returns percent as number between 0 and 100.
+        """
+        if not self.total:
+            return 0.0
+
+        return 100.0 * self.get_position(spine_index, offset) / self.total
+
+    def get_location_at(self, position):
+        """
+        Returns location of the character at the position in the book.
+
+        :Args:
+          - position: Number of characters before the location
+
+        :Returns:
+          Returns (spine index, offset) tuple. Returns None if spine is empty.
+        """
+        if not self.names:
+            return None
+
+        position = max(0, min(position, self.total - 1))
+
+        # empty documents start at the same position as the next one, bisect_right skips them
+        spine_index = min(bisect.bisect_right(self.starts, position) - 1, len(self.names) - 1)
+
+        return spine_index, position - self.starts[spine_index]
+
+    def get_location(self, percent):
+        """
+        Returns location for the percent of the book.
+
+        :Args:
+          - percent: Number between 0 and 100
+
+        :Returns:
+          Returns (spine index, offset) tuple. Returns None if spine is empty.
+        """
+        return self.get_location_at(int(self.total * percent / 100.0))
+
+    def get_anchor(self, spine_index, offset):
+        """
+        Returns anchor for the location, the last element with id in the document before or at the location.
+
+        :Args:
+          - spine_index: Index in the spine
+          - offset: Character offset in the document
+
+        :Returns:
+          Returns id as string or None if there is no element with id before the location.
+        """
+        first, last = self.anchor_starts[spine_index], self.anchor_starts[spine_index + 1]
+        n = bisect.bisect_right(self.anchor_offsets, self.get_position(spine_index, offset), first, last) - 1
+
+        return self.anchors[n] if n >= first else None
+
+    def get_anchor_location(self, spine_index, anchor):
+        """
+        Returns location of the element with id.
+
+        :Args:
+          - spine_index: Index in the spine
+          - anchor: Id of the element
+
+        :Returns:
+          Returns (spine index, offset) tuple. Returns None if there is no such element.
+        """
+        if self._by_anchor is None:
+            self._by_anchor = {}
+
+            for n in range(len(self.names)):
+                for k in range(self.anchor_starts[n], self.anchor_starts[n + 1]):
+                    self._by_anchor.setdefault((n, self.anchors[k]), k)
+
+        k = self._by_anchor.get((spine_index, anchor))
+
+        if k is None:
+            return None
+
+        return spine_index, self.anchor_offsets[k] - self.starts[spine_index]
+
+    def get_href_location(self, href):
+        """
+        Returns location for the link to the document in the spine, with or without fragment.
+
+        :Args:
+          - href: Name of the document with optional fragment, like "chapter_04.xhtml#note_12"
+
+        :Returns:
+          Returns (spine index, offset) tuple. Returns None if document or element were not found.
+        """
+        name, _, fragment = href.partition('#')
+        spine_index = self.get_spine_index(unquote(name))
+
+        if spine_index is None:
+            return None
+
+        if not fragment:
+            return spine_index, 0
+
+        return self.get_anchor_location(spine_index, unquote(fragment))
+
+    def get_href(self, spine_index, offset):
+        """
+        Returns link to the location, name of the document and the anchor before the location.
+
+        :Args:
+          - spine_index: Index in the spine
+          - offset: Character offset in the document
+
+        :Returns:
+          Returns link as string. Returns None if spine entry was not found in the book.
+        """
+        name = self.names[spine_index]
+
+        if name is None:
+            return None
+
+        anchor = self.get_anchor(spine_index, offset)
+
+        return name + ('#' + anchor if anchor else '')
@@ -0,0 +1,594 @@
+# This file is part of EbookLib.
+# Copyright (c) 2013 Aleksandar Erkalovic <aerkalov@gmail.com>
+#
+# EbookLib is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# EbookLib is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with EbookLib.  If not, see <http://www.gnu.org/licenses/>.
+
+# Finding and changing references between the files of the book. All names are relative to
+# the directory of the OPF file, same as EpubItem.get_name().
+
+import re
+import posixpath as zip_path
+
+import six
+from lxml import etree
+
+try:
+    from urllib.parse import unquote, quote, urlparse
+except ImportError:
+    from urllib import unquote, quote
+    from urlparse import urlparse
+
+from ebooklib.utils import parse_html_string
+
+
+# Attributes of the HTML elements which can reference other files
+HTML_ATTRIBUTES = frozenset(['href', 'src', 'poster', 'data', 'xlink:href', '{http://www.w3.org/1999/xlink}href'])
+
+CSS_MEDIA_TYPE = 'text/css'
+
+# url(...) and @import "..." in the style sheets
+_CSS_PATTERN = r'''url\(\s*(?:"([^"]*)"|'([^']*)'|([^)'"\s]*))\s*\)|@import\s+(?:"([^"]*)"|'([^']*)')'''
+
+_CSS_RE = re.compile(_CSS_PATTERN)
+_CSS_BYTES_RE = re.compile(_CSS_PATTERN.encode('ascii'))
+
+
+def is_external(href):
+    """
+    Returns True if reference points outside of the book, like "http://..." or "mailto:...".
+
+    :Args:
+      - href: Reference
+
+    :Returns:
+      Returns True or False.
+    """
+    parsed = urlparse(href)
+
+    return bool(parsed.scheme or parsed.netloc) or href.startswith('/')
+
+
+def resolve_href(base_name, href):
+    """
+    Returns name of the file and fragment identifier for the reference.
+
+    >>> resolve_href('text/chapter_01.xhtml', '../images/cover%20big.jpg#top')
+    ('images/cover big.jpg', 'top')
+
+    :Args:
+      - base_name: Name of the file which contains the reference
+      - href: Reference
+
+    :Returns:
+      Returns (name, fragment) tuple. Returns None for empty and external references.
+    """
+    if not href or is_external(href):
+        return None
+
+    path, _, fragment = href.partition('#')
+    path = path.partition('?')[0]
+
+    if not path:
+        return base_name, fragment
+
+    return zip_path.normpath(zip_path.join(zip_path.dirname(base_name), unquote(path))), fragment
+
+
+def make_href(base_name, name, fragment='', quoted=False):
+    """
+    Returns relative reference from one file to the other.
+
+    >>> make_href('text/chapter_01.xhtml', 'images/cover.jpg')
+    '../images/cover.jpg'
+
+    :Args:
+      - base_name: Name of the file which will contain the reference
+      - name: Name of the referenced file
+      - fragment: Fragment identifier (optional)
+      - quoted: Quote special characters in the reference (optional)
+    """
+    href = zip_path.relpath(name, zip_path.dirname(base_name) or zip_path.curdir)
+
+    if quoted:
+        href = quote(href.encode('utf-8') if six.PY2 else href)
+
+    if fragment:
+        href = '%s#%s' % (href, fragment)
+
+    return href
+
+
+def _css_values(match):
+    return next(value for value in match.groups() if value is not None)
+
+
+def iter_css_references(content):
+    """
+    Returns all references from the style sheet, arguments of url() and @import.
+
+    :Args:
+      - content: Style sheet as string or bytes
+
+    :Returns:
+      Returns iterator over references, they are always strings.
+    """
+    if isinstance(content, six.binary_type):
+        for match in _CSS_BYTES_RE.finditer(content):
+            yield _css_values(match).decode('utf-8', 'replace')
+    else:
+        for match in _CSS_RE.finditer(content):
+            yield _css_values(match)
+
+
+def rewrite_css(content, func):
+    """
+    Changes references in the style sheet.
+
+    :Args:
+      - content: Style sheet as string or bytes
+      - func: Function which gets reference and returns new reference or None if it should not be changed
+
+    :Returns:
+      Returns (new content, number of changed references) tuple.
+    """
+    is_bytes = isinstance(content, six.binary_type)
+    changed = [0]
+
+    def _replace(match):
+        value = _css_values(match)
+
+        if is_bytes:
+            value = value.decode('utf-8', 'replace')
+
+        new_value = func(value)
+
+        if new_value is None or new_value == value:
+            return match.group(0)
+
+        changed[0] += 1
+
+        if is_bytes:
+            new_value = new_value.encode('utf-8')
+
+        index = next(n for n, v in enumerate(match.groups()) if v is not None) + 1
+        start, end = match.start(index) - match.start(0), match.end(index) - match.start(0)
+
+        return match.group(0)[:start] + new_value + match.group(0)[end:]
+
+    content = (_CSS_BYTES_RE if is_bytes else _CSS_RE).sub(_replace, content)
+
+    return content, changed[0]
+
+
+def iter_html_references(tree):
+    """
+    Returns all references from the parsed HTML document. References from the style attributes
+    and style elements are also included.
+
+    :Args:
+      - tree: Document parsed with ebooklib.utils.parse_html_string
+
+    :Returns:
+      Returns iterator over (element, attribute, reference) tuples. Attribute is None for references
+      from the style element.
+    """
+    for elem in tree.iter(etree.Element):
+        for name, value in elem.items():
+            if name in HTML_ATTRIBUTES:
+                yield elem, name, value
+            elif name == 'style' and 'url(' in value:
+                for href in iter_css_references(value):
+                    yield elem, name, href
+
+        if elem.tag == 'style' and elem.text:
+            for href in iter_css_references(elem.text):
+                yield elem, None, href
+
+
+def rewrite_html(tree, func):
+    """
+    Changes references in the parsed HTML document.
+
+    :Args:
+      - tree: Document parsed with ebooklib.utils.parse_html_string
+      - func: Function which gets reference and returns new reference or None if it should not be changed
+
+    :Returns:
+      Returns number of changed references.
+    """
+    changed = 0
+
+    for elem in tree.iter(etree.Element):
+        for name, value in elem.items():
+            if name in HTML_ATTRIBUTES:
+                new_value = func(value)
+
+                if new_value is not None and new_value != value:
+                    elem.set(name, new_value)
+                    changed += 1
+            elif name == 'style' and 'url(' in value:
+                new_value, n = rewrite_css(value, func)
+
+                if n:
+                    elem.set(name, new_value)
+                    changed += n
+
+        if elem.tag == 'style' and elem.text:
+            elem.text, n = rewrite_css(elem.text, func)
+            changed += n
+
+    return changed
+
+
+def _get_rewriter(base_name, mapping):
+    # file itself can also be moved and then all relative references have to change
+    new_base_name = mapping.get(base_name, base_name)
+
+    def _rewrite(href):
+        if href.startswith('#'):
+            return None
+
+        target = resolve_href(base_name, href)
+
+        if target is None:
+            return None
+
+        name = mapping.get(target[0])
+
+        if name is None:
+            if new_base_name == base_name:
+                return None
+
+            name = target[0]
+
+        return make_href(new_base_name, name, target[1], '%' in href)
+
+    return _rewrite
+
+
+def rewrite_references(book, mapping):
+    """
+    Changes all references to the files in the mapping. References are changed in the content of
+    HTML documents and style sheets, in additional links of the documents, cover page, table of
+    contents and guide. If the document or style sheet itself is in the mapping, its relative
+    references are changed to work from the new location. File names of the items are not changed.
+
+    >>> rewrite_references(book, {'images/old.jpg': 'images/new.jpg'})
+
+    :Args:
+      - book: Instance of EpubBook
+      - mapping: Dictionary with old names as keys and new names as values
+
+    :Returns:
+      Returns number of changed references.
+    """
+    from ebooklib.epub import EpubHtml, EpubCoverHtml, Link, Section
+
+    changed = 0
+
+    for item in book.get_items():
+        name = item.get_name()
+        func = _get_rewriter(name, mapping)
+
+        if isinstance(item, EpubHtml):
+            for link in item._links or ():
+                for key in ('href', 'src'):
+                    new_value = func(link[key]) if link.get(key) else None
+
+                    if new_value is not None:
+                        link[key] = new_value
+                        changed += 1
+
+            if isinstance(item, EpubCoverHtml):
+                # content of the cover page is created from the template
+                new_value = func(item.image_name) if item.image_name else None
+
+                if new_value is not None:
+                    item.image_name = new_value
+                    changed += 1
+
+                continue
+
+            if not item.content:
+                continue
+
+            try:
+                tree = parse_html_string(item.content)
+            except (etree.LxmlError, ValueError):
+                continue
+
+            n = rewrite_html(tree, func)
+
+            if n:
+                item.content = etree.tostring(tree, pretty_print=True, encoding='utf-8')
+                changed += n
+        elif item.media_type == CSS_MEDIA_TYPE and item.content:
+            item.content, n = rewrite_css(item.content, func)
+            changed += n
+
+    # table of contents and guide are relative to the OPF file
+    func = _get_rewriter('', mapping)
+
+    stack = [book.toc]
+
+    while stack:
+        toc = stack.pop()
+
+        if isinstance(toc, (tuple, list)):
+            stack.extend(toc)
+        elif isinstance(toc, (Link, Section)) and toc.href:
+            new_value = func(toc.href)
+
+            if new_value is not None:
+                toc.href = new_value
+                changed += 1
+
+    for reference in book.guide:
+        new_value = func(reference['href']) if reference.get('href') else None
+
+        if new_value is not None:
+            reference['href'] = new_value
+            changed += 1
+
+    return changed
+
+
+class Reference(object):
+    "Reference from one file of the book to the other."
+
+    __slots__ = ('source', 'href', 'name', 'fragment')
+
+    def __init__(self, source, href, name, fragment=''):
+        """
+        :Args:
+          - source: Name of the file with the reference. It is None for references from the OPF file
+            (spine, guide, metadata) and the table of contents.
+          - href: Reference as it was written
+          - name: Name of the referenced file
+          - fragment: Fragment identifier (optional)
+        """
+        self.source = source
+        self.href = href
+        self.name = name
+        self.fragment = fragment
+
+    def __repr__(self):
+        return '<Reference:%s:%s>' % (self.source, self.href)
+
+
+class ReferenceGraph(object):
+    """
+    References between all files of the book, built with one pass over HTML documents, style sheets,
+    table of contents, spine, guide and cover metadata.
+
+    >>> graph = ReferenceGraph(book)
+    >>> for reference in graph.get_broken_links():
+    ...     print(reference.source, reference.href)
+
+    Every HTML document and style sheet is parsed only once and all lookups use dictionaries, so
+    time needed is proportional to the size of the book.
+    """
+
+    def __init__(self, book):
+        """
+        :Args:
+          - book: Instance of EpubBook
+        """
+        self.book = book
+
+        # name -> item
+        self.items = {}
+        # name -> set of ids defined in the document, only for parsed HTML documents
+        self.ids = {}
+        self.references = []
+        # names of the files which are always needed: spine, table of contents, guide, cover, NAV and NCX
+        self.roots = set()
+
+        self._build()
+
+    def _add(self, source, href):
+        target = resolve_href(source or '', href)
+
+        if target is not None:
+            self.references.append(Reference(source, href, target[0], target[1]))
+
+        return target
+
+    def _add_root(self, href):
+        target = self._add(None, href)
+
+        if target is not None:
+            self.roots.add(target[0])
+
+    def _add_html(self, name, content):
+        try:
+            tree = parse_html_string(content)
+        except (etree.LxmlError, ValueError):
+            return
+
+        ids = self.ids[name] = set()
+
+        for elem in tree.iter(etree.Element):
+            for attr, value in elem.items():
+                if attr == 'id':
+                    ids.add(value)
+                elif attr in HTML_ATTRIBUTES:
+                    self._add(name, value)
+                elif attr == 'style' and 'url(' in value:
+                    for href in iter_css_references(value):
+                        self._add(name, href)
+
+            if elem.tag == 'a' and elem.get('name'):
+                ids.add(elem.get('name'))
+            elif elem.tag == 'style' and elem.text:
+                for href in iter_css_references(elem.text):
+                    self._add(name, href)
+
+    def _build(self):
+        from ebooklib.epub import EpubHtml, EpubCoverHtml, EpubNav, EpubNcx, EpubCover, EpubItem, Link, Section
+
+        for item in self.book.get_items():
+            self.items[item.get_name()] = item
+
+        for item in self.book.get_items():
+            name = item.get_name()
+
+            if isinstance(item, (EpubNav, EpubNcx, EpubCover)):
+                self.roots.add(name)
+
+            if isinstance(item, EpubHtml):
+                for link in item._links or ():
+                    for key in ('href', 'src'):
+                        if link.get(key):
+                            self._add(name, link[key])
+
+                if isinstance(item, EpubCoverHtml):
+                    if item.image_name:
+                        self._add(name, item.image_name)
+                elif item.content:
+                    self._add_html(name, item.content)
+            elif item.media_type == CSS_MEDIA_TYPE and item.content:
+                for href in iter_css_references(item.content):
+                    self._add(name, href)
+
+        # NCX and NAV are created from the table of contents
+        stack = [self.book.toc]
+
+        while stack:
+            toc = stack.pop()
+
+            if isinstance(toc, (tuple, list)):
+                stack.extend(toc)
+            elif isinstance(toc, (Link, Section)) and toc.href:
+                self._add_root(toc.href)
+            elif isinstance(toc, EpubItem):
+                self._add_root(toc.get_name())
+
+        ids = dict((item.get_id(), item) for item in self.book.get_items())
+
+        for entry in self.book.spine:
+            if isinstance(entry, tuple):
+                entry = entry[0]
+
+            item = entry if isinstance(entry, EpubItem) else ids.get(entry)
+
+            if item is not None:
+                self.roots.add(item.get_name())
+
+        for reference in self.book.guide:
+            if reference.get('item') is not None:
+                self.roots.add(reference['item'].get_name())
+            elif reference.get('href'):
+                self._add_root(reference['href'])
+
+        for values in self.book.metadata.values():
+            for entries in values.values():
+                for _, others in entries:
+                    if others and others.get('name') == 'cover' and others.get('content') in ids:
+                        self.roots.add(ids[others['content']].get_name())
+
+    def get_broken_links(self):
+        """
+        Returns references to the files which are not in the book.
+
+        :Returns:
+          Returns list of instances of Reference.
+        """
+        return [reference for reference in self.references if reference.name not in self.items]
+
+    def get_missing_fragments(self):
+        """
+        Returns references to the existing HTML documents with fragment identifier which is not
+        defined in the document.
+
+        :Returns:
+          Returns list of instances of Reference.
+        """
+        missing = []
+
+        for reference in self.references:
+            if reference.fragment:
+                ids = self.ids.get(reference.name)
+
+                if ids is not None and reference.fragment not in ids:
+                    missing.append(reference)
+
+        return missing
+
+    def get_references_to(self, name):
+        """
+        Returns all references to the file.
+
+        :Args:
+          - name: Name of the file
+
+        :Returns:
+          Returns list of instances of Reference.
+        """
+        return [reference for reference in self.references if reference.name == name]
+
+    def get_reachable(self):
+        """
+        Returns names of all files which can be reached from the spine, table of contents, guide,
+        cover, NAV and NCX.
+
+        :Returns:
+          Returns set of names.
+        """
+        targets = {}
+
+        for reference in self.references:
+            if reference.source is not None:
+                targets.setdefault(reference.source, set()).add(reference.name)
+
+        reachable = set()
+        stack = list(self.roots)
+
+        while stack:
+            name = stack.pop()
+
+            if name in reachable:
+                continue
+
+            reachable.add(name)
+            stack.extend(targets.get(name, ()))
+
+        return reachable
+
+    def get_unreferenced(self):
+        """
+        Returns items from the manifest which can not be reached from the spine, table of contents,
+        guide, cover, NAV and NCX.
+
+        :Returns:
+          Returns list of items.
+        """
+        reachable = self.get_reachable()
+
+        return [item for item in self.book.get_items() if item.manifest and item.get_name() not in reachable]
+
+    def check(self):
+        """
+        Returns all problems found in the book.
+
+        >>> report = ReferenceGraph(book).check()
+        >>> len(report['broken_links'])
+        0
+
+        :Returns:
+          Returns dictionary with broken links, missing fragments and unreferenced items.
+        """
+        return {'broken_links': self.get_broken_links(),
+                'missing_fragments': self.get_missing_fragments(),
+                'unreferenced': self.get_unreferenced()}
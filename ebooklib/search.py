@@ -0,0 +1,305 @@
+# This file is part of EbookLib.
+# Copyright (c) 2013 Aleksandar Erkalovic <aerkalov@gmail.com>
+#
+# EbookLib is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# EbookLib is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with EbookLib.  If not, see <http://www.gnu.org/licenses/>.
+
+import re
+import bisect
+import unicodedata
+from array import array
+
+from ebooklib.text import iter_blocks, get_spine_items
+
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# query token which ends with * matches all words with this prefix
+_QUERY_TOKEN_RE = re.compile(r'\w+\*?', re.UNICODE)
+
+
+def normalize(word):
+    """
+    Returns normalized form of the word used in the index. Word is lower cased and accents are removed.
+
+    >>> normalize(u'Čaša')
+    u'casa'
+    """
+    word = word.lower()
+
+    try:
+        word.encode('ascii')
+    except UnicodeError:
+        word = u''.join(c for c in unicodedata.normalize('NFKD', word) if not unicodedata.combining(c))
+
+    return word
+
+
+class SearchResult(object):
+    "One occurrence of the searched text."
+
+    __slots__ = ('item', 'anchor', 'offset', 'length', 'snippet')
+
+    def __init__(self, item, anchor, offset, length, snippet):
+        """
+        :Args:
+          - item: Document with the text
+          - anchor: Id of the last element with id before the text, or None
+          - offset: Offset of the text in the plain text of the document
+          - length: Length of the found text
+          - snippet: Found text with some text around it
+        """
+        self.item = item
+        self.anchor = anchor
+        self.offset = offset
+        self.length = length
+        self.snippet = snippet
+
+    def __repr__(self):
+        return '<SearchResult:%s:%s:%d>' % (self.item.get_name(), self.anchor, self.offset)
+
+
+class _Document(object):
+    __slots__ = ('item', 'text', 'terms', 'starts', 'ends', 'block_starts', 'anchors')
+
+
+class SearchIndex(object):
+    """
+    Inverted index of the words in the spine documents. Documents are indexed only when they are
+    needed, so search can return first results before the whole book is indexed.
+
+    >>> index = book.search_index()
+    >>> for result in index.search('"white rabbit"'):
+    ...     print(result.item.get_name(), result.anchor, result.snippet)
+
+    Query is a word or a phrase, words of a phrase must follow each other in the text. Word which ends
+    with * matches all words starting with it. Case and accents are ignored.
+
+    Index is not updated when the content of the documents is changed. It is not safe to use the same
+    index from many threads.
+    """
+
+    def __init__(self, book, context=40):
+        """
+        :Args:
+          - book: Instance of EpubBook
+          - context: Number of characters around the found text in the snippet (optional). Default value is 40.
+        """
+        self.book = book
+        self.context = context
+
+        self._items = get_spine_items(book)
+        self._documents = []
+
+        # word -> term id
+        self._terms = {}
+        # term id -> (document numbers, token positions)
+        self._postings = []
+        self._sorted_terms = None
+        self._normalized = {}
+
+    def is_complete(self):
+        "Returns True if all documents are indexed."
+        return len(self._documents) == len(self._items)
+
+    def _get_term(self, word):
+        term = self._normalized.get(word)
+
+        if term is None:
+            normalized = normalize(word)
+            term = self._terms.get(normalized)
+
+            if term is None:
+                term = self._terms[normalized] = len(self._postings)
+                self._postings.append((array('i'), array('i')))
+                self._sorted_terms = None
+
+            self._normalized[word] = term
+
+        return term
+
+    def _index_next(self):
+        doc_no = len(self._documents)
+        item = self._items[doc_no]
+
+        doc = _Document()
+        doc.item = item
+        doc.terms = array('i')
+        doc.starts = array('i')
+        doc.ends = array('i')
+        doc.block_starts = array('i')
+        doc.anchors = []
+
+        parts = []
+        length = 0
+
+        for anchor, text in iter_blocks(item.content):
+            if parts:
+                parts.append(u'\n')
+                length += 1
+
+            doc.block_starts.append(length)
+            doc.anchors.append(anchor)
+
+            for match in _TOKEN_RE.finditer(text):
+                term = self._get_term(match.group(0))
+                docs, positions = self._postings[term]
+
+                docs.append(doc_no)
+                positions.append(len(doc.terms))
+
+                doc.terms.append(term)
+                doc.starts.append(length + match.start())
+                doc.ends.append(length + match.end())
+
+            parts.append(text)
+            length += len(text)
+
+        doc.text = u''.join(parts)
+
+        self._documents.append(doc)
+
+    def build(self):
+        "Indexes all documents which are not indexed yet."
+        while not self.is_complete():
+            self._index_next()
+
+    def _get_terms(self, token):
+        "Returns set of term ids which match the query token."
+        if not token.endswith('*'):
+            term = self._terms.get(normalize(token))
+
+            return set() if term is None else set([term])
+
+        prefix = normalize(token[:-1])
+
+        if self._sorted_terms is None:
+            self._sorted_terms = sorted(self._terms)
+
+        terms = set()
+        n = bisect.bisect_left(self._sorted_terms, prefix)
+
+        while n < len(self._sorted_terms) and self._sorted_terms[n].startswith(prefix):
+            terms.add(self._terms[self._sorted_terms[n]])
+            n += 1
+
+        return terms
+
+    def _search_documents(self, tokens, first, last):
+        "Returns matches in documents from first to last (not included) as (document number, position) tuples."
+        query = [self._get_terms(token) for token in tokens]
+
+        if not all(query):
+            return []
+
+        # start with the word which has the smallest number of occurrences
+        def _count(terms):
+            return sum(len(self._postings[term][0]) for term in terms)
+
+        k = min(range(len(query)), key=lambda n: _count(query[n]))
+        matches = []
+
+        for term in query[k]:
+            docs, positions = self._postings[term]
+
+            for n in range(bisect.bisect_left(docs, first), bisect.bisect_left(docs, last)):
+                doc_no, start = docs[n], positions[n] - k
+
+                if start < 0:
+                    continue
+
+                terms = self._documents[doc_no].terms
+
+                if start + len(query) > len(terms):
+                    continue
+
+                if all(terms[start + i] in query[i] for i in range(len(query)) if i != k):
+                    matches.append((doc_no, start))
+
+        matches.sort()
+
+        return matches
+
+    def _get_result(self, doc_no, start, count):
+        doc = self._documents[doc_no]
+
+        offset = doc.starts[start]
+        end = doc.ends[start + count - 1]
+
+        block = bisect.bisect_right(doc.block_starts, offset) - 1
+
+        snippet_start = max(0, offset - self.context)
+        snippet_end = min(len(doc.text), end + self.context)
+        snippet = doc.text[snippet_start:snippet_end].replace(u'\n', u' ')
+
+        if snippet_start > 0:
+            snippet = u'...' + snippet
+        if snippet_end < len(doc.text):
+            snippet += u'...'
+
+        return SearchResult(doc.item, doc.anchors[block] if block >= 0 else None, offset, end - offset, snippet)
+
+    def search(self, query, limit=None):
+        """
+        Returns occurrences of the word or phrase in reading order. Documents which are not indexed yet
+        are indexed while results are returned.
+
+        :Args:
+          - query: Word or phrase
+          - limit: Maximum number of results (optional)
+
+        :Returns:
+          Returns iterator over instances of SearchResult.
+        """
+        tokens = _QUERY_TOKEN_RE.findall(query)
+
+        if not tokens or limit == 0:
+            return
+
+        found = 0
+        first = 0
+        # documents are searched in growing ranges so first results come quickly and we search only
+        # few times, documents which are not indexed yet are indexed before they are searched
+        size = 1
+
+        while first < len(self._items):
+            last = min(first + size, len(self._items))
+
+            while len(self._documents) < last:
+                self._index_next()
+
+            for doc_no, start in self._search_documents(tokens, first, last):
+                yield self._get_result(doc_no, start, len(tokens))
+
+                found += 1
+                if limit is not None and found >= limit:
+                    return
+
+            first = last
+            size *= 2
+
+    def count(self, query):
+        """
+        Returns number of occurrences of the word or phrase. All documents are indexed first.
+
+        :Args:
+          - query: Word or phrase
+        """
+        self.build()
+
+        tokens = _QUERY_TOKEN_RE.findall(query)
+
+        if not tokens:
+            return 0
+
+        return len(self._search_documents(tokens, 0, len(self._documents)))
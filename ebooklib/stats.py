@@ -0,0 +1,186 @@
+# This file is part of EbookLib.
+# Copyright (c) 2013 Aleksandar Erkalovic <aerkalov@gmail.com>
+#
+# EbookLib is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# EbookLib is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with EbookLib.  If not, see <http://www.gnu.org/licenses/>.
+
+import bisect
+from array import array
+
+from ebooklib.text import iter_blocks, get_spine_items
+
+
+# Average reading speed used for the reading time
+WORDS_PER_MINUTE = 250
+
+# Number of characters on one page used for page estimates
+CHARS_PER_PAGE = 1800
+
+
+class ItemStats(object):
+    """
+    Statistics for one HTML document. Characters are counted in the plain text where white space
+    is collapsed and blocks are not separated.
+    """
+
+    __slots__ = ('words', 'characters', 'blocks', 'offsets', 'anchors')
+
+    def __init__(self):
+        self.words = 0
+        self.characters = 0
+        self.blocks = 0
+        # character offset where every block starts and its anchor
+        self.offsets = array('i')
+        self.anchors = []
+
+    def get_anchor(self, offset):
+        """
+        Returns anchor of the block with the character at the given offset.
+
+        :Args:
+          - offset: Character offset in the document
+
+        :Returns:
+          Returns id of the last element with id before the text, or None.
+        """
+        n = bisect.bisect_right(self.offsets, offset) - 1
+
+        return self.anchors[n] if n >= 0 else None
+
+    def __repr__(self):
+        return '<ItemStats:%d:%d>' % (self.words, self.characters)
+
+
+def _calculate(item):
+    stats = ItemStats()
+
+    for anchor, text in iter_blocks(item.content):
+        stats.offsets.append(stats.characters)
+        stats.anchors.append(anchor)
+
+        stats.blocks += 1
+        stats.words += len(text.split())
+        stats.characters += len(text)
+
+    return stats
+
+
+def get_item_stats(item):
+    """
+    Returns statistics for the HTML document. Statistics are calculated in one pass over the document
+    and kept on the item until its content is changed.
+
+    :Args:
+      - item: Instance of EpubHtml
+
+    :Returns:
+      Returns instance of ItemStats.
+    """
+    return item._get_cached('stats', _calculate)
+
+
+class BookStats(object):
+    """
+    Statistics for all documents in the spine. Navigation document is not counted even if it is in the spine.
+
+    >>> stats = book.get_stats()
+    >>> print(stats.words, stats.get_reading_time(), len(stats.get_pages()))
+    """
+
+    def __init__(self, book):
+        """
+        :Args:
+          - book: Instance of EpubBook
+        """
+        from ebooklib.epub import EpubNav
+
+        self.book = book
+        self.items = [(item, get_item_stats(item)) for item in get_spine_items(book) if not isinstance(item, EpubNav)]
+
+        self.words = sum(stats.words for _, stats in self.items)
+        self.characters = sum(stats.characters for _, stats in self.items)
+        self.blocks = sum(stats.blocks for _, stats in self.items)
+
+    def get_reading_time(self, words_per_minute=WORDS_PER_MINUTE):
+        """
+        Returns estimated reading time in minutes.
+
+        :Args:
+          - words_per_minute: Reading speed (optional). Default value is 250.
+        """
+        return float(self.words) / words_per_minute
+
+    def get_page_count(self, chars_per_page=CHARS_PER_PAGE):
+        """
+        Returns estimated number of pages.
+
+        :Args:
+          - chars_per_page: Number of characters on one page (optional). Default value is 1800.
+        """
+        return (self.characters + chars_per_page - 1) // chars_per_page
+
+    def get_pages(self, chars_per_page=CHARS_PER_PAGE):
+        """
+        Returns where estimated pages start. Text flows from one document to the next one, new page
+        starts after every chars_per_page characters.
+
+        :Args:
+          - chars_per_page: Number of characters on one page (optional). Default value is 1800.
+
+        :Returns:
+          Returns list of (page number, item, anchor) tuples. Anchor is the id of the last element
+          with id before the start of the page, or None.
+        """
+        pages = []
+        start = 0
+
+        for item, stats in self.items:
+            # first page which starts in this document
+            offset = (len(pages) * chars_per_page) - start
+
+            while offset < stats.characters:
+                pages.append((len(pages) + 1, item, stats.get_anchor(offset)))
+                offset += chars_per_page
+
+            start += stats.characters
+
+        return pages
+
+    def get_summary(self, words_per_minute=WORDS_PER_MINUTE, chars_per_page=CHARS_PER_PAGE):
+        """
+        Returns statistics for the book and for every document.
+
+        :Args:
+          - words_per_minute: Reading speed (optional). Default value is 250.
+          - chars_per_page: Number of characters on one page (optional). Default value is 1800.
+
+        :Returns:
+          Returns dictionary with words, characters, reading time in minutes, pages and list of
+          dictionaries with the same values for every document.
+        """
+        def _summary(words, characters):
+            return {'words': words,
+                    'characters': characters,
+                    'reading_time': float(words) / words_per_minute,
+                    'pages': (characters + chars_per_page - 1) // chars_per_page}
+
+        summary = _summary(self.words, self.characters)
+        summary['items'] = []
+
+        for item, stats in self.items:
+            values = _summary(stats.words, stats.characters)
+            values['item'] = item.get_name()
+
+            summary['items'].append(values)
+
+        return summary
@@ -0,0 +1,168 @@
+# This file is part of EbookLib.
+# Copyright (c) 2013 Aleksandar Erkalovic <aerkalov@gmail.com>
+#
+# EbookLib is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# EbookLib is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with EbookLib.  If not, see <http://www.gnu.org/licenses/>.
+
+import zlib
+import zipfile
+import threading
+from collections import OrderedDict
+
+
+class CompressedContent(object):
+    """
+    Content of the item kept in memory as raw deflate stream, usually exactly as it was in the archive.
+    Items with compressed content decompress it every time it is accessed, recently used values are
+    kept in the ContentCache.
+    """
+
+    __slots__ = ('data', 'size', 'crc', 'cache')
+
+    def __init__(self, data, size, crc=None, cache=None):
+        """
+        :Args:
+          - data: Raw deflate stream
+          - size: Size of the decompressed content
+          - crc: CRC-32 of the decompressed content, checked after decompression (optional)
+          - cache: Instance of ContentCache (optional)
+        """
+        self.data = data
+        self.size = size
+        self.crc = crc
+        self.cache = cache
+
+    @classmethod
+    def compress(cls, content, cache=None, level=6):
+        """
+        Returns compressed content for the given bytes.
+
+        :Args:
+          - content: Content as bytes
+          - cache: Instance of ContentCache (optional)
+          - level: Compression level (optional). Default value is 6.
+        """
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+        data = compressor.compress(content) + compressor.flush()
+
+        return cls(data, len(content), zlib.crc32(content) & 0xffffffff, cache)
+
+    def decompress(self):
+        "Returns decompressed content, without using the cache."
+        content = zlib.decompress(self.data, -15)
+
+        if self.crc is not None and zlib.crc32(content) & 0xffffffff != self.crc:
+            raise zipfile.BadZipfile('Bad CRC-32 for compressed content')
+
+        return content
+
+    def get(self):
+        "Returns decompressed content."
+        if self.cache is None:
+            return self.decompress()
+
+        return self.cache.get(self)
+
+    def __len__(self):
+        return self.size
+
+
+class ContentCache(object):
+    """
+    Thread safe least recently used cache of decompressed content. Same instance can be shared between
+    many books to limit memory used by all of them.
+
+    >>> cache = ContentCache(max_items=32)
+    >>> book = epub.read_epub('book.epub', {'compressed_content': cache})
+    """
+
+    def __init__(self, max_items=16, max_bytes=None):
+        """
+        :Args:
+          - max_items: Maximum number of decompressed values (optional). Default value is 16.
+          - max_bytes: Maximum size of all decompressed values (optional).
+        """
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+
+        self.hits = 0
+        self.misses = 0
+
+        self._values = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, compressed):
+        """
+        Returns decompressed content.
+
+        :Args:
+          - compressed: Instance of CompressedContent
+        """
+        with self._lock:
+            content = self._values.pop(compressed, None)
+
+            if content is not None:
+                self.hits += 1
+                # mark as most recently used
+                self._values[compressed] = content
+
+                return content
+
+            self.misses += 1
+
+        content = compressed.decompress()
+
+        with self._lock:
+            if compressed not in self._values:
+                self._values[compressed] = content
+                self._size += len(content)
+
+            while self._values and (len(self._values) > self.max_items or
+                                    (self.max_bytes is not None and self._size > self.max_bytes)):
+                _, old = self._values.popitem(last=False)
+                self._size -= len(old)
+
+        return content
+
+    def peek(self, compressed):
+        "Returns decompressed content if it is in the cache, otherwise None."
+        with self._lock:
+            return self._values.get(compressed)
+
+    def discard(self, compressed):
+        "Removes decompressed content from the cache."
+        with self._lock:
+            content = self._values.pop(compressed, None)
+
+            if content is not None:
+                self._size -= len(content)
+
+    def clear(self):
+        "Removes all values from the cache."
+        with self._lock:
+            self._values.clear()
+            self._size = 0
+
+    def get_stats(self):
+        """
+        Returns usage statistics for the cache.
+
+        :Returns:
+          Returns dictionary with number of values, their size, hits and misses.
+        """
+        with self._lock:
+            return {'items': len(self._values),
+                    'bytes': self._size,
+                    'hits': self.hits,
+                    'misses': self.misses}
@@ -0,0 +1,279 @@
+# This file is part of EbookLib.
+# Copyright (c) 2013 Aleksandar Erkalovic <aerkalov@gmail.com>
+#
+# EbookLib is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# EbookLib is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with EbookLib.  If not, see <http://www.gnu.org/licenses/>.
+
+# Text extraction from the HTML documents. Documents are parsed with a parser target, so the
+# tree is never built and text is produced in document order while parsing.
+
+import six
+from lxml import etree
+
+
+# Elements which start a new block of text
+BLOCK_TAGS = frozenset(['address', 'article', 'aside', 'blockquote', 'body', 'caption', 'dd', 'div', 'dl', 'dt',
+                        'figcaption', 'figure', 'footer', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'header', 'hr',
+                        'li', 'main', 'nav', 'ol', 'p', 'pre', 'section', 'table', 'td', 'th', 'tr', 'ul'])
+
+# Elements without visible text
+SKIP_TAGS = frozenset(['head', 'script', 'style', 'template'])
+
+# Size of the pieces fed to the parser
+CHUNK_SIZE = 64 * 1024
+
+
+class _TextTarget(object):
+    "Parser target which collects (anchor, text) blocks."
+
+    def __init__(self, offsets=False):
+        """
+        :Args:
+          - offsets: Collect (id, character offset) tuples for all elements with id (optional)
+        """
+        self.blocks = []
+        self.characters = 0
+        self.offsets = [] if offsets else None
+        self._parts = []
+        self._anchor = None
+        self._has_text = False
+        self._last_id = None
+        self._skip = 0
+        # length of the current block with collapsed white space and if its raw text ends with white space
+        self._length = 0
+        self._space = False
+        # ids in the current block which wait for the text after them, with their offset and
+        # if the white space before them becomes one space
+        self._pending = []
+
+    def _add_text(self, text):
+        words = text.split()
+
+        if words:
+            # white space after the word is one space, if some text follows it
+            for uid, offset, space in self._pending:
+                self.offsets.append((uid, self.characters + offset + (1 if space else 0)))
+
+            self._pending = []
+
+            if self._length and (self._space or text[:1].isspace()):
+                self._length += 1
+
+            self._length += sum(len(word) for word in words) + len(words) - 1
+            self._space = text[-1:].isspace()
+        elif text:
+            self._space = True
+
+    def _flush(self):
+        for uid, offset, _ in self._pending:
+            self.offsets.append((uid, self.characters + offset))
+
+        self._pending = []
+        self._length = 0
+        self._space = False
+
+        if self._parts:
+            text = ' '.join(''.join(self._parts).split())
+
+            if text:
+                self.blocks.append((self._anchor, text))
+                self.characters += len(text)
+
+            self._parts = []
+
+        self._has_text = False
+
+    def start(self, tag, attrib):
+        if self._skip or tag in SKIP_TAGS:
+            self._skip += 1
+            return
+
+        if tag in BLOCK_TAGS:
+            self._flush()
+        elif tag == 'br':
+            self._parts.append(' ')
+
+            if self.offsets is not None:
+                self._add_text(' ')
+
+        uid = attrib.get('id') or (attrib.get('name') if tag == 'a' else None)
+
+        if uid:
+            self._last_id = uid
+
+            if self.offsets is not None:
+                self._pending.append((uid, self._length, self._length > 0 and self._space))
+
+    def end(self, tag):
+        if self._skip:
+            self._skip -= 1
+        elif tag in BLOCK_TAGS:
+            self._flush()
+
+    def data(self, text):
+        if self._skip:
+            return
+
+        if not self._has_text and text.strip():
+            # block gets id of the last element with id before its text, white space between
+            # the elements is not text
+            self._anchor = self._last_id
+            self._has_text = True
+
+        self._parts.append(text)
+
+        if self.offsets is not None:
+            self._add_text(text)
+
+    def comment(self, text):
+        pass
+
+    def close(self):
+        self._flush()
+
+
+def iter_blocks(content, chunk_size=CHUNK_SIZE):
+    """
+    Returns blocks of text from the HTML document. Every paragraph, heading, list item and other
+    block element is one block. Blocks are returned while the document is being parsed.
+
+    >>> for anchor, text in iter_blocks(chapter.content):
+    ...     print(anchor, text)
+
+    :Args:
+      - content: HTML document as string or bytes
+      - chunk_size: Size of the pieces fed to the parser (optional)
+
+    :Returns:
+      Returns iterator over (anchor, text) tuples. Anchor is the id of the last element with id
+      before the text of the block, or None.
+    """
+    if not content:
+        return
+
+    if isinstance(content, six.text_type):
+        content = content.encode('utf-8')
+
+    target = _TextTarget()
+    parser = etree.HTMLParser(target=target, encoding='utf-8')
+
+    for n in range(0, len(content), chunk_size):
+        parser.feed(content[n:n + chunk_size])
+
+        if target.blocks:
+            for block in target.blocks:
+                yield block
+
+            del target.blocks[:]
+
+    parser.close()
+
+    for block in target.blocks:
+        yield block
+
+
+def get_offsets(content, chunk_size=CHUNK_SIZE):
+    """
+    Returns length of the plain text of the HTML document and where in the text are elements with id.
+    Text is the same as the one returned by iter_blocks, blocks are joined without separator.
+
+    :Args:
+      - content: HTML document as string or bytes
+      - chunk_size: Size of the pieces fed to the parser (optional)
+
+    :Returns:
+      Returns tuple with number of characters and list of (id, character offset) tuples in document order.
+    """
+    if not content:
+        return 0, []
+
+    if isinstance(content, six.text_type):
+        content = content.encode('utf-8')
+
+    target = _TextTarget(offsets=True)
+    parser = etree.HTMLParser(target=target, encoding='utf-8')
+
+    for n in range(0, len(content), chunk_size):
+        parser.feed(content[n:n + chunk_size])
+
+        del target.blocks[:]
+
+    parser.close()
+
+    return target.characters, target.offsets
+
+
+def get_text(content):
+    """
+    Returns plain text of the HTML document. Blocks of text are separated with new lines.
+
+    :Args:
+      - content: HTML document as string or bytes
+
+    :Returns:
+      Returns text as string.
+    """
+    return u'\n'.join(text for _, text in iter_blocks(content))
+
+
+def get_spine_items(book):
+    """
+    Returns HTML documents from the spine in reading order.
+
+    :Args:
+      - book: Instance of EpubBook
+
+    :Returns:
+      Returns list of items.
+    """
+    from ebooklib.epub import EpubHtml, EpubItem
+
+    ids = dict((item.get_id(), item) for item in book.get_items())
+    items = []
+
+    for entry in book.spine:
+        if isinstance(entry, tuple):
+            entry = entry[0]
+
+        item = entry if isinstance(entry, EpubItem) else ids.get(entry)
+
+        if isinstance(item, EpubHtml):
+            items.append(item)
+
+    return items
+
+
+def iter_text(book, spine_order=True, blocks=False):
+    """
+    Returns text of the HTML documents, one document at a time. Same as EpubBook.iter_text.
+
+    :Args:
+      - book: Instance of EpubBook
+      - spine_order: Use documents from the spine in reading order, otherwise all HTML documents from the manifest (optional)
+      - blocks: Return list of (anchor, text) blocks instead of plain text (optional)
+
+    :Returns:
+      Returns iterator over (item, text) tuples.
+    """
+    from ebooklib.epub import EpubHtml
+
+    if spine_order:
+        items = get_spine_items(book)
+    else:
+        items = [item for item in book.get_items() if isinstance(item, EpubHtml)]
+
+    for item in items:
+        if blocks:
+            yield item, list(iter_blocks(item.content))
+        else:
+            yield item, get_text(item.content)
@@ -15,6 +15,8 @@
 # along with EbookLib.  If not, see <http://www.gnu.org/licenses/>.
 
 import io
+import gc
+import sys
 import mimetypes
 
 from lxml import etree
@@ -49,6 +51,28 @@ def parse_html_string(s):
     return html_tree
 
 
+def iterparse_string(s, tag=None, html=False):
+    """
+    Parses the string incrementally. Elements can be cleared as soon as they are processed so
+    the whole tree is never kept in memory.
+
+    :Args:
+      - s: XML or HTML document as string
+      - tag: Report events only for these tags (optional)
+      - html: Use HTML parser (optional)
+
+    :Returns:
+      Returns iterator over (event, element) pairs for start and end events.
+    """
+    if not isinstance(s, bytes):
+        s = s.encode('utf-8')
+
+    if html:
+        return etree.iterparse(io.BytesIO(s), events=('start', 'end'), tag=tag, html=True, encoding='utf-8')
+
+    return etree.iterparse(io.BytesIO(s), events=('start', 'end'), tag=tag)
+
+
 def guess_type(extenstion):
     global mimetype_initialised
 
@@ -58,3 +82,44 @@ def guess_type(extenstion):
         mimetype_initialised = True
 
     return mimetypes.guess_type(extenstion)
+
+
+def get_size(objects, skip=(), seen=None):
+    """
+    Returns approximate number of bytes used by the objects and everything they reference. Objects
+    of types defined in skip are not counted and not followed. Objects already in seen (set of
+    object ids) are not counted, seen is updated so it can be shared between calls.
+
+    :Args:
+      - objects: List of objects
+      - skip: Tuple of types which should not be counted (optional)
+      - seen: Set of ids of objects which were already counted (optional)
+
+    :Returns:
+      Returns size in bytes.
+    """
+    if seen is None:
+        seen = set()
+
+    size = 0
+    stack = list(objects)
+
+    while stack:
+        obj = stack.pop()
+
+        if obj is None or id(obj) in seen or isinstance(obj, type) or isinstance(obj, skip):
+            continue
+
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        elif not isinstance(obj, (str, bytes, int, float)):
+            # objects with __slots__ or __dict__
+            stack.extend(gc.get_referents(obj))
+
+    return size
@@ -1,43 +1,29 @@
 #!/usr/bin/env python
 
 import sys
-import subprocess
-import os
 import os.path
 
 from ebooklib import epub
+from ebooklib.convert import convert_book
 
-# This is just a basic example which can easily break in real world.
 
 if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print('Usage: epub2markdown.py my_ebook.epub [processes]')
+        sys.exit(1)
+
     # read epub
     book = epub.read_epub(sys.argv[1])
 
     # get base filename from the epub
     base_name = os.path.basename(os.path.splitext(sys.argv[1])[0])
 
-    for item in book.items:
-        # convert into markdown if this is html
-        if isinstance(item, epub.EpubHtml):
-            proc = subprocess.Popen(['pandoc', '-f', 'html', '-t', 'markdown', '-'],
-                                    stdin=subprocess.PIPE,
-                                    stdout=subprocess.PIPE
-                                    )
-            content, error = proc.communicate(item.content)
-            file_name = os.path.splitext(item.file_name)[0]+'.md'
-        else:
-            file_name = item.file_name
-            content = item.content
-
-        # create needed directories 
-        dir_name = '%s/%s' % (base_name, os.path.dirname(file_name))
-        if not os.path.exists(dir_name):
-            os.makedirs(dir_name)
-
-        print '>> ', file_name
-
-        # write content to file
-        f = open('%s/%s' % (base_name, file_name), 'w')
-        f.write(content)
-        f.close()
+    options = {'format': 'markdown'}
+
+    if len(sys.argv) > 2:
+        options['processes'] = int(sys.argv[2])
+
+    # documents are converted to markdown, images and other files are written as they are
+    stats = convert_book(book, base_name, options)
 
+    print('>> %d documents and %d other files written to %s' % (stats['documents'], stats['resources'], base_name))
@@ -0,0 +1,356 @@
+# coding=utf-8
+
+# Benchmarks for reading, writing, plugins and navigation.
+#
+# Books are generated from a fixed seed so results are comparable between runs and versions.
+#
+#   python tests/epub_benchmark.py
+#   python tests/epub_benchmark.py --chapters 2000 --toc-depth 4 --repeat 3
+#   python tests/epub_benchmark.py --json results.json --only read_epub write_epub
+
+from __future__ import print_function
+
+import os
+import io
+import sys
+import gc
+import json
+import time
+import random
+import argparse
+import tempfile
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+import six
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from ebooklib import epub
+
+
+WORDS = ['lorem', 'ipsum', 'dolor', 'sit', 'amet', 'consectetur', 'adipiscing', 'elit', 'sed', 'do',
+         'eiusmod', 'tempor', 'incididunt', 'ut', 'labore', 'et', 'dolore', 'magna', 'aliqua', 'enim',
+         'minim', 'veniam', 'quis', 'nostrud', u'žaba', u'šuma', u'čaša', u'đak', u'ćup', 'exercitation']
+
+
+def make_book(chapters=50, chapter_size=20000, images=10, image_size=50000, toc_depth=2, seed=1):
+    """
+    Creates book with synthetic content. Same arguments always produce the same book.
+
+    :Args:
+      - chapters: Number of chapters
+      - chapter_size: Approximate size of the chapter text in characters
+      - images: Number of images
+      - image_size: Size of the image in bytes
+      - toc_depth: Depth of the table of contents
+      - seed: Seed for the random generator
+    """
+    rng = random.Random(seed)
+
+    book = epub.EpubBook()
+    book.set_identifier('benchmark-%d' % seed)
+    book.set_title('Benchmark book')
+    book.set_language('en')
+    book.add_author('Benchmark Author')
+
+    block = bytearray(rng.getrandbits(8) for _ in range(4096))
+
+    image_items = []
+    for n in range(images):
+        img = epub.EpubImage()
+        img.file_name = 'images/image_%04d.png' % n
+        img.content = bytes((block * (image_size // len(block) + 1))[:image_size])
+        book.add_item(img)
+        image_items.append(img)
+
+    css = epub.EpubItem(uid='style', file_name='style/main.css', media_type='text/css',
+                        content=six.b('body { font-family: serif; } p { text-indent: 1em; }'))
+    book.add_item(css)
+
+    chapter_items = []
+    for n in range(chapters):
+        c = epub.EpubHtml(title='Chapter %d' % (n + 1), file_name='text/chapter_%04d.xhtml' % n)
+        c.add_item(css)
+
+        parts = [u'<h1 id="ch%d">Chapter %d</h1>' % (n, n + 1)]
+        notes = []
+        size = 0
+        paragraph = 0
+
+        while size < chapter_size:
+            text = u' '.join(rng.choice(WORDS) for _ in range(rng.randint(40, 120)))
+
+            if image_items and paragraph % 7 == 3:
+                text += u' <img src="../%s" alt="figure"/>' % rng.choice(image_items).file_name
+
+            if chapters > 1 and paragraph % 5 == 1:
+                target = rng.randint(0, chapters - 1)
+                text += u' <a href="chapter_%04d.xhtml#ch%d">see chapter %d</a>' % (target, target, target + 1)
+
+            if paragraph % 9 == 0:
+                notes.append(paragraph)
+                text = u'<span class="InsertNoteMarker" id="InsertNoteID_%d_marker1"><sup><a href="#InsertNoteID_%d">1</a></sup></span>' % (paragraph, paragraph) + text
+
+            parts.append(u'<p id="p%d">%s</p>' % (paragraph, text))
+            size += len(text)
+            paragraph += 1
+
+        # footnotes in the Booktype format
+        parts.append(u'<ol id="InsertNote_NoteList">')
+        for note in notes:
+            parts.append(u'<li id="InsertNoteID_%d">Note for paragraph %d</li>' % (note, note))
+        parts.append(u'</ol>')
+
+        c.content = u''.join(parts)
+        book.add_item(c)
+        chapter_items.append(c)
+
+    book.toc = _make_toc(chapter_items, toc_depth)
+    book.spine = ['nav'] + chapter_items
+
+    book.add_item(epub.EpubNcx())
+    book.add_item(epub.EpubNav())
+
+    return book
+
+
+def _make_toc(chapters, depth, level=1):
+    if depth <= 1 or len(chapters) < 4:
+        return tuple(chapters)
+
+    toc = []
+    size = max(2, len(chapters) // 4)
+
+    for n in range(0, len(chapters), size):
+        part = chapters[n:n + size]
+        toc.append((epub.Section('Part %d.%d' % (level, n // size + 1), href=part[0].file_name),
+                    _make_toc(part, depth - 1, level + 1)))
+
+    return toc
+
+
+# BENCHMARKS
+
+
+def bench_write_epub(ctx):
+    out = io.BytesIO()
+    epub.write_epub(out, ctx['book'], {})
+
+
+def bench_read_epub(ctx):
+    epub.read_epub(ctx['file_name'])
+
+
+def bench_get_nav(ctx):
+    writer = epub.EpubWriter(None, ctx['book'])
+    writer._get_nav(ctx['nav'])
+
+
+def bench_get_ncx(ctx):
+    writer = epub.EpubWriter(None, ctx['book'])
+    writer._get_ncx()
+
+
+def bench_get_item_with_id(ctx):
+    book = ctx['book']
+
+    for item in ctx['chapters']:
+        book.get_item_with_id(item.id)
+
+
+def bench_get_item_with_href(ctx):
+    book = ctx['book']
+
+    for item in ctx['chapters']:
+        book.get_item_with_href(item.file_name)
+
+
+def bench_chapter_get_content(ctx):
+    for item in ctx['chapters']:
+        item.get_content()
+
+
+def _make_plugin_bench(factory):
+    # plugins change the content so every run gets a new book
+    def setup(ctx):
+        return dict(ctx, book=ctx['fresh_book']())
+
+    def bench(ctx):
+        plugin = factory()
+        book = ctx['book']
+
+        for item in book.get_items():
+            if isinstance(item, epub.EpubHtml) and not isinstance(item, epub.EpubNav):
+                plugin.html_before_write(book, item)
+
+    return bench, setup
+
+
+def _get_plugins():
+    plugins = {}
+
+    from ebooklib.plugins import standard, booktype
+
+    plugins['plugin_standard_syntax'] = _make_plugin_bench(standard.SyntaxPlugin)
+    plugins['plugin_booktype_links'] = _make_plugin_bench(lambda: booktype.BooktypeLinks(None))
+    plugins['plugin_booktype_footnotes'] = _make_plugin_bench(lambda: booktype.BooktypeFootnotes(None))
+
+    try:
+        import pygments
+        from ebooklib.plugins import sourcecode
+
+        plugins['plugin_sourcecode'] = _make_plugin_bench(sourcecode.SourceHighlighter)
+    except ImportError:
+        pass
+
+    from ebooklib.plugins import tidyhtml
+
+    if tidyhtml.tidy_cleanup(six.b('<p>test</p>'))[0] != 3:
+        plugins['plugin_tidyhtml'] = _make_plugin_bench(tidyhtml.TidyPlugin)
+
+    return plugins
+
+
+BENCHMARKS = [('write_epub', (bench_write_epub, None)),
+              ('read_epub', (bench_read_epub, None)),
+              ('get_nav', (bench_get_nav, None)),
+              ('get_ncx', (bench_get_ncx, None)),
+              ('get_item_with_id', (bench_get_item_with_id, None)),
+              ('get_item_with_href', (bench_get_item_with_href, None)),
+              ('chapter_get_content', (bench_chapter_get_content, None))]
+
+
+def run_benchmark(func, setup, ctx, repeat):
+    times = []
+
+    for _ in range(repeat):
+        run_ctx = setup(ctx) if setup else ctx
+        gc.collect()
+
+        start = time.time()
+        func(run_ctx)
+        times.append(time.time() - start)
+
+    # tracemalloc sees only memory allocated by Python, not by libxml2
+    peak = None
+
+    if tracemalloc is not None:
+        run_ctx = setup(ctx) if setup else ctx
+        gc.collect()
+
+        tracemalloc.start()
+        func(run_ctx)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    times.sort()
+
+    return {'min': times[0], 'median': times[len(times) // 2], 'peak_memory': peak}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmarks for EbookLib.')
+    parser.add_argument('--chapters', type=int, default=50)
+    parser.add_argument('--chapter-size', type=int, default=20000)
+    parser.add_argument('--images', type=int, default=10)
+    parser.add_argument('--image-size', type=int, default=50000)
+    parser.add_argument('--toc-depth', type=int, default=2)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--only', nargs='*', help='run only these benchmarks')
+    parser.add_argument('--json', help='write results to this file')
+    parser.add_argument('--compare', help='compare with results saved with --json')
+    parser.add_argument('--threshold', type=float, default=1.25, help='slowdown reported as regression (default 1.25)')
+    args = parser.parse_args(argv)
+
+    params = {'chapters': args.chapters,
+              'chapter_size': args.chapter_size,
+              'images': args.images,
+              'image_size': args.image_size,
+              'toc_depth': args.toc_depth,
+              'seed': args.seed}
+
+    def fresh_book():
+        return make_book(**params)
+
+    book = fresh_book()
+
+    fd, file_name = tempfile.mkstemp(suffix='.epub')
+    os.close(fd)
+    epub.write_epub(file_name, book, {})
+
+    ctx = {'book': book,
+           'fresh_book': fresh_book,
+           'file_name': file_name,
+           'nav': next(item for item in book.get_items() if isinstance(item, epub.EpubNav)),
+           'chapters': [item for item in book.get_items() if isinstance(item, epub.EpubHtml) and item.is_chapter()]}
+
+    benchmarks = BENCHMARKS + sorted(_get_plugins().items())
+
+    results = {'params': params, 'size': os.path.getsize(file_name), 'results': {}}
+
+    print('Book: %(chapters)d chapters, %(chapter_size)d characters per chapter, %(images)d images, TOC depth %(toc_depth)d' % params)
+    print('EPUB size: %d bytes' % results['size'])
+    print()
+    print('%-28s %12s %12s %14s' % ('benchmark', 'min (s)', 'median (s)', 'peak memory'))
+
+    try:
+        for name, (func, setup) in benchmarks:
+            if args.only and name not in args.only:
+                continue
+
+            result = run_benchmark(func, setup, ctx, args.repeat)
+            results['results'][name] = result
+
+            peak = '%.1f MB' % (result['peak_memory'] / 1024.0 / 1024) if result['peak_memory'] is not None else '-'
+            print('%-28s %12.4f %12.4f %14s' % (name, result['min'], result['median'], peak))
+    finally:
+        os.remove(file_name)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.compare:
+        return compare(results, args.compare, args.threshold)
+
+    return 0
+
+
+def compare(results, file_name, threshold):
+    "Prints comparison with older results. Returns 1 if some benchmark is slower than threshold."
+    with open(file_name) as f:
+        old = json.load(f)
+
+    if old['params'] != results['params']:
+        print()
+        print('Warning: results were made with different parameters %r' % old['params'])
+
+    regressions = 0
+
+    print()
+    print('%-28s %12s %12s %8s' % ('benchmark', 'old (s)', 'new (s)', 'ratio'))
+
+    for name, result in sorted(results['results'].items()):
+        if name not in old['results']:
+            continue
+
+        old_time = old['results'][name]['min']
+        ratio = result['min'] / old_time if old_time else 1.0
+        mark = ''
+
+        if ratio > threshold:
+            mark = ' REGRESSION'
+            regressions += 1
+
+        print('%-28s %12.4f %12.4f %8.2f%s' % (name, old_time, result['min'], ratio, mark))
+
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,60 @@
+# coding=utf-8
+
+# Checks for the prune_unreferenced option of the writer.
+#
+#   python tests/epub_prune.py
+
+from __future__ import print_function
+
+import os
+import io
+import sys
+import zipfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from ebooklib import epub
+
+
+def make_book():
+    book = epub.EpubBook()
+
+    book.set_identifier('prune123')
+    book.set_title('Prune')
+    book.set_language('en')
+
+    c1 = epub.EpubHtml(title='Chapter 1', file_name='chap_01.xhtml')
+    c1.set_content(u'<h1>Chapter 1</h1><p><img src="images/a.png" alt=""/></p>')
+
+    # not in the spine or the table of contents, but it is still written
+    notes = epub.EpubHtml(title='Notes', file_name='notes.xhtml')
+    notes.set_content(u'<h1>Notes</h1><p><img src="images/b.png" alt=""/></p>')
+
+    book.add_item(c1)
+    book.add_item(notes)
+
+    for name in ('a.png', 'b.png', 'orphan.png'):
+        book.add_item(epub.EpubItem(uid=name, file_name='images/' + name, media_type='image/png', content=b'png'))
+
+    book.toc = (c1, )
+    book.spine = ['nav', c1]
+
+    book.add_item(epub.EpubNcx())
+    book.add_item(epub.EpubNav())
+
+    return book
+
+
+if __name__ == '__main__':
+    out = io.BytesIO()
+    epub.write_epub(out, make_book(), {'prune_unreferenced': True})
+
+    names = zipfile.ZipFile(io.BytesIO(out.getvalue())).namelist()
+
+    assert 'EPUB/notes.xhtml' in names
+    # referenced only from the document which is not in the spine
+    assert 'EPUB/images/b.png' in names, 'resource used by the written document was pruned'
+    assert 'EPUB/images/a.png' in names
+    assert 'EPUB/images/orphan.png' not in names
+
+    print('ok')